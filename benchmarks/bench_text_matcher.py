@@ -0,0 +1,101 @@
+"""
+髒話 / 詐騙比對效能測試：逐一比對（舊寫法） vs 編譯後的 KeywordMatcher / PatternMatcher
+執行方式: python benchmarks/bench_text_matcher.py [訊息數量]
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cogs.antiraid import SCAM_PATTERNS  # noqa: E402
+from utils.text_matcher import KeywordMatcher, PatternMatcher  # noqa: E402
+
+SAMPLE_MESSAGES = [
+    "早安大家 今天要不要一起打遊戲",
+    "hello everyone, anyone up for a match tonight?",
+    "這首歌好好聽 可以加到歌單嗎",
+    "lol that was so close, gg wp",
+    "有人知道明天的活動幾點開始嗎？",
+    "I just finished my homework finally",
+    "晚點來開語音 我先去吃飯",
+    "check out my new drawing in #art",
+    "wwwww 笑死",
+    "can someone help me set up the bot permissions?",
+]
+NOISY_MESSAGES = [
+    "you are so stupid lol",
+    "free nitro giveaway click here",
+    "claim your reward now, verify account",
+    "what the fuck is this",
+    "earn money working from home with bitcoin mining",
+]
+
+
+def load_words():
+    try:
+        with open(os.path.join(ROOT, 'antiraid_config.json'), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return config.get('profanity_words') or config.get('default_profanity_words', [])
+    except (OSError, ValueError):
+        return ["fuck", "shit", "bitch", "stupid", "idiot"]
+
+
+def build_corpus(count, noisy_ratio=0.05):
+    rng = random.Random(42)
+    corpus = []
+    for _ in range(count):
+        pool = NOISY_MESSAGES if rng.random() < noisy_ratio else SAMPLE_MESSAGES
+        corpus.append(rng.choice(pool).lower())
+    return corpus
+
+
+def legacy_check(words, patterns, text):
+    found_profanity = [w for w in words if w.lower() in text]
+    found_scam = [p for p in patterns if re.search(p, text)]
+    return found_profanity, found_scam
+
+
+def compiled_check(keywords, scams, text):
+    return keywords.find_all(text), scams.find_all(text)
+
+
+def bench(label, fn, corpus, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    per_message_us = best / len(corpus) * 1e6
+    print(f"{label:<10} {best * 1000:9.2f} ms  {per_message_us:7.2f} µs/訊息")
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    words = set(load_words())
+    corpus = build_corpus(count)
+    keywords = KeywordMatcher(words)
+    scams = PatternMatcher(SCAM_PATTERNS)
+
+    # 結果必須一致（命中與否）
+    for text in corpus:
+        old_p, old_s = legacy_check(words, SCAM_PATTERNS, text)
+        new_p, new_s = compiled_check(keywords, scams, text)
+        assert bool(old_p) == bool(new_p), text
+        assert sorted(old_s) == sorted(new_s), text
+
+    print(f"{count} 則訊息，{len(words)} 個髒話詞彙，{len(SCAM_PATTERNS)} 個詐騙模式")
+    legacy = bench("逐一比對", lambda t: legacy_check(words, SCAM_PATTERNS, t), corpus)
+    compiled = bench("編譯比對", lambda t: compiled_check(keywords, scams, t), corpus)
+    print(f"加速 {legacy / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
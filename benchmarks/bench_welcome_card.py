@@ -0,0 +1,105 @@
+"""
+歡迎卡片繪製效能測試：位移重畫描邊 + 逐字繪製（舊寫法） vs stroke_width + 字型分段排版（TextLayout）
+執行方式: python benchmarks/bench_welcome_card.py [次數]
+"""
+
+import os
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # 範本與字型以工作目錄為準
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from utils import welcome_card  # noqa: E402
+from utils.text_layout import is_emoji  # noqa: E402
+
+DISPLAY_NAME = "Akane-Ko ✨"
+GUILD_NAME = "茜子的秘密基地 ☕🎵 Community"
+
+
+def make_avatar():
+    buffer = BytesIO()
+    Image.new("RGB", (1024, 1024), "#6A5ACD").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def legacy_outline(draw, pos, text, font, fill, outline_color, outline_width):
+    x, y = pos
+    for ox in range(-outline_width, outline_width + 1):
+        for oy in range(-outline_width, outline_width + 1):
+            if ox == 0 and oy == 0:
+                continue
+            draw.text((x + ox, y + oy), text, font=font, fill=outline_color)
+    draw.text((x, y), text, font=font, fill=fill)
+
+
+def legacy_text(image, assets):
+    """舊寫法：每個字串畫 169 次，伺服器名稱逐字繪製"""
+    draw = ImageDraw.Draw(image)
+    fonts = assets.fonts
+    outline = welcome_card.OUTLINE_WIDTH
+    legacy_outline(draw, (776.6, 180.8), "Hello!", fonts['hello'], "#FF914D", "black", outline)
+    legacy_outline(draw, (776.6, 373.2), "歡迎......", fonts['welcome'], "#FFFFFF", "black", outline)
+    legacy_outline(draw, (47.9, 720.5), DISPLAY_NAME, fonts['username'], "#FFD600", "black", outline)
+    legacy_outline(draw, (47.9, 820.5), "進來", fonts['username'], "#FFD600", "black", outline)
+    x = 47.9 + fonts['username'].getlength("進來")
+    for ch in GUILD_NAME + "!":
+        font = assets.symbol_font if assets.symbol_font and is_emoji(ch) else fonts['username']
+        legacy_outline(draw, (x, 820.5), ch, font, "#FFD600", "black", outline)
+        x += font.getlength(ch)
+
+
+def layout_text(image, assets):
+    draw = ImageDraw.Draw(image)
+    stroke = {'stroke_width': welcome_card.OUTLINE_WIDTH, 'stroke_fill': "black"}
+    assets.layouts['hello'].draw(draw, (776.6, 180.8), "Hello!", "#FF914D", **stroke)
+    assets.layouts['welcome'].draw(draw, (776.6, 373.2), "歡迎......", "#FFFFFF", **stroke)
+    assets.layouts['username'].draw(draw, (47.9, 720.5), DISPLAY_NAME, "#FFD600", **stroke)
+    assets.layouts['username'].draw(draw, (47.9, 820.5), f"進來{GUILD_NAME}!", "#FFD600", **stroke)
+
+
+def legacy_card(avatar_bytes):
+    """舊流程：每次重新讀取範本與字型、建立遮罩，再繪製文字與編碼"""
+    assets = welcome_card.CardAssets()
+    assets.get()
+    image = assets.base
+    avatar = Image.open(BytesIO(avatar_bytes)).resize((welcome_card.AVATAR_SIZE,) * 2).convert("RGBA")
+    image.paste(avatar, welcome_card.AVATAR_POSITION, assets.mask)
+    legacy_text(image, assets)
+    image.save(BytesIO(), format='PNG')  # 舊流程另外存一份 test_welcome_card.png
+    image.save(BytesIO(), format='PNG')
+
+
+def bench(label, fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<14} {best * 1000:9.2f} ms")
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    assets = welcome_card.get_assets()
+    avatar = make_avatar()
+    info = {'display_name': DISPLAY_NAME, 'guild_name': GUILD_NAME, 'avatar': avatar}
+
+    print(f"文字繪製（{len(GUILD_NAME)} 字伺服器名稱，描邊 {welcome_card.OUTLINE_WIDTH} px），取 {repeat} 次最佳")
+    legacy = bench("位移描邊", lambda: legacy_text(assets.base.copy(), assets), repeat)
+    layout = bench("stroke_width", lambda: layout_text(assets.base.copy(), assets), repeat)
+    print(f"加速 {legacy / layout:.1f}x")
+
+    print("整張卡片（含頭像與 PNG 編碼）")
+    legacy = bench("舊流程", lambda: legacy_card(avatar), repeat)
+    current = bench("render_card", lambda: welcome_card.render_card(info), repeat)
+    print(f"加速 {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
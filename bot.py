@@ -9,6 +9,7 @@ from discord.ext import commands
 from discord import app_commands
 import logging.handlers
 from datetime import datetime
+from utils.dispatch import get_pipeline
 
 # 載入 .env 檔案
 load_dotenv()
@@ -73,8 +74,9 @@ def setup_logging():
     logger = logging.getLogger('Bot')
     logger.info("Logging 系統已設定完成")
 
-# 初始化 logging
-setup_logging()
+# 初始化 logging（繪製卡片的工作程序會以 __mp_main__ 重新匯入本檔，只在主程式設定）
+if __name__ == "__main__":
+    setup_logging()
 logger = logging.getLogger('Bot')
 
 # 載入設定
@@ -151,6 +153,11 @@ async def on_ready():
     except Exception as e:
         logger.error(f"同步 slash commands 失敗: {e}")
 
+@bot.event
+async def on_message(message):
+    """所有訊息經由共用的處理流程（各 cog 註冊的階段 + 前綴指令）"""
+    await get_pipeline(bot).dispatch(message)
+
 @bot.event
 async def on_guild_join(guild):
     """加入新伺服器時的事件"""
@@ -240,6 +247,14 @@ async def main():
         await bot.start(token)
     except Exception as e:
         logger.error(f"Bot 啟動失敗: {e}")
+    finally:
+        # 關閉時卸載 cogs，讓各 cog 在 cog_unload 中寫回資料
+        if not bot.is_closed():
+            await bot.close()
+        # 寫入剩餘資料並關閉 SQLite 資料庫
+        storage = getattr(bot, 'storage', None)
+        if storage is not None:
+            storage.close()
 
 # 執行主程式
 if __name__ == "__main__":
@@ -7,91 +7,49 @@ import random
 import asyncio
 import logging
 from collections import deque
+from utils.storage import get_storage
+from utils.ledger import Ledger, InsufficientFunds
+from utils.dispatch import get_pipeline, STAGE_REPLY, HANDLED
 
 # 設定 logger
 logger = logging.getLogger('QuestionCog')
 
+COINS_NAMESPACE = 'coins'
+
 class QuestionCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.coins = {}
+        self.storage = get_storage(bot)
+        self.ledger = Ledger(self.storage, COINS_NAMESPACE)
         self.questions = {}
         self.processed_messages = set()
         self.max_processed_messages = 1000  # 限制已處理訊息的最大數量
-        self.load_coins()  # 加載金幣數據
+        get_pipeline(bot).register('question_reply', STAGE_REPLY, self.on_question_reply)
 
-    def load_coins(self):
-        """載入金幣資料"""
-        try:
-            with open('coins.json', 'r', encoding='utf-8') as f:
-                self.coins = json.load(f)
-                logger.info("Loaded coins data: %s", self.coins)  # 顯示加載的金幣數據
-        except FileNotFoundError:
-            logger.info("coins.json not found, creating a new one.")
-            self.coins = {}
-        except json.JSONDecodeError as e:
-            logger.warning(f"coins.json is corrupted: {e}, initializing new data.")
-            self.coins = {}
-        except PermissionError:
-            logger.error("No permission to read coins.json")
-            self.coins = {}
-        except Exception as e:
-            logger.error(f"Error loading coins.json: {e}")
-            self.coins = {}
+    def cog_unload(self):
+        get_pipeline(self.bot).unregister('question_reply')
 
-    def save_coins(self):
-        """保存金幣資料"""
+    async def update_coins(self, user_id, amount, reason='question'):
+        """發放金幣，回傳新的金幣數量"""
         try:
-            logger.debug("Saving coins data to coins.json: %s", self.coins)  # 顯示即將保存的金幣數據
-            with open('coins.json', 'w', encoding='utf-8') as f:
-                json.dump(self.coins, f, indent=2, ensure_ascii=False)
-            logger.info("Coins data saved successfully.")
-        except PermissionError:
-            logger.error("No permission to write coins.json")
-        except Exception as e:
-            logger.error(f"Error saving coins data: {e}")
-
-    def save_coins_async(self):
-        """異步保存金幣資料"""
-        try:
-            logger.debug("Saving coins data to coins.json: %s", self.coins)  # 顯示即將保存的金幣數據
-            with open('coins.json', 'w', encoding='utf-8') as f:
-                json.dump(self.coins, f, indent=2, ensure_ascii=False)
-            logger.info("Coins data saved successfully.")
-        except PermissionError:
-            logger.error("No permission to write coins.json")
-        except Exception as e:
-            logger.error(f"Error saving coins data: {e}")
-
-    def update_coins(self, user_id, amount):
-        """更新用戶金幣"""
-        try:
-            user_id_str = str(user_id)
-            logger.debug("正在更新金幣: 用戶 %s 獲得 %s 金幣", user_id_str, amount)  # Debugging line
-            
-            if user_id_str not in self.coins:
-                self.coins[user_id_str] = 0
-            
-            self.coins[user_id_str] += amount
+            logger.debug("正在更新金幣: 用戶 %s 獲得 %s 金幣", user_id, amount)
+            coins = await self.ledger.credit(user_id, amount, reason)
             
             # 限制處理過的訊息數量，避免記憶體過度增長
             if len(self.processed_messages) > 1000:
                 # 保留最新的 500 個訊息 ID
                 self.processed_messages = set(list(self.processed_messages)[-500:])
             
-            logger.debug("金幣已更新: 用戶 %s 的金幣已增加", user_id_str)
+            logger.debug("金幣已更新: 用戶 %s 的金幣已增加", user_id)
+            return coins
         except Exception as e:
             logger.error(f"更新金幣失敗: {e}")
+            return None
 
-    def get_coins(self, user_id):
+    async def get_coins(self, user_id):
         """獲取用戶金幣"""
         try:
-            user_id_str = str(user_id)
-            logger.debug("Fetching coins for user_id: %s", user_id)  # Debug 用，確認抓取的 user_id
-            coins = self.coins.get(user_id_str, 0)
-            logger.debug("Coins data: %s", self.coins)  # Debug 用，確認 self.coins 資料是否完整
-            logger.debug("User %s has %s coins", user_id, coins)  # Debug 用，確認對應金幣數量
-            return coins
+            return await self.ledger.balance(user_id)
         except Exception as e:
             logger.error(f"獲取金幣失敗: {e}")
             return 0
@@ -99,12 +57,7 @@ class QuestionCog(commands.Cog):
     @app_commands.command(name="coin", description="查看自己的金幣餘額")
     async def coin(self, interaction: discord.Interaction):
         try:
-            user_id = str(interaction.user.id)  # 確保 user_id 是字串
-            print(f"Fetching coins for user_id: {user_id}")  # Debug 用，確認抓取的 user_id
-
-            coins = self.coins.get(user_id, 0)  # 從 self.coins 獲取對應用戶的金幣數量
-            print(f"Coins data: {self.coins}")  # Debug 用，確認 self.coins 資料是否完整
-            print(f"User {user_id} has {coins} coins")  # Debug 用，確認對應金幣數量
+            coins = await self.get_coins(interaction.user.id)
 
             # 回傳用戶的金幣餘額
             embed = discord.Embed(
@@ -182,23 +135,19 @@ class QuestionCog(commands.Cog):
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        
+    async def on_question_reply(self, message):
+        """訊息處理流程的回覆路由階段：處理對問題的回答"""
         if message.id in self.processed_messages:
             return
 
         # 檢查是否為回覆訊息且回覆的是問題
         if message.reference and message.reference.message_id in self.questions:
             question_data = self.questions[message.reference.message_id]
-            
+
             if message.content.lower() == question_data["answer"]:
                 reward = question_data["reward"]
                 await message.channel.send(f"{message.author.mention} 答對了！獲得 {reward} 金幣！ 🎉")
-                self.update_coins(message.author.id, reward)  # 更新金幣
-                self.save_coins()  # 立即保存金幣
+                await self.update_coins(message.author.id, reward)  # 更新金幣
                 del self.questions[message.reference.message_id]
             else:
                 await message.channel.send(f"{message.author.mention} 答錯了，請再試一次！")
@@ -210,15 +159,7 @@ class QuestionCog(commands.Cog):
             if len(self.processed_messages) > self.max_processed_messages:
                 self.processed_messages = set(list(self.processed_messages)[-500:])
             
-            return  # 如果是問題回覆，直接返回，不再處理其他命令
-            
-        try:
-            # 只處理非回覆訊息的其他命令
-            await self.bot.process_commands(message)
-        except Exception as e:
-            # 忽略其他命令處理過程中的錯誤
-            logger.error(f"Error processing commands: {e}")
-            pass
+            return HANDLED  # 如果是問題回覆，不再處理其他階段與命令
 
     @app_commands.command(name="give", description="將自己的金幣轉給其他人")
     async def give(self, interaction: discord.Interaction, recipient: discord.User, amount: int):
@@ -241,17 +182,10 @@ class QuestionCog(commands.Cog):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
-            sender_id = str(interaction.user.id)
-            recipient_id = str(recipient.id)
-
-            # 確保發送者和接收者的金幣數據存在
-            if sender_id not in self.coins:
-                self.coins[sender_id] = 0
-            if recipient_id not in self.coins:
-                self.coins[recipient_id] = 0
-
-            # 驗證發送者是否有足夠的金幣
-            if self.coins[sender_id] < amount:
+            # 扣款與入帳在同一交易內完成，金幣不足時不會有任何變更
+            try:
+                await self.ledger.transfer(interaction.user.id, recipient.id, amount, 'give')
+            except InsufficientFunds:
                 embed = discord.Embed(
                     title="❌ 金幣不足",
                     description=f"{interaction.user.mention} 你的金幣不足！",
@@ -260,12 +194,6 @@ class QuestionCog(commands.Cog):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
-            # 更新金幣數量
-            self.coins[sender_id] -= amount
-            self.coins[recipient_id] += amount
-
-            await self.save_coins()  # 保存金幣資料到文件
-            
             embed = discord.Embed(
                 title="✅ 轉帳成功",
                 description=f"{interaction.user.mention} 將 **{amount}** 金幣轉給了 {recipient.mention}！",
@@ -286,9 +214,11 @@ class QuestionCog(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def clean_coin(self, interaction: discord.Interaction, target: discord.User):
         try:
-            target_id = str(target.id)
-
-            if target_id not in self.coins:
+            row = await self.storage.fetchone(
+                "SELECT 1 FROM balances WHERE namespace = ? AND user_id = ?",
+                (COINS_NAMESPACE, target.id)
+            )
+            if not row:
                 embed = discord.Embed(
                     title="⚠️ 無金幣",
                     description=f"{target.mention} 目前沒有金幣！",
@@ -297,8 +227,7 @@ class QuestionCog(commands.Cog):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
-            self.coins[target_id] = 0
-            await self.save_coins()  # 保存金幣資料
+            await self.ledger.set_balance(target.id, 0, 'clean_coin')
             
             embed = discord.Embed(
                 title="✅ 清空成功",
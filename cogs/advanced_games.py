@@ -8,99 +8,74 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List
+from utils.storage import get_storage
+from utils.ledger import Ledger, InsufficientFunds
+from utils.ranking import get_rankings
+from utils.cooldowns import get_cooldowns, format_remaining
 
 logger = logging.getLogger('AdvancedGames')
 
+ECONOMY_NAMESPACE = 'economy'
+DAILY_COOLDOWN = 86400
+WORK_COOLDOWN = 300
+
+# /rank 可查詢的排行榜: value -> (種類, 鍵, 顯示名稱, 單位)
+RANK_BOARDS = {
+    'economy': ('balance', ECONOMY_NAMESPACE, "金幣排行榜", "金幣"),
+    'coins': ('balance', 'coins', "答題金幣排行榜", "金幣"),
+    'activity': ('activity', None, "活躍度排行榜", "訊息"),
+    'guess_number': ('wins', 'guess_number', "猜數字排行榜", "勝場"),
+    'rps': ('wins', 'rps', "剪刀石頭布排行榜", "勝場"),
+    'minesweeper': ('wins', 'minesweeper', "踩地雷排行榜", "破關次數"),
+    'tictactoe': ('wins', 'tictactoe', "井字遊戲排行榜", "勝場"),
+}
+
 class AdvancedGames(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.active_games = {}
-        self.economy_data = {}
-        self.load_economy_data()
-
-    def load_economy_data(self):
-        try:
-            with open('economy.json', 'r', encoding='utf-8') as f:
-                self.economy_data = json.load(f)
-        except FileNotFoundError:
-            logger.info("[AdvancedGames] economy.json not found, creating new file")
-            self.economy_data = {}
-        except json.JSONDecodeError as e:
-            logger.error(f"[AdvancedGames] economy.json format error: {e}")
-            self.economy_data = {}
-        except PermissionError:
-            logger.error("[AdvancedGames] No permission to read economy.json")
-            self.economy_data = {}
-        except Exception as e:
-            logger.error(f"[AdvancedGames] Error loading economy data: {e}")
-            self.economy_data = {}
-
-    def save_economy_data(self):
-        try:
-            with open('economy.json', 'w', encoding='utf-8') as f:
-                json.dump(self.economy_data, f, ensure_ascii=False, indent=2)
-        except PermissionError:
-            logger.error("[AdvancedGames] No permission to write economy.json")
-        except Exception as e:
-            logger.error(f"[AdvancedGames] Error saving economy data: {e}")
+        self.storage = get_storage(bot)
+        self.rankings = get_rankings(bot)
+        self.cooldowns = get_cooldowns(bot)
+        self.ledger = Ledger(self.storage, ECONOMY_NAMESPACE)
 
-    def get_user_balance(self, user_id: int) -> int:
+    async def get_user_balance(self, user_id: int) -> int:
         try:
-            return self.economy_data.get(str(user_id), 0)
+            return await self.ledger.balance(user_id)
         except Exception as e:
             logger.error(f"[AdvancedGames] Error getting user balance: {e}")
             return 0
 
-    def add_user_balance(self, user_id: int, amount: int):
-        try:
-            user_id_str = str(user_id)
-            if user_id_str not in self.economy_data:
-                self.economy_data[user_id_str] = 0
-            self.economy_data[user_id_str] += amount
-            self.save_economy_data()
-        except Exception as e:
-            logger.error(f"[AdvancedGames] Error adding user balance: {e}")
-
     @app_commands.command(name="每日簽到", description="每日簽到獲得金幣")
     async def daily(self, interaction: discord.Interaction):
         try:
             user_id = interaction.user.id
-            user_id_str = str(user_id)
-            
+
             # 檢查是否已經簽到
-            last_daily = self.economy_data.get(f"{user_id_str}_last_daily")
-            if last_daily:
-                try:
-                    last_daily_date = datetime.fromisoformat(last_daily)
-                    if datetime.now() - last_daily_date < timedelta(days=1):
-                        remaining = timedelta(days=1) - (datetime.now() - last_daily_date)
-                        hours = int(remaining.total_seconds() // 3600)
-                        minutes = int((remaining.total_seconds() % 3600) // 60)
-                        
-                        embed = discord.Embed(
-                            title="⏰ 今日已簽到",
-                            description=f"你今天已經簽到過了！還需要等待 **{hours}小時{minutes}分鐘**",
-                            color=discord.Color.orange()
-                        )
-                        await interaction.response.send_message(embed=embed, ephemeral=True)
-                        return
-                except ValueError as e:
-                    logger.error(f"[AdvancedGames] Date parsing error: {e}")
-                    # 如果日期格式錯誤，清除舊數據
-                    self.economy_data.pop(f"{user_id_str}_last_daily", None)
+            remaining = await self.cooldowns.check_and_set(user_id, 'daily', DAILY_COOLDOWN)
+            if remaining:
+                embed = discord.Embed(
+                    title="⏰ 今日已簽到",
+                    description=f"你今天已經簽到過了！還需要等待 **{format_remaining(remaining)}**",
+                    color=discord.Color.orange()
+                )
+                await interaction.response.send_message(embed=embed, ephemeral=True)
+                return
 
             # 簽到獎勵
             reward = random.randint(50, 150)
-            self.add_user_balance(user_id, reward)
-            self.economy_data[f"{user_id_str}_last_daily"] = datetime.now().isoformat()
-            self.save_economy_data()
+            try:
+                new_balance = await self.ledger.credit(user_id, reward, 'daily')
+            except Exception:
+                await self.cooldowns.reset(user_id, 'daily')
+                raise
 
             embed = discord.Embed(
                 title="🎉 每日簽到成功！",
                 description=f"你獲得了 **{reward}** 金幣！",
                 color=discord.Color.green()
             )
-            embed.add_field(name="當前餘額", value=f"💰 {self.get_user_balance(user_id)} 金幣")
+            embed.add_field(name="當前餘額", value=f"💰 {new_balance} 金幣")
             embed.set_footer(text=f"簽到者: {interaction.user.display_name}")
             
             await interaction.response.send_message(embed=embed)
@@ -117,7 +92,7 @@ class AdvancedGames(commands.Cog):
     @app_commands.command(name="餘額", description="查看你的金幣餘額")
     async def balance(self, interaction: discord.Interaction):
         try:
-            balance = self.get_user_balance(interaction.user.id)
+            balance = await self.get_user_balance(interaction.user.id)
             embed = discord.Embed(
                 title="💰 金幣餘額",
                 description=f"**{interaction.user.display_name}** 的餘額",
@@ -157,8 +132,10 @@ class AdvancedGames(commands.Cog):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
-            sender_balance = self.get_user_balance(interaction.user.id)
-            if sender_balance < amount:
+            # 執行轉帳（扣款與入帳在同一交易內完成）
+            try:
+                new_balance, _ = await self.ledger.transfer(interaction.user.id, user.id, amount)
+            except InsufficientFunds:
                 embed = discord.Embed(
                     title="❌ 餘額不足",
                     description="你的餘額不足以完成此轉帳",
@@ -167,17 +144,13 @@ class AdvancedGames(commands.Cog):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
-            # 執行轉帳
-            self.add_user_balance(interaction.user.id, -amount)
-            self.add_user_balance(user.id, amount)
-
             embed = discord.Embed(
                 title="💸 轉帳成功",
                 description=f"**{interaction.user.display_name}** 轉帳給 **{user.display_name}**",
                 color=discord.Color.green()
             )
             embed.add_field(name="轉帳金額", value=f"💰 {amount} 金幣")
-            embed.add_field(name="你的餘額", value=f"💰 {self.get_user_balance(interaction.user.id)} 金幣")
+            embed.add_field(name="你的餘額", value=f"💰 {new_balance} 金幣")
             
             await interaction.response.send_message(embed=embed)
             
@@ -207,16 +180,6 @@ class AdvancedGames(commands.Cog):
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
-            user_balance = self.get_user_balance(interaction.user.id)
-            if user_balance < amount:
-                embed = discord.Embed(
-                    title="❌ 餘額不足",
-                    description="你的餘額不足以進行此賭注",
-                    color=discord.Color.red()
-                )
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-                return
-
             # 擲骰子
             dice1 = random.randint(1, 6)
             dice2 = random.randint(1, 6)
@@ -226,13 +189,24 @@ class AdvancedGames(commands.Cog):
             result = "big" if total >= 7 else "small"
             won = choice.value == result
             
-            # 更新餘額
+            # 更新餘額（下注時必須持有足夠的賭注）
+            try:
+                new_balance = await self.ledger.apply(
+                    interaction.user.id, amount if won else -amount, 'gamble', require=amount
+                )
+            except InsufficientFunds:
+                embed = discord.Embed(
+                    title="❌ 餘額不足",
+                    description="你的餘額不足以進行此賭注",
+                    color=discord.Color.red()
+                )
+                await interaction.response.send_message(embed=embed, ephemeral=True)
+                return
+
             if won:
-                self.add_user_balance(interaction.user.id, amount)
                 result_text = "🎉 恭喜你贏了！"
                 color = discord.Color.green()
             else:
-                self.add_user_balance(interaction.user.id, -amount)
                 result_text = "😢 很遺憾，你輸了"
                 color = discord.Color.red()
 
@@ -244,7 +218,7 @@ class AdvancedGames(commands.Cog):
             embed.add_field(name="骰子", value=f"🎲 {dice1} + {dice2} = **{total}**")
             embed.add_field(name="你的選擇", value=f"你選擇了: **{choice.name}**")
             embed.add_field(name="結果", value=f"實際結果: **{'大' if result == 'big' else '小'}**")
-            embed.add_field(name="餘額變化", value=f"💰 {self.get_user_balance(interaction.user.id)} 金幣")
+            embed.add_field(name="餘額變化", value=f"💰 {new_balance} 金幣")
             
             await interaction.response.send_message(embed=embed)
             
@@ -261,11 +235,7 @@ class AdvancedGames(commands.Cog):
     async def leaderboard(self, interaction: discord.Interaction):
         try:
             # 排序用戶
-            sorted_users = sorted(
-                self.economy_data.items(),
-                key=lambda x: x[1] if isinstance(x[1], int) else 0,
-                reverse=True
-            )[:10]
+            sorted_users = await self.rankings.board('balance', ECONOMY_NAMESPACE).top(10)
 
             embed = discord.Embed(
                 title="🏆 金幣排行榜",
@@ -281,18 +251,14 @@ class AdvancedGames(commands.Cog):
                 )
             else:
                 for i, (user_id, balance) in enumerate(sorted_users, 1):
-                    if isinstance(balance, int):  # 只顯示金幣餘額，不是其他數據
-                        try:
-                            user = self.bot.get_user(int(user_id))
-                            username = user.display_name if user else f"用戶 {user_id}"
-                            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-                            embed.add_field(
-                                name=f"{medal} {username}",
-                                value=f"💰 {balance} 金幣",
-                                inline=False
-                            )
-                        except (ValueError, KeyError):
-                            continue
+                    user = self.bot.get_user(user_id)
+                    username = user.display_name if user else f"用戶 {user_id}"
+                    medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+                    embed.add_field(
+                        name=f"{medal} {username}",
+                        value=f"💰 {balance} 金幣",
+                        inline=False
+                    )
 
             await interaction.response.send_message(embed=embed)
             
@@ -305,23 +271,60 @@ class AdvancedGames(commands.Cog):
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @app_commands.command(name="rank", description="查詢自己或其他用戶在排行榜上的名次")
+    @app_commands.describe(board="要查詢的排行榜", user="要查詢的用戶（預設為自己）")
+    @app_commands.choices(board=[
+        app_commands.Choice(name=name, value=value)
+        for value, (_, _, name, _) in RANK_BOARDS.items()
+    ])
+    async def rank(self, interaction: discord.Interaction, board: app_commands.Choice[str], user: discord.User = None):
+        try:
+            target = user or interaction.user
+            kind, key, title, unit = RANK_BOARDS[board.value]
+            if kind == 'activity':
+                if not interaction.guild:
+                    await interaction.response.send_message("❌ 活躍度排行只能在伺服器中查詢", ephemeral=True)
+                    return
+                key = interaction.guild.id
+            ranked = self.rankings.board(kind, key)
+
+            position, score = await ranked.rank(target.id)
+            if position is None:
+                embed = discord.Embed(
+                    title=f"📊 {title}",
+                    description=f"**{target.display_name}** 目前還沒有紀錄",
+                    color=discord.Color.orange()
+                )
+            else:
+                embed = discord.Embed(
+                    title=f"📊 {title}",
+                    description=f"**{target.display_name}** 目前排名第 **{position}** 名（共 {await ranked.count()} 人）",
+                    color=discord.Color.gold()
+                )
+                embed.add_field(name=unit, value=str(score))
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"[AdvancedGames] rank command error: {e}")
+            embed = discord.Embed(
+                title="❌ 查詢失敗",
+                description="查詢名次時發生錯誤，請稍後再試",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @app_commands.command(name="工作", description="工作賺取金幣")
     async def work(self, interaction: discord.Interaction):
         user_id = interaction.user.id
-        user_id_str = str(user_id)
-        
+
         # 檢查工作冷卻時間
-        last_work = self.economy_data.get(f"{user_id_str}_last_work")
-        if last_work:
-            last_work_time = datetime.fromisoformat(last_work)
-            if datetime.now() - last_work_time < timedelta(minutes=5):
-                remaining = timedelta(minutes=5) - (datetime.now() - last_work_time)
-                minutes = int(remaining.total_seconds() // 60)
-                await interaction.response.send_message(
-                    f"⏰ 你還需要休息 {minutes} 分鐘才能再次工作",
-                    ephemeral=True
-                )
-                return
+        remaining = await self.cooldowns.check_and_set(user_id, 'work', WORK_COOLDOWN)
+        if remaining:
+            await interaction.response.send_message(
+                f"⏰ 你還需要休息 {format_remaining(remaining)} 才能再次工作",
+                ephemeral=True
+            )
+            return
 
         # 工作獎勵
         jobs = [
@@ -336,9 +339,11 @@ class AdvancedGames(commands.Cog):
         job_name, min_pay, max_pay = random.choice(jobs)
         earnings = random.randint(min_pay, max_pay)
         
-        self.add_user_balance(user_id, earnings)
-        self.economy_data[f"{user_id_str}_last_work"] = datetime.now().isoformat()
-        self.save_economy_data()
+        try:
+            new_balance = await self.ledger.credit(user_id, earnings, 'work')
+        except Exception:
+            await self.cooldowns.reset(user_id, 'work')
+            raise
 
         embed = discord.Embed(
             title="💼 工作完成！",
@@ -346,7 +351,7 @@ class AdvancedGames(commands.Cog):
             color=discord.Color.blue()
         )
         embed.add_field(name="收入", value=f"💰 +{earnings} 金幣")
-        embed.add_field(name="當前餘額", value=f"💰 {self.get_user_balance(user_id)} 金幣")
+        embed.add_field(name="當前餘額", value=f"💰 {new_balance} 金幣")
         embed.set_footer(text="5分鐘後可以再次工作")
         
         await interaction.response.send_message(embed=embed)
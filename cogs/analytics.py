@@ -6,112 +6,42 @@ import os
 import logging
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
+from utils.storage import get_storage
+from utils.ranking import get_rankings
+from utils.dispatch import get_pipeline, STAGE_ANALYTICS
 
 logger = logging.getLogger('Analytics')
 
 class Analytics(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.analytics_data = {}
-        self.load_analytics_data()
+        self.storage = get_storage(bot)
+        self.rankings = get_rankings(bot)
+        self.pipeline = get_pipeline(bot)
+        self.pipeline.register('analytics', STAGE_ANALYTICS, self.on_pipeline_message, always=True)
 
-    def load_analytics_data(self):
-        """載入分析數據"""
-        try:
-            with open('analytics.json', 'r', encoding='utf-8') as f:
-                self.analytics_data = json.load(f)
-        except FileNotFoundError:
-            self.analytics_data = {
-                'message_counts': {},
-                'user_activity': {},
-                'channel_activity': {},
-                'command_usage': {},
-                'join_dates': {}
-            }
-
-    def save_analytics_data(self):
-        """儲存分析數據"""
-        with open('analytics.json', 'w', encoding='utf-8') as f:
-            json.dump(self.analytics_data, f, ensure_ascii=False, indent=2)
+    def cog_unload(self):
+        self.pipeline.unregister('analytics')
 
     def record_message(self, guild_id: str, user_id: str, channel_id: str):
-        """記錄訊息"""
-        guild_id_str = str(guild_id)
-        user_id_str = str(user_id)
-        channel_id_str = str(channel_id)
-        date_str = datetime.now().strftime('%Y-%m-%d')
-
-        # 初始化數據結構
-        if guild_id_str not in self.analytics_data['message_counts']:
-            self.analytics_data['message_counts'][guild_id_str] = {}
-        if guild_id_str not in self.analytics_data['user_activity']:
-            self.analytics_data['user_activity'][guild_id_str] = {}
-        if guild_id_str not in self.analytics_data['channel_activity']:
-            self.analytics_data['channel_activity'][guild_id_str] = {}
-
-        # 記錄訊息數量
-        if date_str not in self.analytics_data['message_counts'][guild_id_str]:
-            self.analytics_data['message_counts'][guild_id_str][date_str] = 0
-        self.analytics_data['message_counts'][guild_id_str][date_str] += 1
-
-        # 記錄用戶活動
-        if user_id_str not in self.analytics_data['user_activity'][guild_id_str]:
-            self.analytics_data['user_activity'][guild_id_str][user_id_str] = {
-                'message_count': 0,
-                'last_active': None,
-                'channels': {}
-            }
-        
-        user_data = self.analytics_data['user_activity'][guild_id_str][user_id_str]
-        user_data['message_count'] += 1
-        user_data['last_active'] = datetime.now().isoformat()
-        
-        if channel_id_str not in user_data['channels']:
-            user_data['channels'][channel_id_str] = 0
-        user_data['channels'][channel_id_str] += 1
-
-        # 記錄頻道活動
-        if channel_id_str not in self.analytics_data['channel_activity'][guild_id_str]:
-            self.analytics_data['channel_activity'][guild_id_str][channel_id_str] = 0
-        self.analytics_data['channel_activity'][guild_id_str][channel_id_str] += 1
-
-        self.save_analytics_data()
+        """記錄訊息（排入背景批次寫入）"""
+        now = datetime.now()
+        self.storage.record_message_later(
+            guild_id, user_id, channel_id,
+            now.strftime('%Y-%m-%d'), now.isoformat()
+        )
 
     def record_command(self, guild_id: str, user_id: str, command_name: str):
         """記錄指令使用"""
-        guild_id_str = str(guild_id)
-        user_id_str = str(user_id)
-
-        if guild_id_str not in self.analytics_data['command_usage']:
-            self.analytics_data['command_usage'][guild_id_str] = {}
-
-        if command_name not in self.analytics_data['command_usage'][guild_id_str]:
-            self.analytics_data['command_usage'][guild_id_str][command_name] = {
-                'total_uses': 0,
-                'users': {}
-            }
-
-        cmd_data = self.analytics_data['command_usage'][guild_id_str][command_name]
-        cmd_data['total_uses'] += 1
-
-        if user_id_str not in cmd_data['users']:
-            cmd_data['users'][user_id_str] = 0
-        cmd_data['users'][user_id_str] += 1
-
-        self.save_analytics_data()
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """監聽訊息事件"""
-        if message.author.bot:
-            return
+        self.storage.record_command_later(guild_id, user_id, command_name)
 
+    async def on_pipeline_message(self, message):
+        """訊息處理流程的統計階段"""
         self.record_message(
             message.guild.id if message.guild else 0,
             message.author.id,
             message.channel.id
         )
-        await self.bot.process_commands(message)
 
     @commands.Cog.listener()
     async def on_app_command(self, interaction: discord.Interaction):
@@ -130,7 +60,7 @@ class Analytics(commands.Cog):
         
         try:
             guild = interaction.guild
-            guild_id_str = str(guild.id)
+            storage = self.storage
             
             # 獲取基本統計
             total_members = guild.member_count
@@ -139,12 +69,14 @@ class Analytics(commands.Cog):
             total_roles = len(guild.roles)
             
             # 獲取訊息統計
-            message_data = self.analytics_data.get('message_counts', {}).get(guild_id_str, {})
-            total_messages = sum(message_data.values())
+            row = await storage.fetchone(
+                "SELECT COALESCE(SUM(message_count), 0) FROM daily_messages WHERE guild_id = ?", (guild.id,)
+            )
+            total_messages = row[0]
             
             # 獲取活躍用戶
-            user_data = self.analytics_data.get('user_activity', {}).get(guild_id_str, {})
-            active_users = len(user_data)
+            row = await storage.fetchone("SELECT COUNT(*) FROM user_activity WHERE guild_id = ?", (guild.id,))
+            active_users = row[0]
 
             # 純文字統計
             embed = discord.Embed(
@@ -156,26 +88,37 @@ class Analytics(commands.Cog):
             embed.add_field(name="📊 頻道與角色", value=f"頻道: {total_channels}\n角色: {total_roles}", inline=True)
 
             # 近7天訊息趨勢
-            dates = sorted(message_data.keys())[-7:]
-            message_counts = [message_data.get(date, 0) for date in dates]
-            if dates:
-                trend = "\n".join([f"{date}: {count}" for date, count in zip(dates, message_counts)])
+            recent = await storage.fetchall(
+                "SELECT date, message_count FROM daily_messages WHERE guild_id = ? ORDER BY date DESC LIMIT 7",
+                (guild.id,)
+            )
+            if recent:
+                trend = "\n".join([f"{date}: {count}" for date, count in reversed(recent)])
                 embed.add_field(name="🗓️ 最近7天訊息趨勢", value=trend, inline=False)
             else:
                 embed.add_field(name="🗓️ 最近7天訊息趨勢", value="無數據", inline=False)
 
             # 活躍用戶排行
-            top_users = sorted(user_data.items(), key=lambda x: x[1]['message_count'], reverse=True)[:5]
+            top_users = await self.rankings.board('activity', guild.id).top(5)
             if top_users:
                 leaderboard = []
-                for i, (user_id, data) in enumerate(top_users, 1):
-                    user = guild.get_member(int(user_id))
+                for i, (user_id, message_count) in enumerate(top_users, 1):
+                    user = guild.get_member(user_id)
                     name = user.display_name if user else f"用戶{user_id}"
-                    leaderboard.append(f"{i}. {name}: {data['message_count']} 訊息")
+                    leaderboard.append(f"{i}. {name}: {message_count} 訊息")
                 embed.add_field(name="🏆 最活躍用戶", value="\n".join(leaderboard), inline=False)
             else:
                 embed.add_field(name="🏆 最活躍用戶", value="無數據", inline=False)
 
+            stage_lines = [
+                f"{stage['name']}: 平均 {stage['avg_ms']} ms / 最長 {stage['max_ms']} ms ({stage['calls']} 次)"
+                for stage in self.pipeline.stats()
+            ]
+            embed.add_field(name="⏱️ 訊息處理耗時", value="\n".join(stage_lines), inline=False)
+
+            stats = storage.stats()
+            embed.set_footer(text=f"資料寫入: {stats['commit_count']} 批 / {stats['statement_count']} 筆 | 上次 {stats['last_commit_ms']} ms")
+
             await interaction.followup.send(embed=embed)
         except Exception as e:
             logger.error(f"[server_stats] 伺服器統計失敗: {e}")
@@ -186,19 +129,24 @@ class Analytics(commands.Cog):
     async def user_analysis(self, interaction: discord.Interaction, user: discord.Member):
         await interaction.response.defer()
         
-        guild_id_str = str(interaction.guild.id)
-        user_id_str = str(user.id)
+        guild_id = interaction.guild.id
         
-        user_data = self.analytics_data.get('user_activity', {}).get(guild_id_str, {}).get(user_id_str, {})
+        user_data = await self.storage.fetchone(
+            "SELECT message_count, last_active FROM user_activity WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user.id)
+        )
         
         if not user_data:
             await interaction.followup.send("❌ 沒有找到該用戶的活動數據", ephemeral=True)
             return
         
         # 獲取用戶統計
-        message_count = user_data.get('message_count', 0)
-        last_active = user_data.get('last_active')
-        channels = user_data.get('channels', {})
+        message_count, last_active = user_data
+        channels = await self.storage.fetchall(
+            "SELECT channel_id, message_count FROM user_channel_activity "
+            "WHERE guild_id = ? AND user_id = ? ORDER BY message_count DESC",
+            (guild_id, user.id)
+        )
         
         # 計算活躍度
         if last_active:
@@ -208,10 +156,9 @@ class Analytics(commands.Cog):
             days_since_active = "未知"
         
         # 最常使用的頻道
-        top_channels = sorted(channels.items(), key=lambda x: x[1], reverse=True)[:3]
         channel_names = []
-        for channel_id, count in top_channels:
-            channel = interaction.guild.get_channel(int(channel_id))
+        for channel_id, count in channels[:3]:
+            channel = interaction.guild.get_channel(channel_id)
             channel_names.append(f"{channel.name if channel else '未知頻道'}: {count} 訊息")
         
         # 純文字用戶分析
@@ -229,26 +176,24 @@ class Analytics(commands.Cog):
     @app_commands.command(name="指令統計", description="顯示指令使用統計")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def command_stats(self, interaction: discord.Interaction):
-        guild_id_str = str(interaction.guild.id)
-        command_data = self.analytics_data.get('command_usage', {}).get(guild_id_str, {})
+        # 依使用次數排序指令
+        sorted_commands = await self.storage.fetchall(
+            "SELECT command, SUM(uses) AS total_uses, COUNT(*) FROM command_usage "
+            "WHERE guild_id = ? GROUP BY command ORDER BY total_uses DESC LIMIT 10",
+            (interaction.guild.id,)
+        )
         
-        if not command_data:
+        if not sorted_commands:
             await interaction.response.send_message("❌ 沒有指令使用數據", ephemeral=True)
             return
         
-        # 排序指令
-        sorted_commands = sorted(command_data.items(), key=lambda x: x[1]['total_uses'], reverse=True)
-        
         embed = discord.Embed(
             title="📊 指令使用統計",
             description=f"伺服器: {interaction.guild.name}",
             color=discord.Color.purple()
         )
         
-        for i, (command_name, data) in enumerate(sorted_commands[:10], 1):
-            total_uses = data['total_uses']
-            unique_users = len(data['users'])
-            
+        for i, (command_name, total_uses, unique_users) in enumerate(sorted_commands, 1):
             embed.add_field(
                 name=f"{i}. /{command_name}",
                 value=f"使用次數: {total_uses}\n使用用戶: {unique_users}",
@@ -259,26 +204,21 @@ class Analytics(commands.Cog):
 
     @app_commands.command(name="活躍度排行", description="顯示最活躍的用戶排行")
     async def activity_leaderboard(self, interaction: discord.Interaction):
-        guild_id_str = str(interaction.guild.id)
-        user_data = self.analytics_data.get('user_activity', {}).get(guild_id_str, {})
+        sorted_users = await self.rankings.board('activity', interaction.guild.id).top(10)
         
-        if not user_data:
+        if not sorted_users:
             await interaction.response.send_message("❌ 沒有用戶活動數據", ephemeral=True)
             return
         
-        # 排序用戶
-        sorted_users = sorted(user_data.items(), key=lambda x: x[1]['message_count'], reverse=True)
-        
         embed = discord.Embed(
             title="🏆 活躍度排行榜",
             description=f"伺服器: {interaction.guild.name}",
             color=discord.Color.gold()
         )
         
-        for i, (user_id, data) in enumerate(sorted_users[:10], 1):
-            user = interaction.guild.get_member(int(user_id))
+        for i, (user_id, message_count) in enumerate(sorted_users, 1):
+            user = interaction.guild.get_member(user_id)
             username = user.display_name if user else f"用戶{user_id}"
-            message_count = data['message_count']
             
             medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
             
@@ -1,200 +1,166 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
 import time
 import asyncio
 import logging
-import re
-from collections import defaultdict, deque
+from utils.dispatch import get_pipeline, STAGE_MODERATION, STOP
+from utils.text_matcher import KeywordMatcher, PatternMatcher
+from utils.ratelimit import SlidingWindowLimiter
+from utils.antiraid_config import AntiRaidConfig
+from utils.moderation import ModerationQueue
 
 # 設定 logger
 logger = logging.getLogger('AntiRaid')
 
+# 詐騙訊息模式（合併編譯為一個正規表示式）
+SCAM_PATTERNS = [
+    r'free.*nitro',
+    r'steam.*gift',
+    r'roblox.*robux',
+    r'free.*robux',
+    r'steam.*free',
+    r'nitro.*free',
+    r'gift.*card',
+    r'click.*here',
+    r'verify.*account',
+    r'claim.*reward',
+    r'free.*money',
+    r'earn.*money',
+    r'work.*from.*home',
+    r'bitcoin.*mining',
+    r'crypto.*mining',
+    r'free.*v.*bucks',
+    r'fortnite.*free',
+    r'free.*skins',
+    r'free.*coins',
+    r'free.*gems'
+]
+
 class AntiRaid(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.config_file = 'antiraid_config.json'
-        self.config = self.load_config()
-        self.user_joins = defaultdict(list)  # 用戶加入時間記錄
-        self.message_history = defaultdict(lambda: deque(maxlen=50))  # 訊息歷史
-        self.spam_detection = defaultdict(lambda: {'count': 0, 'last_reset': time.time()})
+        # 設定依伺服器預先建立為物件，訊息處理時直接讀屬性
+        self.settings = AntiRaidConfig(self.config_file)
+        # 滑動視窗計數：垃圾訊息 (伺服器, 用戶)、惡意加入 (伺服器)
+        self.spam_limiter = SlidingWindowLimiter('spam', idle_ttl=600)
+        self.raid_limiter = SlidingWindowLimiter('raid', idle_ttl=3600, max_keys=10_000)
         self.profanity_cache = set()  # 快取髒話列表
-        self.scam_patterns = [
-            r'free.*nitro',
-            r'steam.*gift',
-            r'roblox.*robux',
-            r'free.*robux',
-            r'steam.*free',
-            r'nitro.*free',
-            r'gift.*card',
-            r'click.*here',
-            r'verify.*account',
-            r'claim.*reward',
-            r'free.*money',
-            r'earn.*money',
-            r'work.*from.*home',
-            r'bitcoin.*mining',
-            r'crypto.*mining',
-            r'free.*v.*bucks',
-            r'fortnite.*free',
-            r'free.*skins',
-            r'free.*coins',
-            r'free.*gems'
-        ]
+        self.scam_patterns = list(SCAM_PATTERNS)
+        self.scam_matcher = PatternMatcher(self.scam_patterns)
+        self.profanity_matcher = KeywordMatcher()
         self.load_profanity_words()
         self.kick_counter = {}  # 記錄用戶被踢次數
+        # 刪除、禁言、記錄都交給背景 worker，偵測不等待 Discord 回應
+        self.actions = ModerationQueue(bot)
+        get_pipeline(bot).register('antiraid', STAGE_MODERATION, self.moderate_message)
         logger.info("[AntiRaid] 反惡意系統已啟動")
 
-    def load_config(self):
-        """載入配置檔案"""
-        try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                logger.info("[AntiRaid] 配置檔案載入成功")
-                return config
-        except FileNotFoundError:
-            logger.warning("[AntiRaid] 配置檔案不存在，使用預設配置")
-            config = self.get_default_config()
-            self.save_config(config)
-            return config
-        except json.JSONDecodeError as e:
-            logger.error(f"[AntiRaid] 配置檔案格式錯誤: {e}")
-            logger.info("[AntiRaid] 使用預設配置")
-            config = self.get_default_config()
-            self.save_config(config)
-            return config
-        except Exception as e:
-            logger.error(f"[AntiRaid] 載入配置檔案失敗: {e}")
-            return self.get_default_config()
+    async def cog_unload(self):
+        get_pipeline(self.bot).unregister('antiraid')
+        await self.actions.close()
 
-    def get_default_config(self):
-        """取得預設配置"""
-        return {
-            "enabled": True,
-            "raid_threshold": 5,
-            "raid_time_window": 5,
-            "mute_duration": 300,
-            "spam_threshold": 5,
-            "spam_time_window": 5,
-            "profanity_enabled": True,
-            "profanity_mute_duration": 600,
-            "scam_detection_enabled": True,
-            "scam_mute_duration": 1800,
-            "auto_delete_spam": True,
-            "log_channel_id": None,
-            "admin_role_id": None,
-            "default_profanity_words": [
-                "fuck", "shit", "bitch", "asshole", "dick", "pussy", "cock", "cunt",
-                "motherfucker", "fucker", "bastard", "whore", "slut", "nigger", "nigga",
-                "faggot", "fag", "dyke", "retard", "idiot", "stupid", "dumb", "moron"
-            ],
-            "super_protect_enabled": False,  # 超級防護開關
-            "auto_delete_invite_enabled": False,  # 自動刪除邀請開關
-        }
-
-    def save_config(self, config=None):
-        """保存配置檔案"""
-        if config is None:
-            config = self.config
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-            logger.info("[AntiRaid] 配置檔案保存成功")
-        except PermissionError:
-            logger.error("[AntiRaid] 沒有權限寫入配置檔案")
-        except Exception as e:
-            logger.error(f"[AntiRaid] 保存配置檔案失敗: {e}")
+    def check_config(self):
+        """設定檔被手動修改時重新載入（有間隔限制，可在每則訊息呼叫）"""
+        if self.settings.reload_if_changed():
+            self.load_profanity_words()
+            logger.info("[AntiRaid] 偵測到配置檔案變更，已重新載入")
 
     def load_profanity_words(self):
         """載入髒話列表"""
         try:
-            self.profanity_cache = set(self.config.get('profanity_words', self.config.get('default_profanity_words', [])))
+            self.profanity_cache = set(self.settings.profanity_words)
             logger.debug(f"[AntiRaid] 載入 {len(self.profanity_cache)} 個髒話詞彙")
         except Exception as e:
             logger.error(f"[AntiRaid] 載入髒話列表失敗: {e}")
             self.profanity_cache = set()
+        self.rebuild_profanity_matcher()
+
+    def rebuild_profanity_matcher(self):
+        """髒話列表變更後重新編譯比對器"""
+        self.profanity_matcher = KeywordMatcher(self.profanity_cache)
+
+    def guild_config(self, guild):
+        """取得伺服器的設定（私訊或未知伺服器使用預設值）"""
+        return self.settings.get(guild.id if guild else None)
 
-    async def log_action(self, action, user, reason, duration=None):
-        """記錄反惡意行動"""
-        if not self.config.get('log_channel_id'):
+    def log_action(self, action, user, reason, duration=None, guild=None):
+        """記錄反惡意行動（guild 未指定時使用 user.guild），embed 由佇列合併後送出"""
+        cfg = self.guild_config(guild or getattr(user, 'guild', None))
+        if not cfg.log_channel_id:
             return
         
+        embed = discord.Embed(
+            title="🛡️ 反惡意系統行動",
+            description=f"**行動**: {action}\n**用戶**: {user.mention} ({user.id})\n**原因**: {reason}",
+            color=discord.Color.red(),
+            timestamp=discord.utils.utcnow()
+        )
+        if duration:
+            embed.add_field(name="⏱️ 持續時間", value=f"{duration} 秒", inline=True)
+        embed.set_footer(text=f"用戶: {user.name}")
+        self.actions.log(cfg.log_channel_id, embed)
+
+    async def delete_invite(self, invite, reason):
         try:
-            log_channel = self.bot.get_channel(self.config['log_channel_id'])
-            if log_channel:
-                embed = discord.Embed(
-                    title="🛡️ 反惡意系統行動",
-                    description=f"**行動**: {action}\n**用戶**: {user.mention} ({user.id})\n**原因**: {reason}",
-                    color=discord.Color.red(),
-                    timestamp=discord.utils.utcnow()
-                )
-                if duration:
-                    embed.add_field(name="⏱️ 持續時間", value=f"{duration} 秒", inline=True)
-                embed.set_footer(text=f"用戶: {user.name}")
-                await log_channel.send(embed=embed)
-        except discord.Forbidden:
-            logger.error("[AntiRaid] 沒有權限在記錄頻道發送訊息")
+            await invite.delete(reason=reason)
+            logger.info(f"[AntiRaid] 已刪除邀請: {invite.url}")
         except discord.NotFound:
-            logger.error("[AntiRaid] 記錄頻道不存在")
-        except Exception as e:
-            logger.error(f"[AntiRaid] 記錄行動失敗: {e}")
+            pass
+
+    async def purge_invites(self, guild, reason):
+        """取得伺服器所有邀請，逐一交給 worker 刪除"""
+        invites = await guild.invites()
+        for invite in invites:
+            self.actions.submit(lambda invite=invite: self.delete_invite(invite, reason))
+        logger.info(f"[AntiRaid] 已排入刪除 {len(invites)} 個邀請連結")
 
     def is_admin(self, member):
         """檢查是否為管理員"""
         try:
-            if not self.config.get('admin_role_id'):
+            admin_role_id = self.guild_config(getattr(member, 'guild', None)).admin_role_id
+            if not admin_role_id:
                 return member.guild_permissions.administrator
-            return member.guild_permissions.administrator or any(role.id == self.config['admin_role_id'] for role in member.roles)
+            return member.guild_permissions.administrator or any(role.id == admin_role_id for role in member.roles)
         except Exception as e:
             logger.error(f"[AntiRaid] 檢查管理員權限失敗: {e}")
             return False
 
     @commands.Cog.listener()
     async def on_invite_create(self, invite):
-        if not self.config.get("auto_delete_invite_enabled", False):
+        self.check_config()
+        cfg = self.guild_config(invite.guild)
+        if not cfg.auto_delete_invite_enabled:
             return
-        try:
-            await invite.delete(reason="自動防護: 禁止邀請連結")
-            logger.info(f"[AntiRaid] 已自動刪除邀請: {invite.url}")
-        except Exception as e:
-            logger.error(f"[AntiRaid] 刪除邀請失敗: {e}")
+        self.actions.submit(lambda: self.delete_invite(invite, "自動防護: 禁止邀請連結"))
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
         """監聽成員加入事件"""
-        if not self.config.get('enabled', True):
+        self.check_config()
+        cfg = self.guild_config(member.guild)
+        if not cfg.enabled:
             return
         
         guild_id = member.guild.id
-        current_time = time.time()
         
-        # 記錄用戶加入時間
-        self.user_joins[guild_id].append(current_time)
-        
-        # 清理舊記錄（超過時間窗口）
-        window = self.config.get('raid_time_window', 5)
-        self.user_joins[guild_id] = [t for t in self.user_joins[guild_id] if current_time - t <= window]
-        
-        # 檢查是否達到惡意加入閾值
-        threshold = self.config.get('raid_threshold', 5)
-        if len(self.user_joins[guild_id]) >= threshold:
-            logger.warning(f"[AntiRaid] 檢測到惡意加入行為！{len(self.user_joins[guild_id])} 人在 {window} 秒內加入")
+        # 檢查是否達到惡意加入閾值（處置後重新計數）
+        window = cfg.raid_time_window
+        threshold = cfg.raid_threshold
+        if self.raid_limiter.hit(guild_id, threshold, window):
+            self.raid_limiter.reset(guild_id)
+            logger.warning(f"[AntiRaid] 檢測到惡意加入行為！{threshold} 人在 {window} 秒內加入")
             
-            # 暫時關閉邀請
-            try:
-                invites = await member.guild.invites()
-                for invite in invites:
-                    await invite.delete(reason="反惡意系統：檢測到惡意加入行為")
-                logger.info("[AntiRaid] 已刪除所有邀請連結")
-            except Exception as e:
-                logger.error(f"[AntiRaid] 刪除邀請連結失敗: {e}")
+            # 暫時關閉邀請（背景執行，不阻塞後續加入事件）
+            guild = member.guild
+            self.actions.submit(lambda: self.purge_invites(guild, "反惡意系統：檢測到惡意加入行為"))
             
             # 記錄行動
-            await self.log_action("惡意加入防護", member, f"{len(self.user_joins[guild_id])} 人在 {window} 秒內加入")
+            self.log_action("惡意加入防護", member, f"{threshold} 人在 {window} 秒內加入")
 
         # 超級防護
-        if self.config.get('super_protect_enabled', False):
+        if cfg.super_protect_enabled:
             now = time.time()
             # 7天內新帳號直接踢
             if (now - member.created_at.timestamp()) < 7*24*60*60:
@@ -219,103 +185,68 @@ class AntiRaid(commands.Cog):
                     logger.error(f"[AntiRaid] Kick失敗: {e}")
                 return
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """監聽訊息事件"""
-        if not self.config.get('enabled', True) or message.author.bot:
+    async def moderate_message(self, message):
+        """訊息處理流程的審核階段，訊息被刪除時回傳 STOP"""
+        self.check_config()
+        cfg = self.guild_config(message.guild)
+        if not cfg.enabled or message.author.bot:
             return
         
         # 檢查管理員權限
         if self.is_admin(message.author):
             return
         
-        user_id = message.author.id
-        current_time = time.time()
+        spam_key = (message.guild.id if message.guild else 0, message.author.id)
         
         # 垃圾訊息檢測
-        if self.config.get('spam_threshold'):
-            spam_data = self.spam_detection[user_id]
-            
-            # 重置計數器（如果超過時間窗口）
-            window = self.config.get('spam_time_window', 5)
-            if current_time - spam_data['last_reset'] > window:
-                spam_data['count'] = 0
-                spam_data['last_reset'] = current_time
-            
-            spam_data['count'] += 1
-            threshold = self.config.get('spam_threshold', 5)
+        if cfg.spam_threshold:
+            window = cfg.spam_time_window
+            threshold = cfg.spam_threshold
             
-            if spam_data['count'] >= threshold:
-                logger.warning(f"[AntiRaid] 檢測到垃圾訊息行為！用戶 {message.author.name} 在 {window} 秒內發送 {spam_data['count']} 條訊息")
+            if self.spam_limiter.hit(spam_key, threshold, window):
+                self.spam_limiter.reset(spam_key)
+                logger.warning(f"[AntiRaid] 檢測到垃圾訊息行為！用戶 {message.author.name} 在 {window} 秒內發送 {threshold} 條訊息")
                 
                 # 刪除訊息
-                try:
-                    await message.delete()
-                except:
-                    pass
+                self.actions.delete(message)
                 
                 # 禁言用戶
-                duration = self.config.get('mute_duration', 300)
-                try:
-                    await message.author.timeout(duration=discord.utils.utcnow() + discord.utils.utcnow().replace(second=duration), reason="反惡意系統：垃圾訊息")
-                    await self.log_action("垃圾訊息禁言", message.author, f"在 {window} 秒內發送 {spam_data['count']} 條訊息", duration)
-                except Exception as e:
-                    logger.error(f"[AntiRaid] 禁言用戶失敗: {e}")
-                
-                spam_data['count'] = 0
+                duration = cfg.mute_duration
+                self.actions.timeout(message.author, duration, reason="反惡意系統：垃圾訊息")
+                self.log_action("垃圾訊息禁言", message.author, f"在 {window} 秒內發送 {threshold} 條訊息", duration)
+                return STOP
         
+        content_lower = message.content.lower()
+
         # 髒話檢測
-        if self.config.get('profanity_enabled', True):
-            content_lower = message.content.lower()
-            found_profanity = []
-            
-            for word in self.profanity_cache:
-                if word.lower() in content_lower:
-                    found_profanity.append(word)
-            
+        if cfg.profanity_enabled:
+            found_profanity = self.profanity_matcher.find_all(content_lower)
             if found_profanity:
                 logger.warning(f"[AntiRaid] 檢測到髒話！用戶 {message.author.name} 使用了: {', '.join(found_profanity)}")
                 
                 # 刪除訊息
-                try:
-                    await message.delete()
-                except:
-                    pass
+                self.actions.delete(message)
                 
                 # 禁言用戶（更長時間）
-                duration = self.config.get('profanity_mute_duration', 600)
-                try:
-                    await message.author.timeout(duration=discord.utils.utcnow() + discord.utils.utcnow().replace(second=duration), reason="反惡意系統：使用髒話")
-                    await self.log_action("髒話禁言", message.author, f"使用了髒話: {', '.join(found_profanity)}", duration)
-                except Exception as e:
-                    logger.error(f"[AntiRaid] 禁言用戶失敗: {e}")
+                duration = cfg.profanity_mute_duration
+                self.actions.timeout(message.author, duration, reason="反惡意系統：使用髒話")
+                self.log_action("髒話禁言", message.author, f"使用了髒話: {', '.join(found_profanity)}", duration)
+                return STOP
         
         # 詐騙檢測
-        if self.config.get('scam_detection_enabled', True):
-            content_lower = message.content.lower()
-            found_scam = []
-            
-            for pattern in self.scam_patterns:
-                if re.search(pattern, content_lower):
-                    found_scam.append(pattern)
-            
+        if cfg.scam_detection_enabled:
+            found_scam = self.scam_matcher.find_all(content_lower)
             if found_scam:
                 logger.warning(f"[AntiRaid] 檢測到詐騙訊息！用戶 {message.author.name} 觸發模式: {', '.join(found_scam)}")
                 
                 # 刪除訊息
-                try:
-                    await message.delete()
-                except:
-                    pass
+                self.actions.delete(message)
                 
                 # 禁言用戶（最長時間）
-                duration = self.config.get('scam_mute_duration', 1800)
-                try:
-                    await message.author.timeout(duration=discord.utils.utcnow() + discord.utils.utcnow().replace(second=duration), reason="反惡意系統：詐騙訊息")
-                    await self.log_action("詐騙禁言", message.author, f"觸發詐騙模式: {', '.join(found_scam)}", duration)
-                except Exception as e:
-                    logger.error(f"[AntiRaid] 禁言用戶失敗: {e}")
-        await self.bot.process_commands(message)
+                duration = cfg.scam_mute_duration
+                self.actions.timeout(message.author, duration, reason="反惡意系統：詐騙訊息")
+                self.log_action("詐騙禁言", message.author, f"觸發詐騙模式: {', '.join(found_scam)}", duration)
+                return STOP
 
     # 管理命令
     @app_commands.command(name="antiraid", description="管理反惡意系統")
@@ -348,26 +279,27 @@ class AntiRaid(commands.Cog):
         await interaction.response.defer()
         
         try:
+            guild_id = interaction.guild.id
             if action == "status":
+                cfg = self.guild_config(interaction.guild)
                 embed = discord.Embed(
                     title="🛡️ 反惡意系統狀態",
                     color=discord.Color.blue()
                 )
-                embed.add_field(name="系統狀態", value="✅ 開啟" if self.config.get('enabled', True) else "❌ 關閉", inline=True)
-                embed.add_field(name="惡意加入閾值", value=f"{self.config.get('raid_threshold', 5)} 人/{self.config.get('raid_time_window', 5)} 秒", inline=True)
-                embed.add_field(name="垃圾訊息閾值", value=f"{self.config.get('spam_threshold', 5)} 條/{self.config.get('spam_time_window', 5)} 秒", inline=True)
-                embed.add_field(name="禁言時間", value=f"{self.config.get('mute_duration', 300)} 秒", inline=True)
-                embed.add_field(name="髒話檢測", value="✅ 開啟" if self.config.get('profanity_enabled', True) else "❌ 關閉", inline=True)
-                embed.add_field(name="詐騙檢測", value="✅ 開啟" if self.config.get('scam_detection_enabled', True) else "❌ 關閉", inline=True)
+                embed.add_field(name="系統狀態", value="✅ 開啟" if cfg.enabled else "❌ 關閉", inline=True)
+                embed.add_field(name="惡意加入閾值", value=f"{cfg.raid_threshold} 人/{cfg.raid_time_window} 秒", inline=True)
+                embed.add_field(name="垃圾訊息閾值", value=f"{cfg.spam_threshold} 條/{cfg.spam_time_window} 秒", inline=True)
+                embed.add_field(name="禁言時間", value=f"{cfg.mute_duration} 秒", inline=True)
+                embed.add_field(name="髒話檢測", value="✅ 開啟" if cfg.profanity_enabled else "❌ 關閉", inline=True)
+                embed.add_field(name="詐騙檢測", value="✅ 開啟" if cfg.scam_detection_enabled else "❌ 關閉", inline=True)
                 
-                log_channel = self.bot.get_channel(self.config.get('log_channel_id')) if self.config.get('log_channel_id') else None
+                log_channel = self.bot.get_channel(cfg.log_channel_id) if cfg.log_channel_id else None
                 embed.add_field(name="記錄頻道", value=log_channel.mention if log_channel else "未設定", inline=True)
                 
                 await interaction.followup.send(embed=embed)
                 
             elif action == "enable":
-                self.config['enabled'] = True
-                self.save_config()
+                self.settings.update(guild_id, enabled=True)
                 logger.info("[AntiRaid] 反惡意系統已開啟")
                 embed = discord.Embed(
                     title="✅ 反惡意系統已開啟",
@@ -377,8 +309,7 @@ class AntiRaid(commands.Cog):
                 await interaction.followup.send(embed=embed)
                 
             elif action == "disable":
-                self.config['enabled'] = False
-                self.save_config()
+                self.settings.update(guild_id, enabled=False)
                 logger.info("[AntiRaid] 反惡意系統已關閉")
                 embed = discord.Embed(
                     title="❌ 反惡意系統已關閉",
@@ -398,8 +329,7 @@ class AntiRaid(commands.Cog):
                         )
                         await interaction.followup.send(embed=embed)
                         return
-                    self.config['raid_threshold'] = threshold
-                    self.save_config()
+                    self.settings.update(guild_id, raid_threshold=threshold)
                     logger.info(f"[AntiRaid] 惡意加入閾值已設定為 {threshold}")
                     embed = discord.Embed(
                         title="✅ 閾值設定成功",
@@ -426,8 +356,7 @@ class AntiRaid(commands.Cog):
                         )
                         await interaction.followup.send(embed=embed)
                         return
-                    self.config['mute_duration'] = duration
-                    self.save_config()
+                    self.settings.update(guild_id, mute_duration=duration)
                     logger.info(f"[AntiRaid] 禁言時間已設定為 {duration} 秒")
                     embed = discord.Embed(
                         title="✅ 禁言時間設定成功",
@@ -444,8 +373,7 @@ class AntiRaid(commands.Cog):
                     await interaction.followup.send(embed=embed)
                     
             elif action == "log_channel":
-                self.config['log_channel_id'] = interaction.channel.id
-                self.save_config()
+                self.settings.update(guild_id, log_channel_id=interaction.channel.id)
                 logger.info(f"[AntiRaid] 記錄頻道已設定為 {interaction.channel.name}")
                 embed = discord.Embed(
                     title="✅ 記錄頻道設定成功",
@@ -466,8 +394,7 @@ class AntiRaid(commands.Cog):
                         )
                         await interaction.followup.send(embed=embed)
                         return
-                    self.config['admin_role_id'] = role_id
-                    self.save_config()
+                    self.settings.update(guild_id, admin_role_id=role_id)
                     logger.info(f"[AntiRaid] 管理員角色已設定為 {role.name}")
                     embed = discord.Embed(
                         title="✅ 管理員角色設定成功",
@@ -484,7 +411,14 @@ class AntiRaid(commands.Cog):
                     await interaction.followup.send(embed=embed)
                     
             elif action == "reload":
-                self.config = self.load_config()
+                if not self.settings.load():
+                    embed = discord.Embed(
+                        title="❌ 配置重新載入失敗",
+                        description="配置檔案格式錯誤或不存在，已保留目前的配置",
+                        color=discord.Color.red()
+                    )
+                    await interaction.followup.send(embed=embed)
+                    return
                 self.load_profanity_words()
                 logger.info("[AntiRaid] 配置已重新載入")
                 embed = discord.Embed(
@@ -586,8 +520,8 @@ class AntiRaid(commands.Cog):
                     return
                 
                 self.profanity_cache.add(word.lower())
-                self.config['profanity_words'] = list(self.profanity_cache)
-                self.save_config()
+                self.rebuild_profanity_matcher()
+                self.settings.set_profanity_words(self.profanity_cache)
                 logger.info(f"[AntiRaid] 新增髒話詞彙: {word}")
                 embed = discord.Embed(
                     title="✅ 詞彙新增成功",
@@ -607,8 +541,8 @@ class AntiRaid(commands.Cog):
                     return
                 
                 self.profanity_cache.discard(word.lower())
-                self.config['profanity_words'] = list(self.profanity_cache)
-                self.save_config()
+                self.rebuild_profanity_matcher()
+                self.settings.set_profanity_words(self.profanity_cache)
                 logger.info(f"[AntiRaid] 移除髒話詞彙: {word}")
                 embed = discord.Embed(
                     title="✅ 詞彙移除成功",
@@ -618,9 +552,9 @@ class AntiRaid(commands.Cog):
                 await interaction.followup.send(embed=embed)
                 
             elif action == "reset":
-                self.profanity_cache = set(self.config.get('default_profanity_words', []))
-                self.config['profanity_words'] = list(self.profanity_cache)
-                self.save_config()
+                self.profanity_cache = set(self.settings.default_profanity_words)
+                self.rebuild_profanity_matcher()
+                self.settings.set_profanity_words(self.profanity_cache)
                 logger.info("[AntiRaid] 髒話列表已重設為預設值")
                 embed = discord.Embed(
                     title="✅ 列表重設成功",
@@ -655,12 +589,10 @@ class AntiRaid(commands.Cog):
             await interaction.response.send_message("你不是管理員不能用", ephemeral=True)
             return
         if action.lower() == "on":
-            self.config["super_protect_enabled"] = True
-            self.save_config()
+            self.settings.update(interaction.guild.id, super_protect_enabled=True)
             await interaction.response.send_message("超級防護已開啟", ephemeral=True)
         elif action.lower() == "off":
-            self.config["super_protect_enabled"] = False
-            self.save_config()
+            self.settings.update(interaction.guild.id, super_protect_enabled=False)
             await interaction.response.send_message("超級防護已關閉", ephemeral=True)
         else:
             await interaction.response.send_message("請用 on 或 off", ephemeral=True)
@@ -674,12 +606,10 @@ class AntiRaid(commands.Cog):
             await interaction.response.send_message("你不是管理員不能用", ephemeral=True)
             return
         if action.lower() == "on":
-            self.config["auto_delete_invite_enabled"] = True
-            self.save_config()
+            self.settings.update(interaction.guild.id, auto_delete_invite_enabled=True)
             await interaction.response.send_message("自動刪除邀請已開啟", ephemeral=True)
         elif action.lower() == "off":
-            self.config["auto_delete_invite_enabled"] = False
-            self.save_config()
+            self.settings.update(interaction.guild.id, auto_delete_invite_enabled=False)
             await interaction.response.send_message("自動刪除邀請已關閉", ephemeral=True)
         else:
             await interaction.response.send_message("請用 on 或 off", ephemeral=True)
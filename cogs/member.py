@@ -5,13 +5,14 @@ import json
 import os
 import typing
 import unicodedata
-from PIL import Image, ImageDraw, ImageFont
-import aiohttp
 from io import BytesIO
 from dotenv import load_dotenv
 import asyncio
 import logging
 import io
+from utils.card_cache import CardCache
+from utils.card_renderer import CardRenderer, RendererBusy
+from utils.avatar_service import AvatarService
 
 # 設定 logger
 logger = logging.getLogger('Member')
@@ -26,6 +27,13 @@ class MemberCog(commands.Cog):
         self.autorole_path = 'autorole_settings.json'
         self.channel_settings = self.load_settings()
         self.autorole_settings = self.load_autorole_settings()
+        # 歡迎卡片在獨立的工作程序中繪製，相同的卡片直接使用快取
+        self.card_renderer = CardRenderer(cache=CardCache())
+        self.avatars = AvatarService()
+
+    async def cog_unload(self):
+        self.card_renderer.shutdown()
+        await self.avatars.close()
 
     def load_settings(self):
         try:
@@ -414,6 +422,11 @@ class MemberCog(commands.Cog):
                             content=f'歡迎 **{member.display_name}** 加進來伺服器! 我等不及了❤️',
                             file=discord.File(welcome_card, "welcome_card.png")
                         )
+                except RendererBusy:
+                    # 大量加入時不繪製卡片，只發送文字歡迎
+                    logger.warning(f"[Member] 歡迎卡片排隊過多，改發文字歡迎: {member.guild.name}")
+                    if member_channel:
+                        await member_channel.send(content=f'歡迎 **{member.display_name}** 加進來伺服器! 我等不及了❤️')
                 except Exception as e:
                     logger.error(f"[Member] 生成歡迎卡片失敗: {e}")
                     if admin_channel:
@@ -479,127 +492,26 @@ class MemberCog(commands.Cog):
             return None
 
     async def create_welcome_card(self, member, server_name):
-        """生成歡迎卡片"""
+        """生成歡迎卡片（繪製在工作程序中進行），排隊過多時丟出 RendererBusy"""
         try:
-            # 只用背景圖 '歡迎卡片範本.png'
-            template_path = os.path.join(os.getcwd(), '歡迎卡片範本.png')
-            if not os.path.exists(template_path):
-                logger.error(f"❌ 找不到背景圖片: 歡迎卡片範本.png")
-                return None
-
-            base_image = Image.open(template_path).convert("RGBA")
-
-            # 載入字型
-            font_path = os.path.join(os.getcwd(), 'Arial_1_Bold.ttf')
-            font_path_regular = os.path.join(os.getcwd(), 'Arial_1.ttf')
-            font_hello = ImageFont.truetype(font_path, 117) if os.path.exists(font_path) else ImageFont.load_default()
-            font_welcome = ImageFont.truetype(font_path, 124) if os.path.exists(font_path) else ImageFont.load_default()
-            font_username = ImageFont.truetype(font_path, 92) if os.path.exists(font_path) else ImageFont.load_default()
-            font_server = ImageFont.truetype(font_path_regular, 92) if os.path.exists(font_path_regular) else ImageFont.load_default()
-            # Symbola 字型（for Unicode/emoji）
-            symbola_path = os.path.join(os.getcwd(), 'Symbola.otf')
-            font_symbola = None
-            if os.path.exists(symbola_path):
-                try:
-                    font_symbola = ImageFont.truetype(symbola_path, 92)
-                except Exception as e:
-                    logger.error(f"載入 Symbola.otf 失敗: {e}")
-
-
-            # 載入頭像
-            avatar_url = member.avatar.url if member.avatar else member.default_avatar.url
-            async with aiohttp.ClientSession() as session:
-                async with session.get(avatar_url) as resp:
-                    avatar_bytes = await resp.read()
-            avatar_size = int(556.7)
-            avatar = Image.open(BytesIO(avatar_bytes)).resize((avatar_size, avatar_size)).convert("RGBA")
-
-            # 圓形遮罩（無黑邊）
-            mask = Image.new("L", (avatar_size, avatar_size), 0)
-            draw_circle = ImageDraw.Draw(mask)
-            draw_circle.ellipse((0, 0, avatar_size, avatar_size), fill=255)
-            # 頭像位置依範本左上（約 x:110, y:120）
-            base_image.paste(avatar, (110, 120), mask)
-
-
-            draw = ImageDraw.Draw(base_image)
-
-            # 文字描邊函數
-            def draw_text_with_outline(draw, pos, text, font, fill, outline_color, outline_width):
-                x, y = pos
-                # 描邊
-                for ox in range(-outline_width, outline_width+1):
-                    for oy in range(-outline_width, outline_width+1):
-                        if ox == 0 and oy == 0:
-                            continue
-                        draw.text((x+ox, y+oy), text, font=font, fill=outline_color)
-                # 主文字
-                draw.text((x, y), text, font=font, fill=fill)
-
-            # Hello! 橘色，粗黑邊
-            draw_text_with_outline(draw, (776.6, 180.8), "Hello!", font_hello, "#FF914D", "black", 6)
-            # 歡迎...... 白色，粗黑邊
-            draw_text_with_outline(draw, (776.6, 373.2), "歡迎......", font_welcome, "#FFFFFF", "black", 6)
-            # 使用者名稱 黃色，粗黑邊
-            draw_text_with_outline(draw, (47.9, 720.5), f"{member.display_name}", font_username, "#FFD600", "black", 6)
-            # 進來伺服器名稱 黃色，前綴用原字型，server_name 逐字 fallback Symbola
-            x_base, y_base = 47.9, 820.5
-            prefix = "進來"
-            draw_text_with_outline(draw, (x_base, y_base), prefix, font_username, "#FFD600", "black", 6)
-            prefix_width = font_username.getlength(prefix) if hasattr(font_username, 'getlength') else font_username.getsize(prefix)[0]
-            # 逐字判斷 server_name+! 用哪個字型
-            x = x_base + prefix_width
-            text_to_draw = server_name + "!"
-            def is_emoji(ch):
-                code = ord(ch)
-                # emoji unicode block (partial, most common) + math alphanumeric symbols + letterlike symbols
-                return (
-                    0x1F300 <= code <= 0x1FAFF or  # Misc Symbols and Pictographs, Supplemental Symbols and Pictographs
-                    0x1F000 <= code <= 0x1F02F or  # Mahjong, Domino
-                    0x1F0A0 <= code <= 0x1F0FF or  # Playing Cards
-                    0x1F100 <= code <= 0x1F1FF or  # Enclosed Alphanumeric Supplement
-                    0x1F200 <= code <= 0x1F2FF or  # Enclosed Ideographic Supplement
-                    0x1F600 <= code <= 0x1F64F or  # Emoticons
-                    0x1F680 <= code <= 0x1F6FF or  # Transport and Map
-                    0x2600 <= code <= 0x26FF or    # Misc symbols
-                    0x2700 <= code <= 0x27BF or    # Dingbats
-                    0xFE00 <= code <= 0xFE0F or    # Variation Selectors
-                    0x1F900 <= code <= 0x1F9FF or  # Supplemental Symbols and Pictographs
-                    0x1D400 <= code <= 0x1D7FF or  # Mathematical Alphanumeric Symbols (花體/粗體/斜體/黑體)
-                    0x2100 <= code <= 0x214F       # Letterlike Symbols (ℬ等)
-                )
-
-            for ch in text_to_draw:
-                if font_symbola and is_emoji(ch):
-                    font_to_use = font_symbola
-                else:
-                    font_to_use = font_username
-                draw_text_with_outline(draw, (x, y_base), ch, font_to_use, "#FFD600", "black", 6)
-                if hasattr(font_to_use, 'getlength'):
-                    w = font_to_use.getlength(ch)
-                else:
-                    w = font_to_use.getsize(ch)[0]
-                x += w
-
-            logger.info(f"[WelcomeCard] base_image mode: {base_image.mode}, size: {base_image.size}")
-            # debug: 儲存一份到本地
-            try:
-                base_image.save("test_welcome_card.png")
-            except Exception as file_err:
-                logger.error(f"[WelcomeCard] 儲存本地 test_welcome_card.png 失敗: {file_err}")
-
-            image_bytes = BytesIO()
-            try:
-                base_image.save(image_bytes, format='PNG')
-                image_bytes.seek(0)
-                return image_bytes
-            except Exception as e:
-                logger.error(f"[WelcomeCard] BytesIO 儲存失敗: {e}")
-                return None
+            # 圓形頭像（磁碟快取，取得失敗時使用預設頭像）
+            avatar_bytes = await self.avatars.get(member)
+
+            card = await self.card_renderer.render({
+                'display_name': member.display_name,
+                'guild_name': server_name,
+                'avatar': avatar_bytes,
+            })
+            return BytesIO(card)
+        except RendererBusy:
+            raise
         except Exception as e:
             logger.error("生成歡迎卡時發生錯誤: %s", e)
             return None
 
 # 註冊 Cog
 async def setup(bot):
-    await bot.add_cog(MemberCog(bot))
+    cog = MemberCog(bot)
+    await bot.add_cog(cog)
+    # 預先建立繪製程序並載入卡片素材
+    cog.card_renderer.start()
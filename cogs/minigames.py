@@ -8,57 +8,32 @@ from typing import Dict
 import asyncio
 import logging
 from datetime import datetime, timedelta
+from utils.storage import get_storage
+from utils.ranking import get_rankings
+from utils.dispatch import get_pipeline, STAGE_REPLY, HANDLED
 
 # 設定 logger
 logger = logging.getLogger('MiniGames')
 
-LEADERBOARD_FILE = 'minigames_leaderboard.json'
-
 class LeaderboardManager:
-    def __init__(self, file_path=LEADERBOARD_FILE):
-        self.file_path = file_path
-        self.data = {
-            'guess_number': {},  # user_id: win_count
-            'rps': {},           # user_id: win_count
-            'minesweeper': {},    # user_id: win_count
-            'tictactoe': {}  # 新增
-        }
-        self.load()
-
-    def load(self):
-        if os.path.exists(self.file_path):
-            try:
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-            except Exception as e:
-                logger.error(f"[Leaderboard] 載入失敗: {e}")
-                self.data = {
-                    'guess_number': {},
-                    'rps': {},
-                    'minesweeper': {},
-                    'tictactoe': {}
-                }
+    """小遊戲勝場排行榜（資料存放於共用 SQLite 資料庫，名次以索引查詢）"""
+    def __init__(self, storage, rankings):
+        self.storage = storage
+        self.rankings = rankings
 
-    def save(self):
+    def add_win(self, game: str, user_id: int):
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            self.storage.add_win_later(game.lower(), user_id)
         except Exception as e:
-            logger.error(f"[Leaderboard] 儲存失敗: {e}")
+            logger.error(f"[Leaderboard] 記錄勝場失敗: {e}")
 
-    def add_win(self, game: str, user_id: int):
-        game = game.lower()
-        if game not in self.data:
-            self.data[game] = {}
-        uid = str(user_id)
-        self.data[game][uid] = self.data[game].get(uid, 0) + 1
-        self.save()
-
-    def get_top(self, game: str, top_n=10) -> Dict[str, int]:
-        game = game.lower()
-        if game not in self.data:
-            return {}
-        return dict(sorted(self.data[game].items(), key=lambda x: x[1], reverse=True)[:top_n])
+    async def get_top(self, game: str, top_n=10) -> Dict[str, int]:
+        return {str(uid): wins for uid, wins in await self.rankings.board('wins', game.lower()).top(top_n)}
+
+    async def get_rank(self, game: str, user_id: int):
+        """回傳 (名次, 勝場)，沒有紀錄時回傳 (None, 0)"""
+        position, wins = await self.rankings.board('wins', game.lower()).rank(user_id)
+        return position, wins or 0
 
 # 踩地雷邏輯類別
 class MinesweeperGame:
@@ -180,8 +155,13 @@ class MiniGames(commands.Cog):
         self.bot = bot
         self.guess_numbers = {}  # 存儲用戶的數字
         self.custom_numbers = {}  # 存儲自定義數字遊戲
-        self.leaderboard_manager = LeaderboardManager()
+        self.leaderboard_manager = LeaderboardManager(get_storage(bot), get_rankings(bot))
         self.tictactoe_games = {}
+        # 排在問題回答（QuestionCog）之後
+        get_pipeline(bot).register('guess_number_reply', STAGE_REPLY + 10, self.on_guess_reply)
+
+    def cog_unload(self):
+        get_pipeline(self.bot).unregister('guess_number_reply')
 
     @app_commands.command(name="猜數字", description="開始一場猜數字遊戲")
     @app_commands.describe(mode="選擇遊戲模式")
@@ -251,46 +231,41 @@ class MiniGames(commands.Cog):
             except:
                 logger.error(f"[guess_number] 無法發送錯誤訊息: {e}")
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """監聽訊息來處理猜數字遊戲"""
-        logger.info(f"[on_message] 收到訊息: {message.content}, author: {message.author}, reference: {message.reference}")
+    async def on_guess_reply(self, message):
+        """訊息處理流程的回覆路由階段：處理猜數字遊戲的回覆"""
+        # 檢查是否為回覆訊息
+        if not message.reference:
+            return
         try:
-            # 忽略 Bot 訊息
-            if message.author.bot:
-                logger.info("[on_message] 忽略 bot 訊息")
-                return
-            # 檢查是否為回覆訊息
-            if not message.reference:
-                logger.info("[on_message] 非回覆訊息，忽略")
-                return
-            # 獲取被回覆的訊息
-            try:
-                replied_message = await message.channel.fetch_message(message.reference.message_id)
-            except Exception as e:
-                logger.info(f"[on_message] 無法取得被回覆訊息: {e}")
-                return
+            # 獲取被回覆的訊息（優先使用快取）
+            replied_message = message.reference.resolved
+            if not isinstance(replied_message, discord.Message):
+                try:
+                    replied_message = await message.channel.fetch_message(message.reference.message_id)
+                except Exception as e:
+                    logger.debug(f"[on_guess_reply] 無法取得被回覆訊息: {e}")
+                    return
             # 檢查被回覆的訊息是否為 Bot 的猜數字遊戲訊息
             if replied_message.author.id != self.bot.user.id:
-                logger.info("[on_message] 被回覆訊息不是 bot 發的，忽略")
                 return
             # 嘗試解析數字
             try:
                 guess = int(message.content.strip())
             except ValueError:
-                logger.info("[on_message] 輸入不是有效數字")
+                logger.debug("[on_guess_reply] 輸入不是有效數字")
                 embed = discord.Embed(
                     title="❌ 無效輸入",
                     description="請輸入一個有效的數字",
                     color=discord.Color.red()
                 )
                 await message.reply(embed=embed, mention_author=False)
-                return
+                return HANDLED
             # 處理猜數字邏輯
-            logger.info(f"[on_message] 進入猜數字邏輯，guess={guess}")
+            logger.debug(f"[on_guess_reply] 進入猜數字邏輯，guess={guess}")
             await self.process_guess(message, guess, replied_message)
+            return HANDLED
         except Exception as e:
-            logger.error(f"[on_message] 處理猜數字回覆失敗: {e}")
+            logger.error(f"[on_guess_reply] 處理猜數字回覆失敗: {e}")
             try:
                 embed = discord.Embed(
                     title="❌ 處理失敗",
@@ -300,7 +275,7 @@ class MiniGames(commands.Cog):
                 await message.reply(embed=embed, mention_author=False)
             except:
                 pass
-        await self.bot.process_commands(message)
+            return HANDLED
 
     async def process_guess(self, message, guess, game_message):
         """處理猜數字邏輯"""
@@ -477,7 +452,7 @@ class MiniGames(commands.Cog):
     @app_commands.command(name="猜數字排行", description="猜數字排行榜（前10名）")
     async def guess_number_leaderboard(self, interaction: discord.Interaction):
         try:
-            top = self.leaderboard_manager.get_top('guess_number')
+            top = await self.leaderboard_manager.get_top('guess_number')
             if not top:
                 embed = discord.Embed(
                     title="📊 猜數字排行榜",
@@ -512,7 +487,7 @@ class MiniGames(commands.Cog):
     @app_commands.command(name="剪刀石頭布排行", description="剪刀石頭布排行榜（前10名）")
     async def rps_leaderboard(self, interaction: discord.Interaction):
         try:
-            top = self.leaderboard_manager.get_top('rps')
+            top = await self.leaderboard_manager.get_top('rps')
             if not top:
                 embed = discord.Embed(
                     title="📊 剪刀石頭布排行榜",
@@ -547,7 +522,7 @@ class MiniGames(commands.Cog):
     @app_commands.command(name="踩地雷排行", description="踩地雷排行榜（前10名）")
     async def minesweeper_leaderboard(self, interaction: discord.Interaction):
         try:
-            top = self.leaderboard_manager.get_top('minesweeper')
+            top = await self.leaderboard_manager.get_top('minesweeper')
             if not top:
                 embed = discord.Embed(
                     title="📊 踩地雷排行榜",
@@ -2,15 +2,17 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
-import yt_dlp
 import random
 import re
 import time
-import hashlib
 import json
 import os
 import logging
-from collections import deque
+from collections import deque, OrderedDict
+from urllib.parse import urlparse, parse_qs
+from utils.persistence import WriteBehindStore
+from utils.extraction import ExtractionService
+from utils.singleflight import SingleFlight
 
 # 設定 logger
 logger = logging.getLogger('Music')
@@ -19,65 +21,312 @@ def is_url(text):
     url_pattern = re.compile(r'https?://')
     return bool(url_pattern.match(text))
 
+YOUTUBE_ID_PATTERN = re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([\w-]{11})')
+
+def normalize_query(query):
+    """搜尋字串正規化（大小寫、空白），YouTube 連結直接轉成影片 ID"""
+    query = query.strip()
+    match = YOUTUBE_ID_PATTERN.search(query)
+    if match:
+        return f"id:{match.group(1)}"
+    return " ".join(query.lower().split())
+
+def is_playlist_url(text):
+    """YouTube 播放清單連結（/playlist?list=...，或只有 list 參數沒有指定影片）"""
+    if not is_url(text):
+        return False
+    parsed = urlparse(text.strip())
+    params = parse_qs(parsed.query)
+    return 'list' in params and (parsed.path.rstrip('/') == '/playlist' or 'v' not in params)
+
+def stream_expiry(url):
+    """取得串流網址的過期時間（googlevideo 網址的 expire 參數），沒有時回傳 None"""
+    try:
+        values = parse_qs(urlparse(url).query).get('expire')
+        return int(values[0]) if values else None
+    except (TypeError, ValueError):
+        return None
+
+def compact_track(info):
+    """從 yt-dlp 的 info 只保留播放需要的欄位（完整 info 含 formats 等，單首可達數百 KB）"""
+    url = info.get('url')
+    return {
+        'id': info.get('id'),
+        'title': info.get('title', '未知標題'),
+        'duration': info.get('duration'),
+        'url': url,
+        'expires': stream_expiry(url) or int(time.time()) + SongCache.DEFAULT_STREAM_TTL,
+        'acodec': info.get('acodec'),
+        'webpage_url': info.get('webpage_url'),
+    }
+
+def track_source_url(track):
+    """重新取得串流網址時使用的連結（不需要再搜尋）"""
+    return track.get('webpage_url') or f"https://www.youtube.com/watch?v={track['id']}"
+
 class SongCache:
-    """歌曲快取系統，減少重複下載"""
-    def __init__(self, cache_file="song_cache.json", max_cache_size=100):
+    """
+    歌曲快取系統，分兩層：
+    - 搜尋字串 → 影片 ID：長期有效，同一首歌的不同寫法（大小寫、空白、連結格式）共用
+    - 影片 ID → 串流網址：依網址的 expire 參數過期，接近過期時由呼叫端在背景更新
+    兩層都是 LRU，由背景任務批次寫檔
+    """
+    QUERY_TTL = 30 * 86400     # 搜尋結果（影片 ID）保留 30 天
+    DEFAULT_STREAM_TTL = 3600  # 網址沒有 expire 參數時的有效時間
+    EXPIRY_MARGIN = 600        # 剩不到 10 分鐘的網址不再使用（播放途中可能失效）
+    REFRESH_WINDOW = 1800      # 剩不到 30 分鐘時建議背景更新
+
+    def __init__(self, cache_file="song_cache.json", max_cache_size=100, max_queries=2000):
         self.cache_file = cache_file
         self.max_cache_size = max_cache_size
-        self.cache = {}
+        self.max_queries = max_queries
+        self.store = WriteBehindStore(cache_file, flush_interval=30.0, dirty_threshold=20, name='SongCache')
+        self.queries = OrderedDict()  # 正規化搜尋字串 -> {'id', 'timestamp'}
+        self.tracks = OrderedDict()   # 影片 ID -> 精簡紀錄
+        self.hits = {'query': 0, 'track': 0, 'miss': 0}
         self.load_cache()
     
     def load_cache(self):
-        """載入快取"""
-        try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.cache = json.load(f)
-        except Exception as e:
-            logger.error(f"[SongCache] 載入快取失敗: {e}")
-            self.cache = {}
+        """載入快取（舊格式以 md5 為鍵，只能保留影片資料）"""
+        data = self.store.data
+        migrated = 0
+        if 'tracks' in data:
+            self.queries.update(data.get('queries', {}))
+            self.tracks.update(data.get('tracks', {}))
+        else:
+            for entry in data.values():
+                if not isinstance(entry, dict) or not isinstance(entry.get('data'), dict):
+                    continue
+                track = entry['data']
+                if 'formats' in track or 'webpage_url' not in track:
+                    track = compact_track(track)
+                if track.get('id'):
+                    self.tracks[track['id']] = track
+                    migrated += 1
+        self._trim()
+        self.store.data = {'queries': self.queries, 'tracks': self.tracks}
+        if migrated:
+            logger.info(f"[SongCache] 已將 {migrated} 筆舊快取轉為新格式")
+            self.store.mark_dirty(migrated)
+    
+    def _trim(self):
+        while len(self.queries) > self.max_queries:
+            self.queries.popitem(last=False)
+        while len(self.tracks) > self.max_cache_size:
+            self.tracks.popitem(last=False)
+    
+    def start(self):
+        """啟動背景寫入（需在事件循環中呼叫）"""
+        self.store.start()
+    
+    async def close(self):
+        await self.store.close()
     
     def save_cache(self):
-        """保存快取"""
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"[SongCache] 保存快取失敗: {e}")
+        """標記快取需要寫入，由背景任務寫回"""
+        self.store.mark_dirty()
+    
+    def clear(self):
+        self.queries.clear()
+        self.tracks.clear()
+        self.save_cache()
     
-    def get_cache_key(self, query):
-        """生成快取鍵"""
-        return hashlib.md5(query.encode()).hexdigest()
+    def resolve_id(self, query):
+        """搜尋字串 → 影片 ID（連結直接解析，不需要快取）"""
+        key = normalize_query(query)
+        if key.startswith("id:"):
+            return key[3:]
+        entry = self.queries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['timestamp'] >= self.QUERY_TTL:
+            del self.queries[key]
+            self.save_cache()
+            return None
+        self.queries.move_to_end(key)
+        return entry['id']
     
-    def get(self, query):
-        """獲取快取"""
-        key = self.get_cache_key(query)
-        if key in self.cache:
-            cache_data = self.cache[key]
-            # 檢查快取是否過期（24小時）
-            if time.time() - cache_data.get('timestamp', 0) < 86400:
-                return cache_data.get('data')
-        return None
+    def get_track(self, video_id):
+        """影片 ID → 仍可播放的精簡紀錄（網址即將過期時回傳 None）"""
+        track = self.tracks.get(video_id)
+        if track is None:
+            return None
+        if track['expires'] - time.time() <= self.EXPIRY_MARGIN:
+            return None
+        # 命中只調整 LRU 順序，不寫檔
+        self.tracks.move_to_end(video_id)
+        return track
+    
+    def get_stale_track(self, video_id):
+        """取得紀錄（不論網址是否過期），用於重新取得網址"""
+        return self.tracks.get(video_id)
+    
+    def needs_refresh(self, track):
+        return track['expires'] - time.time() <= self.REFRESH_WINDOW
+    
+    def lookup(self, query):
+        """
+        搜尋字串 → (影片 ID, 可播放的紀錄)
+        只有 ID 沒有紀錄時，呼叫端只需要重新取得網址，不用再搜尋
+        """
+        video_id = self.resolve_id(query)
+        track = self.get_track(video_id) if video_id else None
+        if track is not None:
+            self.hits['track'] += 1
+        elif video_id is not None:
+            self.hits['query'] += 1
+        else:
+            self.hits['miss'] += 1
+        return video_id, track
     
     def set(self, query, data):
-        """設置快取"""
-        key = self.get_cache_key(query)
-        self.cache[key] = {
-            'data': data,
-            'timestamp': time.time()
-        }
-        
-        # 如果快取太大，清理舊的項目
-        if len(self.cache) > self.max_cache_size:
-            oldest_key = min(self.cache.keys(), 
-                           key=lambda k: self.cache[k].get('timestamp', 0))
-            del self.cache[oldest_key]
-        
+        """設置快取（兩層都更新），回傳精簡後的紀錄"""
+        track = compact_track(data)
+        if not track['id']:
+            return track
+        if query is not None:
+            key = normalize_query(query)
+            if not key.startswith("id:"):
+                self.queries[key] = {'id': track['id'], 'timestamp': time.time()}
+                self.queries.move_to_end(key)
+        self.tracks[track['id']] = track
+        self.tracks.move_to_end(track['id'])
+        # 如果快取太大，移除最久沒用到的項目
+        self._trim()
         self.save_cache()
+        return track
+    
+    def stats(self):
+        return {'queries': len(self.queries), 'tracks': len(self.tracks), **self.hits}
+
+# 優化的 ytdl 配置，減少 JavaScript 解釋器負載
+YTDL_CONFIGS = [
+    # 配置1: 輕量級配置，避免複雜的 JavaScript 處理
+    {
+        'format': 'bestaudio/best',
+        'noplaylist': True,
+        'quiet': True,
+        'default_search': 'ytsearch',
+        'extract_flat': 'in_playlist',
+        'socket_timeout': 30,
+        'retries': 3,
+        'fragment_retries': 3,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'extractor_retries': 2,
+        'file_access_retries': 2,
+        'retry_sleep': 1,
+        'max_sleep_interval': 5,
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        },
+        # 避免複雜的簽名解密
+        'extract_flat': False,
+        'skip': ['dash', 'live'],
+        'prefer_insecure': True
+    },
+    # 配置2: 備用配置，更保守的設定
+    {
+        'format': 'bestaudio/best',
+        'noplaylist': True,
+        'quiet': True,
+        'default_search': 'ytsearch',
+        'socket_timeout': 45,
+        'retries': 5,
+        'fragment_retries': 5,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'extractor_retries': 3,
+        'file_access_retries': 3,
+        'retry_sleep': 2,
+        'max_sleep_interval': 8,
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'
+        },
+        'skip': ['dash', 'live'],
+        'prefer_insecure': True
+    }
+]
+
+# 平面解析：只取得搜尋結果的影片 ID 與標題，不解析串流網址（一次請求取得多個結果）
+FLAT_YTDL_CONFIG = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+    'ignoreerrors': True,
+    'socket_timeout': 30,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    },
+}
+FLAT_CONFIG_IDX = len(YTDL_CONFIGS)
+
+# 預先載入：目前歌曲結束前幾秒啟動下一首的 FFmpeg
+PRESPAWN_LEAD = 8
+
+# 播放狀態快照（重新啟動後恢復播放）
+SESSION_FILE = "music_sessions.json"
+SNAPSHOT_INTERVAL = 15       # 快照間隔（秒）
+SESSION_MAX_AGE = 6 * 3600   # 超過此時間的快照不再恢復
+
+RECENT_PLAYS = 50  # 每個伺服器記住最近幾首播放過的歌曲
+
+def queue_entry(track):
+    """佇列中的歌曲（精簡紀錄的複本，保留 id 以便網址過期時重新取得）"""
+    return {
+        'url': track['url'],
+        'title': track.get('title', '未知標題'),
+        'id': track.get('id'),
+        'duration': track.get('duration'),
+        'acodec': track.get('acodec'),
+        'webpage_url': track.get('webpage_url'),
+    }
+
+def session_entry(song):
+    """快照中的歌曲：只保留影片 ID 與顯示資訊，串流網址從快取取得，過期才重新解析"""
+    return {'id': song['id'], 'title': song.get('title', '未知標題'), 'duration': song.get('duration')}
+
+def playlist_entry(entry):
+    """播放清單中的歌曲：平面解析只有 ID 與標題，串流網址輪到播放時才解析"""
+    return {
+        'url': None,
+        'title': entry.get('title') or '未知標題',
+        'id': entry['id'],
+        'duration': entry.get('duration'),
+        'acodec': None,
+        'webpage_url': None,
+    }
+
+class Prefetched:
+    """預先載入的下一首歌曲（自動串流的歌曲會記錄來源候選池，丟棄時放回）"""
+    __slots__ = ('version', 'song', 'source', 'volume', 'from_queue', 'pool', 'category')
+
+    def __init__(self, version, song, source, from_queue, volume=None, pool=None, category=None):
+        self.version = version
+        self.song = song
+        self.source = source
+        self.volume = volume
+        self.from_queue = from_queue
+        self.pool = pool
+        self.category = category
+
+    def discard(self):
+        """沒有播放就丟棄：結束已啟動的 FFmpeg，自動串流的歌曲放回候選池"""
+        if self.source is not None:
+            self.source.cleanup()
+            self.source = None
+        if self.pool is not None:
+            self.pool.put_back(self.category, self.song)
+            self.pool = None
 
 class AutoMusicPlayer:
     def __init__(self):
         self.queue = deque()  # 使用 deque 提高效能
+        self.version = 0  # 佇列變更時遞增，用來判斷預先載入的歌曲是否仍有效
+        self.prefetched = None
+        self.prefetch_task = None
+        self.track_started = 0.0  # 目前歌曲開始的 monotonic 時間（已扣除暫停時間）
+        self.paused_at = None
         self.current = None
         self.repeat = False
         self.volume = 0.5
@@ -86,10 +335,108 @@ class AutoMusicPlayer:
         self.category = None
         self.retry_count = 0
         self.max_retries = 3
+        self.vc = None
+        self.task = None  # 播放任務（Music.player_loop）
+        self.wake = asyncio.Event()  # 歌曲播放結束或有播放請求時設定
+        self.announce = None  # 下一首開始播放時要回報的 interaction
+        self.resume_at = 0.0  # 下一首從第幾秒開始播放（恢復播放時使用）
+        self.recent_ids = deque(maxlen=RECENT_PLAYS)  # 最近播放過的影片 ID，自動串流不重複選到
 
     def add(self, song):
         logger.debug(f"[Queue] 新增歌曲：{song['title']}")
         self.queue.append(song)
+        self.invalidate_prefetch()
+
+    def extend(self, songs):
+        logger.debug(f"[Queue] 新增 {len(songs)} 首歌曲")
+        self.queue.extend(songs)
+        self.invalidate_prefetch()
+
+    def invalidate_prefetch(self):
+        """佇列變更：丟棄預先載入的歌曲（並結束已啟動的 FFmpeg）"""
+        self.version += 1
+        if self.prefetch_task and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+        self.prefetch_task = None
+        if self.prefetched is not None:
+            self.prefetched.discard()
+            self.prefetched = None
+
+    def track_finished(self, error=None):
+        """歌曲播放結束（在事件迴圈中由 call_soon_threadsafe 呼叫）"""
+        if error:
+            logger.error(f"[after_callback] 播放錯誤: {error}")
+        self.wake.set()
+
+    def close(self):
+        """停止播放任務並丟棄預先載入的歌曲"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.task = None
+        self.invalidate_prefetch()
+
+    def mark_paused(self):
+        self.is_paused = True
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+
+    def mark_resumed(self):
+        self.is_paused = False
+        if self.paused_at is not None:
+            self.track_started += time.monotonic() - self.paused_at
+            self.paused_at = None
+
+    def position(self):
+        """目前歌曲已播放的秒數"""
+        now = self.paused_at if self.paused_at is not None else time.monotonic()
+        return max(0.0, now - self.track_started)
+
+    def resume_from(self, position):
+        """讓下一次播放從目前歌曲的 position 秒繼續（重新連線或恢復快照時使用）"""
+        if self.current is None:
+            return
+        if not self.repeat:
+            self.queue.appendleft(self.current)
+        self.resume_at = max(0.0, position)
+        self.invalidate_prefetch()
+
+    def snapshot(self, channel_id):
+        """目前狀態的精簡快照（歌曲只保留影片 ID）"""
+        current = self.current if self.current and self.current.get('id') else None
+        return {
+            'channel_id': channel_id,
+            'current': session_entry(current) if current else None,
+            'position': round(self.position(), 1) if current else 0,
+            'queue': [session_entry(song) for song in self.queue if song.get('id')],
+            'volume': self.volume,
+            'repeat': self.repeat,
+            'autoplay': self.autoplay,
+            'category': self.category,
+            'saved_at': int(time.time()),
+        }
+
+    def restore(self, data):
+        """從快照恢復狀態，目前歌曲會從保存的位置繼續"""
+        self.queue = deque(song for song in data.get('queue', []) if song.get('id'))
+        self.volume = data.get('volume', self.volume)
+        self.repeat = data.get('repeat', False)
+        self.autoplay = data.get('autoplay', False)
+        self.category = data.get('category')
+        self.current = data.get('current')
+        if self.current:
+            self.resume_from(data.get('position', 0))
+        else:
+            self.invalidate_prefetch()
+
+    def take_prefetched(self):
+        """取出仍有效的預先載入歌曲，佇列已變更時回傳 None"""
+        prefetched, self.prefetched = self.prefetched, None
+        if prefetched is None:
+            return None
+        if prefetched.version != self.version:
+            prefetched.discard()
+            return None
+        return prefetched
 
     def next(self):
         # 如果開啟重複播放且有當前歌曲
@@ -116,8 +463,117 @@ class AutoMusicPlayer:
     def clear_queue(self):
         """清空播放隊列"""
         self.queue.clear()
+        self.invalidate_prefetch()
         logger.info("[Queue] 播放隊列已清空")
 
+class AutoplayPool:
+    """
+    自動串流的候選歌曲池，每個類別一個
+    - 數量低於 LOW_WATER 時由背景任務補充到 HIGH_WATER：一次平面搜尋取得多個影片 ID，再逐一解析網址
+    - 每次解析之間間隔 REFILL_DELAY 秒，並使用獨立的解析排程（不和各伺服器的 /play 搶順序）
+    - 取出時略過該伺服器最近播放過的歌曲
+    """
+    LOW_WATER = 3
+    HIGH_WATER = 6
+    SEARCH_SIZE = 15
+    REFILL_DELAY = 2.0
+    LANE = 'autoplay'  # 解析服務中的排程鍵
+
+    def __init__(self, music, categories):
+        self.music = music
+        self.categories = categories  # 類別 -> 搜尋關鍵字
+        self.ready = {category: deque() for category in categories}
+        self.candidates = {category: deque() for category in categories}
+        self._wake = {}
+        self._tasks = []
+        self.counters = {'hits': 0, 'misses': 0, 'searches': 0, 'resolved': 0, 'returned': 0}
+
+    def start(self):
+        """啟動各類別的補充任務（需在事件循環中呼叫）"""
+        if self._tasks:
+            return
+        for category in self.categories:
+            self._wake[category] = asyncio.Event()
+            self._wake[category].set()
+            self._tasks.append(asyncio.create_task(self._refill_loop(category)))
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def take(self, category, exclude=()):
+        """取出一首準備好的歌曲（略過 exclude 中的影片 ID），沒有時回傳 None"""
+        ready = self.ready.get(category)
+        if ready is None:
+            return None
+        song = None
+        for index, entry in enumerate(ready):
+            if entry['id'] not in exclude:
+                song = entry
+                del ready[index]
+                break
+        self.counters['hits' if song else 'misses'] += 1
+        if len(ready) < self.LOW_WATER and category in self._wake:
+            self._wake[category].set()
+        return song
+
+    def put_back(self, category, song):
+        """把取出後沒有播放的歌曲放回最前面（預先載入被丟棄時），下一次 take 優先取得"""
+        ready = self.ready.get(category)
+        if ready is None or not song.get('id') or any(entry['id'] == song['id'] for entry in ready):
+            return
+        ready.appendleft(song)
+        self.counters['returned'] += 1
+
+    async def _refill_loop(self, category):
+        while True:
+            await self._wake[category].wait()
+            self._wake[category].clear()
+            try:
+                await self._refill(category)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[AutoplayPool] 補充 {category} 候選歌曲失敗: {e}")
+
+    async def _refill(self, category):
+        ready = self.ready[category]
+        candidates = self.candidates[category]
+        while len(ready) < self.HIGH_WATER:
+            if not candidates and not await self._search(category):
+                return
+            video_id = candidates.popleft()
+            if any(entry['id'] == video_id for entry in ready):
+                continue
+            track = await self.music.fetch_song_with_retry(
+                f"https://www.youtube.com/watch?v={video_id}", max_retries=1, guild_id=self.LANE
+            )
+            if track:
+                ready.append(queue_entry(track))
+                self.counters['resolved'] += 1
+            await asyncio.sleep(self.REFILL_DELAY)
+        logger.debug(f"[AutoplayPool] {category} 候選歌曲：{len(ready)} 首")
+
+    async def _search(self, category):
+        """平面搜尋一個隨機關鍵字，把結果的影片 ID 加入待解析清單"""
+        keyword = random.choice(self.categories[category])
+        query = f"ytsearch{self.SEARCH_SIZE}:{keyword}"
+        info = await self.music.extractor.extract(query, FLAT_CONFIG_IDX, self.LANE, timeout=30.0)
+        self.counters['searches'] += 1
+        entries = [entry for entry in (info or {}).get('entries') or [] if entry and entry.get('id')]
+        random.shuffle(entries)
+        known = {entry['id'] for entry in self.ready[category]}
+        self.candidates[category].extend(entry['id'] for entry in entries if entry['id'] not in known)
+        await asyncio.sleep(self.REFILL_DELAY)
+        if not self.candidates[category]:
+            logger.warning(f"[AutoplayPool] 搜尋沒有結果：{keyword}")
+            return False
+        return True
+
+    def stats(self):
+        return {**self.counters, 'ready': {category: len(ready) for category, ready in self.ready.items()}}
+
 class MusicControls(discord.ui.View):
     def __init__(self, bot, guild_id, voice_client, player):
         super().__init__(timeout=300)  # 5分鐘後按鈕失效
@@ -140,8 +596,7 @@ class MusicControls(discord.ui.View):
                 return
                 
             self.player.volume = max(0.0, self.player.volume - 0.1)
-            if self.vc.source:
-                self.vc.source.volume = self.player.volume
+            self.bot.get_cog('Music').apply_volume(self.vc, self.player)
             await interaction.response.send_message(f"🔉 音量調低為 {int(self.player.volume * 100)}%", ephemeral=True)
             await self.update_message(interaction, f"▶️ 正在播放：{self.player.current['title']}")
         except Exception as e:
@@ -156,8 +611,7 @@ class MusicControls(discord.ui.View):
                 return
                 
             self.player.volume = min(1.0, self.player.volume + 0.1)
-            if self.vc.source:
-                self.vc.source.volume = self.player.volume
+            self.bot.get_cog('Music').apply_volume(self.vc, self.player)
             await interaction.response.send_message(f"🔊 音量調高為 {int(self.player.volume * 100)}%", ephemeral=True)
             await self.update_message(interaction, f"▶️ 正在播放：{self.player.current['title']}")
         except Exception as e:
@@ -177,11 +631,11 @@ class MusicControls(discord.ui.View):
                 
             if self.vc.is_playing():
                 self.vc.pause()
-                self.player.is_paused = True
+                self.player.mark_paused()
                 await interaction.response.send_message("⏸ 已暫停播放", ephemeral=True)
             elif self.vc.is_paused():
                 self.vc.resume()
-                self.player.is_paused = False
+                self.player.mark_resumed()
                 await interaction.response.send_message("▶️ 已繼續播放", ephemeral=True)
         except Exception as e:
             logger.error(f"[MusicControls] 暫停/繼續播放失敗: {e}")
@@ -219,6 +673,12 @@ class Music(commands.Cog):
         self.bot = bot
         self.players = {}
         self.song_cache = SongCache()
+        self._refreshing = set()  # 正在背景更新串流網址的影片 ID
+        # yt-dlp 解析專用執行緒池，保留 YoutubeDL 實例重複使用
+        self.extractor = ExtractionService(YTDL_CONFIGS + [FLAT_YTDL_CONFIG])
+        self.lookups = SingleFlight('SongLookup')
+        self.sessions = WriteBehindStore(SESSION_FILE, flush_interval=SNAPSHOT_INTERVAL, dirty_threshold=50, name='MusicSessions')
+        self._restore_task = None
         self.ffmpeg_config = self.load_ffmpeg_config()
         self.connection_retries = {}
         self.auto_stream_categories = {}
@@ -227,7 +687,7 @@ class Music(commands.Cog):
         self.reconnect_delay = 20
         
         # 載入音樂配置
-        self.load_music_config()
+        self.music_config = self.load_music_config()
         
         # 標記需要啟動清理任務
         self._cleanup_task_started = False
@@ -270,6 +730,8 @@ class Music(commands.Cog):
                 "中文青春歌曲"
             ]
         }
+        # 各類別預先解析好的自動串流候選歌曲
+        self.autoplay_pool = AutoplayPool(self, self.category_keywords)
 
     def load_ffmpeg_config(self):
         """載入 FFmpeg 配置"""
@@ -285,7 +747,9 @@ class Music(commands.Cog):
                 "ffmpeg_options": {
                     "before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
                     "options": "-vn -b:a 128k -bufsize 3072k"
-                }
+                },
+                "playback_mode": "opus",
+                "opus_bitrate": 128
             }
             self.save_ffmpeg_config(config)
             return config
@@ -351,115 +815,74 @@ class Music(commands.Cog):
     def get_player(self, guild_id):
         return self.players.setdefault(guild_id, AutoMusicPlayer())
 
-    async def fetch_song_with_retry(self, keyword_or_url, max_retries=3):
-        """帶重試機制的歌曲獲取"""
+    async def fetch_song_with_retry(self, keyword_or_url, max_retries=3, refresh=False, guild_id=None):
+        """帶重試機制的歌曲獲取（refresh=True 時略過快取，用於背景更新網址；guild_id 用於解析排程的公平性）"""
         if isinstance(keyword_or_url, list):
             keyword_or_url = keyword_or_url[0] if keyword_or_url else ""
         if not isinstance(keyword_or_url, str):
             logger.error(f"[fetch_song] 參數型態錯誤，期望字串，得到：{type(keyword_or_url)}")
             return None
 
-        # 檢查快取
-        cached_result = self.song_cache.get(keyword_or_url)
-        if cached_result:
-            logger.debug(f"[fetch_song] 使用快取結果：{cached_result.get('title', '未知標題')}")
-            return cached_result
-
-        # 優化的 ytdl 配置，減少 JavaScript 解釋器負載
-        ytdl_configs = [
-            # 配置1: 輕量級配置，避免複雜的 JavaScript 處理
-            {
-                'format': 'bestaudio/best',
-                'noplaylist': True,
-                'quiet': True,
-                'default_search': 'ytsearch',
-                'extract_flat': 'in_playlist',
-                'socket_timeout': 30,
-                'retries': 3,
-                'fragment_retries': 3,
-                'ignoreerrors': True,
-                'no_warnings': True,
-                'extractor_retries': 2,
-                'file_access_retries': 2,
-                'retry_sleep': 1,
-                'max_sleep_interval': 5,
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                },
-                # 避免複雜的簽名解密
-                'extract_flat': False,
-                'skip': ['dash', 'live'],
-                'prefer_insecure': True
-            },
-            # 配置2: 備用配置，更保守的設定
-            {
-                'format': 'bestaudio/best',
-                'noplaylist': True,
-                'quiet': True,
-                'default_search': 'ytsearch',
-                'socket_timeout': 45,
-                'retries': 5,
-                'fragment_retries': 5,
-                'ignoreerrors': True,
-                'no_warnings': True,
-                'extractor_retries': 3,
-                'file_access_retries': 3,
-                'retry_sleep': 2,
-                'max_sleep_interval': 8,
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'
-                },
-                'skip': ['dash', 'live'],
-                'prefer_insecure': True
-            }
-        ]
-
-        for config_idx, ytdl_opts in enumerate(ytdl_configs):
+        # 檢查快取：搜尋字串 → 影片 ID → 串流網址
+        target = keyword_or_url
+        video_id = None
+        if not refresh:
+            video_id, cached_result = self.song_cache.lookup(keyword_or_url)
+            if cached_result:
+                logger.debug(f"[fetch_song] 使用快取結果：{cached_result.get('title', '未知標題')}")
+                if self.song_cache.needs_refresh(cached_result):
+                    self.schedule_stream_refresh(video_id)
+                return cached_result
+            if video_id:
+                # 已知影片，只需要重新取得串流網址，不用再搜尋
+                stale = self.song_cache.get_stale_track(video_id)
+                target = track_source_url(stale) if stale else f"https://www.youtube.com/watch?v={video_id}"
+                logger.debug(f"[fetch_song] 快取網址已過期，重新取得：{target}")
+
+        # 同一首歌同時只解析一次，其他請求等待同一個結果（失敗也共用，並短暫記住）
+        flight_key = f"id:{video_id}" if video_id else normalize_query(keyword_or_url)
+        return await self.lookups.do(
+            flight_key,
+            lambda: self._extract_song(keyword_or_url, target, max_retries, guild_id)
+        )
+
+    async def _extract_song(self, keyword_or_url, target, max_retries, guild_id):
+        """實際呼叫 yt-dlp 解析（依序嘗試各設定並重試），成功時寫入快取"""
+        for config_idx in range(len(YTDL_CONFIGS)):
             for attempt in range(max_retries):
                 try:
                     logger.debug(f"[fetch_song] 嘗試配置 {config_idx + 1}，第 {attempt + 1} 次嘗試")
                     
-                    # 添加超時控制
-                    with yt_dlp.YoutubeDL(ytdl_opts) as ytdl:
-                        # 使用 asyncio.wait_for 添加超時
-                        try:
-                            info = await asyncio.wait_for(
-                                asyncio.to_thread(ytdl.extract_info, keyword_or_url, download=False),
-                                timeout=30.0  # 30秒超時
-                            )
-                        except asyncio.TimeoutError:
-                            logger.warning(f"[fetch_song] 配置 {config_idx + 1} 超時")
-                            continue
-                        
-                        if not info:
-                            logger.warning(f"[fetch_song] 配置 {config_idx + 1} 無法提取資訊")
-                            continue
-                        
-                        if 'entries' in info:
-                            entries = info['entries']
-                            if entries:
-                                song_info = random.choice(entries)
-                                try:
-                                    # 再次使用超時控制
-                                    full_info = await asyncio.wait_for(
-                                        asyncio.to_thread(ytdl.extract_info, song_info['url'], download=False),
-                                        timeout=25.0
-                                    )
-                                    if full_info and 'url' in full_info:
-                                        logger.info(f"[fetch_song] 找到歌曲：{full_info['title']}")
-                                        self.song_cache.set(keyword_or_url, full_info)
-                                        return full_info
-                                except asyncio.TimeoutError:
-                                    logger.warning(f"[fetch_song] 提取完整資訊超時")
-                                    continue
-                                except Exception as e:
-                                    logger.warning(f"[fetch_song] 提取完整資訊失敗: {e}")
-                                    continue
-                        else:
-                            if 'url' in info:
-                                logger.info(f"[fetch_song] 找到歌曲：{info.get('title', '未知標題')}")
-                                self.song_cache.set(keyword_or_url, info)
-                                return info
+                    # 交給解析服務（專用執行緒池、依伺服器輪流），並設定超時
+                    try:
+                        info = await self.extractor.extract(target, config_idx, guild_id, timeout=30.0)
+                    except asyncio.TimeoutError:
+                        logger.warning(f"[fetch_song] 配置 {config_idx + 1} 超時")
+                        continue
+                    
+                    if not info:
+                        logger.warning(f"[fetch_song] 配置 {config_idx + 1} 無法提取資訊")
+                        continue
+                    
+                    if 'entries' in info:
+                        entries = info['entries']
+                        if entries:
+                            song_info = random.choice(entries)
+                            try:
+                                full_info = await self.extractor.extract(song_info['url'], config_idx, guild_id, timeout=25.0)
+                                if full_info and 'url' in full_info:
+                                    logger.info(f"[fetch_song] 找到歌曲：{full_info['title']}")
+                                    return self.song_cache.set(keyword_or_url, full_info)
+                            except asyncio.TimeoutError:
+                                logger.warning(f"[fetch_song] 提取完整資訊超時")
+                                continue
+                            except Exception as e:
+                                logger.warning(f"[fetch_song] 提取完整資訊失敗: {e}")
+                                continue
+                    else:
+                        if 'url' in info:
+                            logger.info(f"[fetch_song] 找到歌曲：{info.get('title', '未知標題')}")
+                            return self.song_cache.set(keyword_or_url, info)
                             
                 except Exception as e:
                     logger.warning(f"[fetch_song] 配置 {config_idx + 1} 失敗: {e}")
@@ -472,6 +895,25 @@ class Music(commands.Cog):
         logger.error(f"[fetch_song] 所有嘗試都失敗了")
         return None
 
+    def schedule_stream_refresh(self, video_id):
+        """串流網址接近過期時在背景重新取得，之後的播放不必等待"""
+        if video_id in self._refreshing:
+            return
+        track = self.song_cache.get_stale_track(video_id)
+        if track is None:
+            return
+        self._refreshing.add(video_id)
+        asyncio.create_task(self._refresh_stream(video_id, track_source_url(track)))
+
+    async def _refresh_stream(self, video_id, url):
+        try:
+            if await self.fetch_song_with_retry(url, max_retries=1, refresh=True):
+                logger.debug(f"[fetch_song] 已在背景更新串流網址：{video_id}")
+        except Exception as e:
+            logger.warning(f"[fetch_song] 背景更新串流網址失敗: {e}")
+        finally:
+            self._refreshing.discard(video_id)
+
     async def ensure_voice_connection(self, interaction, auto_join=True):
         """確保語音連線存在"""
         try:
@@ -644,123 +1086,276 @@ class Music(commands.Cog):
                 logger.error(f"[ensure_voice_connection] 無法發送錯誤訊息: {e}")
             return None
 
-    async def play_next(self, vc, guild_id, interaction=None):
-        player = self.get_player(guild_id)
-        song = player.next()
-
-        # 如果播放隊列沒歌且開啟自動串流，嘗試自動找歌加入
-        if not song and player.autoplay and player.category:
-            keywords = self.category_keywords.get(player.category)
-            if keywords:
-                keyword = random.choice(keywords)
-                logger.info(f"[play_next] 自動串流模式，隨機搜尋關鍵字：{keyword}")
-                song = await self.fetch_song_with_retry(keyword)
-                if song:
-                    player.add({"url": song['url'], "title": song['title']})
-                    song = player.next()
-
-        if not song:
-            if interaction:
-                await interaction.followup.send("🎵 播放隊列已結束")
-            return
-
+    def create_source(self, song, volume, start=0.0):
+        """
+        建立 FFmpeg 音源（建立時就會啟動 FFmpeg 程序），start 為開始播放的秒數
+        playback_mode 為 opus（預設）時由 FFmpeg 直接輸出 Opus，失敗時改用 PCM
+        """
         # 使用配置檔案中的 FFmpeg 選項
         ffmpeg_options = self.ffmpeg_config.get('ffmpeg_options', {})
         executable = self.ffmpeg_config.get('ffmpeg_path', 'ffmpeg')
-        
+        before_options = ffmpeg_options.get('before_options', '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 10')
+        options = ffmpeg_options.get('options', '-vn -b:a 96k -bufsize 2048k')
+        if start > 0:
+            before_options = f"-ss {start:.2f} {before_options}"
+
+        if self.ffmpeg_config.get('playback_mode', 'opus') == 'opus':
+            try:
+                return self.create_opus_source(song, volume, before_options, options, executable)
+            except Exception as e:
+                logger.warning(f"[play_next] Opus 音源建立失敗，改用 PCM: {e}")
+
+        return discord.PCMVolumeTransformer(
+            discord.FFmpegPCMAudio(
+                song['url'],
+                before_options=before_options,
+                options=options,
+                executable=executable
+            ),
+            volume=volume
+        )
+
+    def create_opus_source(self, song, volume, before_options, options, executable):
+        """
+        FFmpeg 直接輸出 Opus，discord.py 不需要在 Python 解碼、調整音量再編碼
+        來源已是 Opus 且音量為 100% 時直接複製串流；否則以 libopus 重新編碼，音量以 FFmpeg 濾鏡套用
+        （discord.py 會把 codec='opus' / 'libopus' 都當成 -c:a copy，重新編碼時必須傳 None）
+        """
+        if song.get('acodec') == 'opus' and abs(volume - 1.0) < 1e-6:
+            codec = 'copy'
+        else:
+            codec = None
+            options = f"{options} -filter:a volume={volume:.2f}"
+        return discord.FFmpegOpusAudio(
+            song['url'],
+            bitrate=self.ffmpeg_config.get('opus_bitrate', 128),
+            codec=codec,
+            executable=executable,
+            before_options=before_options,
+            options=options
+        )
+
+    def apply_volume(self, vc, player):
+        """套用音量：PCM 音源直接調整；Opus 音源從目前位置以新的音量重新啟動 FFmpeg"""
+        source = vc.source
+        if source is None:
+            return
+        if isinstance(source, discord.PCMVolumeTransformer):
+            source.volume = player.volume
+            return
+        if player.current is None:
+            return
+        new_source = self.create_source(player.current, player.volume, start=player.position())
+        vc.source = new_source
+        source.cleanup()
+
+    async def ensure_stream(self, song, guild_id=None):
+        """確認佇列歌曲的串流網址仍可用，過期時依影片 ID 重新取得"""
+        video_id = song.get('id')
+        if not video_id:
+            return song
+        track = self.song_cache.get_track(video_id)
+        if track is None:
+            track = await self.fetch_song_with_retry(track_source_url(song), guild_id=guild_id)
+            if track is None:
+                return None
+        if track['url'] != song.get('url'):
+            song = {**song, 'url': track['url'], 'acodec': track.get('acodec')}
+        return song
+
+    async def fetch_autoplay_song(self, player, guild_id):
+        """從候選池取出一首自動串流歌曲；候選池還沒準備好時才直接搜尋"""
+        song = self.autoplay_pool.take(player.category, set(player.recent_ids))
+        if song:
+            return song
+        keywords = self.category_keywords.get(player.category)
+        if not keywords:
+            return None
+        keyword = random.choice(keywords)
+        logger.info(f"[play_next] 自動串流模式，隨機搜尋關鍵字：{keyword}")
+        song = await self.fetch_song_with_retry(keyword, guild_id=guild_id)
+        return queue_entry(song) if song else None
+
+    def schedule_prefetch(self, vc, guild_id):
+        """目前歌曲播放期間，在背景準備下一首"""
+        player = self.get_player(guild_id)
+        if player.prefetch_task and not player.prefetch_task.done():
+            player.prefetch_task.cancel()
+        player.prefetch_task = asyncio.create_task(self._prefetch_next(vc, guild_id, player.version))
+
+    async def _prefetch_next(self, vc, guild_id, version):
+        player = self.get_player(guild_id)
+        current = player.current
+        if player.repeat or current is None:
+            return
         try:
-            # 使用優化的 FFmpeg 選項
-            source = discord.PCMVolumeTransformer(
-                discord.FFmpegPCMAudio(
-                    song['url'],
-                    before_options=ffmpeg_options.get('before_options', '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 10'),
-                    options=ffmpeg_options.get('options', '-vn -b:a 96k -bufsize 2048k'),
-                    executable=executable
-                ),
-                volume=player.volume
-            )
-            
-            def after_callback(error):
-                if error:
-                    logger.error(f"[after_callback] 播放錯誤: {error}")
-                # 使用新的調度方法
-                self._schedule_after_playing(error, vc, guild_id)
-            
-            vc.play(source, after=after_callback)
-            
-            if interaction:
-                try:
-                    await interaction.followup.send(
-                        f"▶️ 正在播放：{song['title']}", 
-                        view=MusicControls(self.bot, guild_id, vc, player), 
-                        ephemeral=False
-                    )
-                except Exception as e:
-                    logger.error(f"[play_next] 發送互動訊息失敗: {e}")
-                    
+            from_queue = bool(player.queue)
+            if from_queue:
+                song = await self.ensure_stream(player.queue[0], guild_id)
+            elif player.autoplay and player.category:
+                song = await self.fetch_autoplay_song(player, guild_id)
+            else:
+                return
+            if not song:
+                return
+            prefetched = Prefetched(version, song, None, from_queue)
+            if not from_queue:
+                prefetched.pool, prefetched.category = self.autoplay_pool, player.category
+            if player.version != version:
+                # 解析期間佇列已變更
+                prefetched.discard()
+                return
+            player.prefetched = prefetched
+            logger.debug(f"[prefetch] 已預先載入下一首：{song['title']}")
+
+            # FFmpeg 等到目前歌曲快結束時才啟動，避免閒置的串流連線逾時
+            # 以播放位置計算剩餘時間，醒來後重新計算（暫停期間位置不會前進，會繼續等待）
+            duration = current.get('duration')
+            if not duration:
+                return
+            while player.prefetched is prefetched:
+                delay = duration - PRESPAWN_LEAD - player.position()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            # 期間已被取用（跳過歌曲）或佇列已變更
+            if player.prefetched is not prefetched or not vc.is_connected():
+                return
+            prefetched.volume = player.volume
+            prefetched.source = self.create_source(song, player.volume)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"[play_next] 播放失敗: {e}")
-            player.retry_count += 1
-            if player.retry_count < player.max_retries:
-                await asyncio.sleep(2)
+            logger.warning(f"[prefetch] 預先載入失敗: {e}")
+
+    def request_play(self, vc, guild_id, interaction=None):
+        """
+        通知伺服器的播放任務檢查是否要播放下一首
+        佇列推進、重試與自動串流都在播放任務中進行，interaction 會用來回報開始播放的歌曲
+        """
+        player = self.get_player(guild_id)
+        player.vc = vc
+        if interaction is not None:
+            player.announce = interaction
+        if player.task is None or player.task.done():
+            player.task = asyncio.create_task(self.player_loop(guild_id, player))
+        player.wake.set()
+
+    async def player_loop(self, guild_id, player):
+        """每個伺服器一個長期任務：等待歌曲播放結束（或播放請求）後推進佇列"""
+        while True:
+            await player.wake.wait()
+            player.wake.clear()
+            vc = player.vc
+            if vc is None or not vc.is_connected():
+                break
+            if vc.is_playing() or vc.is_paused():
+                continue
+            interaction, player.announce = player.announce, None
+            try:
                 await self.play_next(vc, guild_id, interaction)
-            else:
-                player.retry_count = 0
-                if interaction:
-                    await interaction.followup.send("❌ 播放失敗，請稍後再試")
+            except Exception as e:
+                logger.error(f"[player_loop] play_next 失敗: {e}")
 
-    async def after_playing(self, error, vc, guild_id):
-        """播放結束後的處理"""
-        if error:
-            logger.error(f"[after_playing] 播放錯誤: {error}")
-        
+        # 已不在語音頻道：結束播放任務並清理播放器
         try:
-            # 檢查是否仍在語音頻道
-            if vc.is_connected():
-                # 使用更安全的方式調用 play_next
-                try:
-                    await self.play_next(vc, guild_id)
-                except Exception as play_error:
-                    logger.error(f"[after_playing] play_next 失敗: {play_error}")
-            else:
+            if vc is not None:
                 await vc.disconnect()
-                if guild_id in self.players:
-                    del self.players[guild_id]
         except Exception as e:
-            logger.error(f"[after_playing] 處理播放結束時發生錯誤: {e}")
-    
-    def _schedule_after_playing(self, error, vc, guild_id):
-        """調度 after_playing 的線程安全方法"""
-        try:
-            # 獲取主事件循環
-            loop = asyncio.get_event_loop()
-            if loop and loop.is_running():
-                # 在主線程中調用
-                asyncio.run_coroutine_threadsafe(
-                    self.after_playing(error, vc, guild_id), 
-                    loop
-                )
+            logger.error(f"[player_loop] 中斷語音連線失敗: {e}")
+        if self.players.get(guild_id) is player:
+            self.players.pop(guild_id)
+        player.invalidate_prefetch()
+
+    async def play_next(self, vc, guild_id, interaction=None):
+        """播放下一首（只由播放任務呼叫）；失敗時以指數退避改播下一首，最多 max_retries 次"""
+        player = self.get_player(guild_id)
+        loop = asyncio.get_running_loop()
+        while True:
+            source = None
+            prefetched = None
+            if not (player.repeat and player.current) and not player.resume_at:
+                task = player.prefetch_task
+                if player.prefetched is None and task and not task.done():
+                    # 下一首還在解析中，等它完成比重新搜尋快
+                    await asyncio.wait({task}, timeout=30)
+                prefetched = player.take_prefetched()
+
+            if prefetched is not None:
+                # 使用預先載入的歌曲（網址已確認，FFmpeg 可能已經啟動）
+                if prefetched.from_queue:
+                    player.next()
+                song = prefetched.song
+                player.current = song
+                source = prefetched.source
             else:
-                # 如果沒有運行中的事件循環，創建一個新的
-                def run_after_playing():
+                song = player.next()
+
+                # 如果播放隊列沒歌且開啟自動串流，嘗試自動找歌加入
+                if not song and player.autoplay and player.category:
+                    song = await self.fetch_autoplay_song(player, guild_id)
+                    if song:
+                        player.add(song)
+                        song = player.next()
+
+                while song:
+                    resolved = await self.ensure_stream(song, guild_id)
+                    if resolved or player.repeat:
+                        song = resolved
+                        break
+                    # 無法取得網址（例如播放清單中已刪除或私人的影片），略過
+                    logger.warning(f"[play_next] 無法取得串流網址，略過：{song.get('title')}")
+                    song = player.next()
+
+            if not song:
+                if interaction:
+                    await interaction.followup.send("🎵 播放隊列已結束")
+                return
+        
+            try:
+                if source is not None and not isinstance(source, discord.PCMVolumeTransformer) and prefetched.volume != player.volume:
+                    # Opus 音源的音量在 FFmpeg 中套用，預先啟動後音量已變更就重新建立
+                    source.cleanup()
+                    source = None
+                start, player.resume_at = player.resume_at, 0.0
+                if source is None:
+                    source = self.create_source(song, player.volume, start=start)
+                else:
+                    source.volume = player.volume
+            
+                def after_callback(error):
+                    # 在語音執行緒中呼叫，只通知播放任務
+                    loop.call_soon_threadsafe(player.track_finished, error)
+            
+                vc.play(source, after=after_callback)
+                player.track_started = time.monotonic() - start
+                if song.get('id'):
+                    player.recent_ids.append(song['id'])
+                player.paused_at = None
+                player.retry_count = 0
+                self.schedule_prefetch(vc, guild_id)
+            
+                if interaction:
                     try:
-                        new_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(new_loop)
-                        new_loop.run_until_complete(self.after_playing(error, vc, guild_id))
+                        await interaction.followup.send(
+                            f"▶️ 正在播放：{song['title']}", 
+                            view=MusicControls(self.bot, guild_id, vc, player), 
+                            ephemeral=False
+                        )
                     except Exception as e:
-                        logger.error(f"[_schedule_after_playing] 執行失敗: {e}")
-                    finally:
-                        try:
-                            new_loop.close()
-                        except:
-                            pass
-                
-                # 在新線程中運行
-                import threading
-                thread = threading.Thread(target=run_after_playing, daemon=True)
-                thread.start()
-        except Exception as e:
-            logger.error(f"[_schedule_after_playing] 調度失敗: {e}")
+                        logger.error(f"[play_next] 發送互動訊息失敗: {e}")
+                return
+                    
+            except Exception as e:
+                logger.error(f"[play_next] 播放失敗: {e}")
+                player.retry_count += 1
+                if player.retry_count >= player.max_retries:
+                    player.retry_count = 0
+                    if interaction:
+                        await interaction.followup.send("❌ 播放失敗，請稍後再試")
+                    return
+                # 指數退避後改播下一首
+                await asyncio.sleep(min(2 ** player.retry_count, 8))
 
     @app_commands.command(name="play", description="播放音樂 (支援連結與關鍵字)")
     @app_commands.describe(query="YouTube 連結或搜尋字詞")
@@ -814,6 +1409,10 @@ class Music(commands.Cog):
             player = self.get_player(interaction.guild.id)
             player.retry_count = 0  # 重置重試計數
 
+            if is_playlist_url(query):
+                await self.enqueue_playlist(interaction, vc, player, query)
+                return
+
             # 顯示載入訊息
             loading_embed = discord.Embed(
                 title="🔍 正在搜尋歌曲...",
@@ -825,7 +1424,7 @@ class Music(commands.Cog):
             # 獲取歌曲資訊（添加超時處理）
             try:
                 song_info = await asyncio.wait_for(
-                    self.fetch_song_with_retry(query), 
+                    self.fetch_song_with_retry(query, guild_id=interaction.guild.id), 
                     timeout=45.0  # 30秒超時
                 )
             except asyncio.TimeoutError:
@@ -880,29 +1479,15 @@ class Music(commands.Cog):
                 await interaction.followup.send(embed=embed, ephemeral=True)
                 return
 
-            url = song_info['url']
             title = song_info.get('title', '未知標題')
-            player.add({"url": url, "title": title})
+            player.add(queue_entry(song_info))
 
             if not vc.is_playing() and not vc.is_paused():
-                # 開始播放
-                try:
-                    await self.play_next(vc, interaction.guild.id, interaction)
-                except Exception as e:
-                    logger.error(f"[play] 播放失敗: {e}")
-                    embed = discord.Embed(
-                        title="❌ 播放失敗",
-                        description="開始播放時發生錯誤",
-                        color=discord.Color.red()
-                    )
-                    embed.add_field(
-                        name="錯誤詳情",
-                        value=str(e)[:100] + "..." if len(str(e)) > 100 else str(e),
-                        inline=False
-                    )
-                    await interaction.followup.send(embed=embed, ephemeral=True)
+                # 開始播放（由播放任務處理，結果透過 interaction 回報）
+                self.request_play(vc, interaction.guild.id, interaction)
             else:
-                # 加入佇列
+                # 加入佇列（佇列已變更，重新準備下一首）
+                self.schedule_prefetch(vc, interaction.guild.id)
                 embed = discord.Embed(
                     title="✅ 已加入佇列",
                     description=f"**{title}**",
@@ -948,6 +1533,72 @@ class Music(commands.Cog):
                 # 如果連錯誤訊息都無法發送，記錄到日誌
                 logger.error(f"[play] 無法發送錯誤訊息: {e}")
 
+    async def fetch_playlist(self, url, limit, guild_id=None):
+        """平面解析播放清單（一次請求），回傳 (清單標題, 最多 limit 首歌曲, 是否有歌曲因上限未加入)"""
+        info = await self.extractor.extract(url, FLAT_CONFIG_IDX, guild_id, timeout=60.0)
+        if not info:
+            return None, [], False
+        songs = []
+        for entry in info.get('entries') or []:
+            if not entry or not entry.get('id'):
+                continue
+            if entry.get('title') in ('[Private video]', '[Deleted video]'):
+                continue
+            if len(songs) >= limit:
+                return info.get('title'), songs, True
+            songs.append(playlist_entry(entry))
+        return info.get('title'), songs, False
+
+    async def enqueue_playlist(self, interaction, vc, player, url):
+        """把播放清單加入佇列（上限為 max_queue_size），各首歌的網址輪到播放時才解析"""
+        max_queue_size = self.music_config.get('max_queue_size', 50)
+        room = max_queue_size - len(player.queue)
+        if room <= 0:
+            embed = discord.Embed(
+                title="❌ 佇列已滿",
+                description=f"佇列最多 {max_queue_size} 首歌曲",
+                color=discord.Color.red()
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        loading_embed = discord.Embed(
+            title="📃 正在讀取播放清單...",
+            description=f"正在處理：`{url[:50]}{'...' if len(url) > 50 else ''}`",
+            color=discord.Color.blue()
+        )
+        await interaction.followup.send(embed=loading_embed, ephemeral=True)
+
+        try:
+            playlist_title, songs, truncated = await self.fetch_playlist(url, room, guild_id=interaction.guild.id)
+        except asyncio.TimeoutError:
+            playlist_title, songs, truncated = None, [], False
+        if not songs:
+            embed = discord.Embed(
+                title="❌ 無法讀取播放清單",
+                description="播放清單不存在、為私人清單或沒有可播放的影片",
+                color=discord.Color.red()
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        player.extend(songs)
+        if not vc.is_playing() and not vc.is_paused():
+            self.request_play(vc, interaction.guild.id, interaction)
+        else:
+            self.schedule_prefetch(vc, interaction.guild.id)
+
+        embed = discord.Embed(
+            title="✅ 已加入播放清單",
+            description=f"**{playlist_title or '播放清單'}**",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="加入歌曲", value=f"{len(songs)} 首", inline=True)
+        embed.add_field(name="佇列長度", value=f"{len(player.queue)} / {max_queue_size}", inline=True)
+        if truncated:
+            embed.set_footer(text="已達佇列上限，其餘歌曲未加入")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
     @app_commands.command(name="volume", description="設定音量 (1-100)")
     @app_commands.describe(level="音量等級")
     async def volume(self, interaction: discord.Interaction, level: int):
@@ -977,8 +1628,7 @@ class Music(commands.Cog):
 
             player = self.get_player(interaction.guild.id)
             player.volume = level / 100
-            if vc.source:
-                vc.source.volume = player.volume
+            self.apply_volume(vc, player)
 
             embed = discord.Embed(
                 title="🔊 音量已調整",
@@ -1005,7 +1655,7 @@ class Music(commands.Cog):
                 
             vc.pause()
             player = self.get_player(interaction.guild.id)
-            player.is_paused = True
+            player.mark_paused()
             
             embed = discord.Embed(
                 title="⏸ 已暫停播放",
@@ -1032,7 +1682,7 @@ class Music(commands.Cog):
                 
             vc.resume()
             player = self.get_player(interaction.guild.id)
-            player.is_paused = False
+            player.mark_resumed()
             
             embed = discord.Embed(
                 title="▶️ 已繼續播放",
@@ -1149,15 +1799,11 @@ class Music(commands.Cog):
             return
 
         # 直接抓一首該類別歌加入佇列並播放（如果沒在播）
-        keywords = self.category_keywords.get(category.value)
-        song = None
-        if keywords:
-            keyword = random.choice(keywords)
-            song = await self.fetch_song_with_retry(keyword)
+        song = await self.fetch_autoplay_song(player, interaction.guild.id)
         if song:
-            player.add({"url": song['url'], "title": song['title']})
+            player.add(song)
             if not vc.is_playing() and not vc.is_paused():
-                await self.play_next(vc, interaction.guild.id, interaction)
+                self.request_play(vc, interaction.guild.id, interaction)
             await interaction.followup.send(f"▶️ 自動串流已啟動，並加入歌曲：{song['title']}")
         else:
             await interaction.followup.send("❌ 找不到符合類別的歌曲。")
@@ -1177,7 +1823,8 @@ class Music(commands.Cog):
         await vc.disconnect()
         guild_id = interaction.guild.id
         if guild_id in self.players:
-            self.players.pop(guild_id)
+            self.players.pop(guild_id).close()
+        self.forget_session(guild_id)
         if guild_id in self.connection_retries:
             self.connection_retries.pop(guild_id)
         await interaction.response.send_message("👋 已離開語音頻道。", ephemeral=True)
@@ -1207,8 +1854,8 @@ class Music(commands.Cog):
         guild_id = interaction.guild.id
         
         # 清理快取
-        self.song_cache.cache.clear()
-        self.song_cache.save_cache()
+        self.song_cache.clear()
+        self.lookups.clear_failures()
         
         # 清理連接重試記錄
         if guild_id in self.connection_retries:
@@ -1264,8 +1911,22 @@ class Music(commands.Cog):
             embed.add_field(name="🎵 自動串流", value="關閉", inline=True)
         
         # 快取狀態
-        cache_size = len(self.song_cache.cache)
-        embed.add_field(name="💾 快取大小", value=f"{cache_size} 首歌曲", inline=True)
+        cache_stats = self.song_cache.stats()
+        embed.add_field(name="💾 快取大小", value=f"{cache_stats['tracks']} 首歌曲 / {cache_stats['queries']} 個搜尋", inline=True)
+        
+        # 解析佇列
+        extract_stats = self.extractor.stats()
+        embed.add_field(
+            name="🎧 解析佇列",
+            value=f"排隊 {extract_stats['queued']} / 執行中 {extract_stats['running']}（平均等待 {extract_stats['avg_wait_ms']} ms）",
+            inline=True
+        )
+        pool_stats = self.autoplay_pool.stats()
+        embed.add_field(
+            name="🎲 自動串流候選",
+            value=" / ".join(f"{category} {count}" for category, count in pool_stats['ready'].items()),
+            inline=True
+        )
         
         # 連接重試狀態
         retry_count = self.connection_retries.get(guild_id, 0)
@@ -1273,7 +1934,8 @@ class Music(commands.Cog):
         
         # FFmpeg 配置狀態
         ffmpeg_executable = self.ffmpeg_config.get('ffmpeg_path', 'ffmpeg')
-        embed.add_field(name="🎬 FFmpeg", value=ffmpeg_executable, inline=True)
+        playback_mode = self.ffmpeg_config.get('playback_mode', 'opus')
+        embed.add_field(name="🎬 FFmpeg", value=f"{ffmpeg_executable}（{playback_mode}）", inline=True)
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -1319,9 +1981,11 @@ class Music(commands.Cog):
                 if guild_id in self.players:
                     player = self.players[guild_id]
                     player.queue.clear()
+                    player.invalidate_prefetch()
                     player.current = None
                     player.is_paused = False
                     player.repeat = False
+                self.forget_session(guild_id)
                     
                 # 重置重連計數
                 self.reconnect_attempts[guild_id] = 0
@@ -1370,7 +2034,9 @@ class Music(commands.Cog):
                             if guild_id in self.players:
                                 player = self.players[guild_id]
                                 if player.current and not voice_client.is_playing():
-                                    await self.play_next(voice_client, guild_id)
+                                    # 從斷線時的位置繼續播放目前歌曲
+                                    player.resume_from(player.position())
+                                    self.request_play(voice_client, guild_id)
                                     
                     except Exception as e:
                         logger.error(f"[on_voice_client_disconnect] 重連失敗: {e}")
@@ -1446,6 +2112,82 @@ class Music(commands.Cog):
                 logger.error(f"[periodic_cleanup] 定期清理失敗: {e}")
                 await asyncio.sleep(60)  # 發生錯誤時等待1分鐘再試
 
+    def snapshot_sessions(self):
+        """記錄各伺服器目前的播放狀態（沒有在播放的伺服器會被移除）"""
+        sessions = {}
+        for guild_id, player in self.players.items():
+            guild = self.bot.get_guild(guild_id)
+            vc = guild.voice_client if guild else None
+            if vc is None or not vc.is_connected() or (player.current is None and not player.queue):
+                continue
+            sessions[str(guild_id)] = player.snapshot(vc.channel.id)
+        if sessions or self.sessions.data:
+            self.sessions.data = sessions
+            self.sessions.mark_dirty()
+
+    def forget_session(self, guild_id):
+        """離開語音頻道時移除快照，重新啟動後不再恢復"""
+        if self.sessions.data.pop(str(guild_id), None) is not None:
+            self.sessions.mark_dirty()
+
+    async def session_snapshot_loop(self):
+        """定期快照播放狀態"""
+        while True:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            # 恢復完成前不要用空的狀態覆蓋上次的快照
+            if self._restore_task is None or not self._restore_task.done():
+                continue
+            try:
+                self.snapshot_sessions()
+            except Exception as e:
+                logger.error(f"[session_snapshot] 快照播放狀態失敗: {e}")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self._restore_task is None:
+            self._restore_task = asyncio.create_task(self.restore_sessions())
+
+    async def restore_sessions(self):
+        """Bot 啟動後恢復上次的播放狀態：重新加入語音頻道並從保存的位置繼續播放"""
+        saved = dict(self.sessions.data)
+        now = time.time()
+        saved = {key: data for key, data in saved.items() if now - data.get('saved_at', 0) <= SESSION_MAX_AGE}
+        if not saved:
+            return
+        results = await asyncio.gather(
+            *(self.restore_session(int(key), data) for key, data in saved.items()),
+            return_exceptions=True
+        )
+        for key, result in zip(saved, results):
+            if isinstance(result, Exception):
+                logger.error(f"[restore_sessions] 恢復伺服器 {key} 的播放失敗: {result}")
+        restored = sum(1 for result in results if result is True)
+        logger.info(f"[Music] 已恢復 {restored}/{len(saved)} 個伺服器的播放狀態")
+
+    async def restore_session(self, guild_id, data):
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(data.get('channel_id')) if guild else None
+        if not isinstance(channel, (discord.VoiceChannel, discord.StageChannel)):
+            return False
+        # 頻道裡已經沒有人就不回去
+        if not any(not member.bot for member in channel.members):
+            return False
+        if not channel.permissions_for(guild.me).connect:
+            return False
+        player = self.get_player(guild_id)
+        player.restore(data)
+        if player.current is None and not player.queue:
+            return False
+        vc = guild.voice_client
+        if vc is None or not vc.is_connected():
+            try:
+                vc = await channel.connect(timeout=45.0, self_deaf=True)
+            except Exception:
+                self.players.pop(guild_id, None)
+                raise
+        self.request_play(vc, guild_id)
+        return True
+
     def save_ffmpeg_config(self, config=None):
         """保存 FFmpeg 配置"""
         if config is None:
@@ -1464,7 +2206,9 @@ class Music(commands.Cog):
             "ffmpeg_options": {
                 "before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
                 "options": "-vn -b:a 128k -bufsize 3072k"
-            }
+            },
+            "playback_mode": "opus",
+            "opus_bitrate": 128
         }
 
     async def _start_cleanup_task(self):
@@ -1473,8 +2217,23 @@ class Music(commands.Cog):
             self._cleanup_task_started = True
             # 直接創建任務，不需要訪問 loop
             asyncio.create_task(self.periodic_cleanup())
+            asyncio.create_task(self.session_snapshot_loop())
+            self.song_cache.start()
+            self.sessions.start()
+            self.autoplay_pool.start()
             logger.info("[Music] 定期清理任務已啟動")
 
+    async def cog_unload(self):
+        # 關閉或重新啟動前保存播放狀態（語音連線此時仍在）
+        if self._restore_task is not None and self._restore_task.done():
+            self.snapshot_sessions()
+        for player in self.players.values():
+            player.close()
+        self.autoplay_pool.close()
+        self.extractor.shutdown()
+        await self.song_cache.close()
+        await self.sessions.close()
+
 async def setup(bot):
     cog = Music(bot)
     await bot.add_cog(cog)
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# 測試直接匯入專案根目錄的 utils 套件
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.storage import Storage  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = Storage(str(tmp_path / "test.db"))
+    yield storage
+    storage.close()
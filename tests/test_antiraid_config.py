@@ -0,0 +1,57 @@
+import json
+import os
+
+from utils.antiraid_config import DEFAULT_CONFIG, AntiRaidConfig
+
+
+def write(path, text, mtime):
+    path.write_text(text, encoding='utf-8')
+    # 固定 mtime，避免同一時間內寫入兩次時 mtime 相同
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_missing_file_writes_defaults(tmp_path):
+    path = tmp_path / 'antiraid_config.json'
+    config = AntiRaidConfig(str(path))
+    assert json.loads(path.read_text(encoding='utf-8')) == DEFAULT_CONFIG
+    assert config.get(1).raid_threshold == DEFAULT_CONFIG['raid_threshold']
+
+
+def test_reload_applies_changed_file(tmp_path):
+    path = tmp_path / 'antiraid_config.json'
+    write(path, json.dumps({'raid_threshold': 7}), 1_000_000_000)
+    config = AntiRaidConfig(str(path))
+    assert config.get(1).raid_threshold == 7
+    assert config.reload_if_changed(force=True) is False  # 沒有變更
+
+    write(path, json.dumps({'raid_threshold': 7, 'guilds': {'1': {'raid_threshold': 3}}}), 2_000_000_000)
+    assert config.reload_if_changed(force=True) is True
+    assert config.get(1).raid_threshold == 3
+    assert config.get(2).raid_threshold == 7
+
+
+def test_reload_is_rate_limited(tmp_path):
+    path = tmp_path / 'antiraid_config.json'
+    write(path, json.dumps({'raid_threshold': 7}), 1_000_000_000)
+    config = AntiRaidConfig(str(path))
+    config.reload_if_changed(force=True)
+
+    write(path, json.dumps({'raid_threshold': 8}), 2_000_000_000)
+    assert config.reload_if_changed() is False
+    assert config.get(1).raid_threshold == 7
+
+
+def test_bad_reload_keeps_previous_config(tmp_path):
+    path = tmp_path / 'antiraid_config.json'
+    write(path, json.dumps({'raid_threshold': 7}), 1_000_000_000)
+    config = AntiRaidConfig(str(path))
+
+    write(path, '{"raid_threshold": ', 2_000_000_000)
+    assert config.reload_if_changed(force=True) is False
+    assert config.get(1).raid_threshold == 7
+    assert path.read_text(encoding='utf-8') == '{"raid_threshold": '  # 不覆寫編輯中的檔案
+    assert config.reload_if_changed(force=True) is False  # 同一版本不重複嘗試
+
+    path.unlink()
+    assert config.reload_if_changed(force=True) is False
+    assert config.get(1).raid_threshold == 7
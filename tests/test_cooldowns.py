@@ -0,0 +1,59 @@
+import asyncio
+
+from utils.cooldowns import PERSIST_MIN_PERIOD, CooldownManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def persisted(storage):
+    return storage.fetchall_sync("SELECT action, user_id FROM cooldowns ORDER BY action")
+
+
+def test_only_long_cooldowns_are_persisted(storage):
+    async def scenario():
+        cooldowns = CooldownManager(storage)
+        assert await cooldowns.check_and_set(1, 'short', PERSIST_MIN_PERIOD - 1) == 0
+        assert await cooldowns.check_and_set(1, 'daily', 86400) == 0
+        assert await cooldowns.check_and_set(1, 'short', PERSIST_MIN_PERIOD - 1) > 0
+
+    run(scenario())
+    assert persisted(storage) == [('daily', 1)]
+
+    # 重新啟動後只有長冷卻仍然有效
+    async def restarted():
+        cooldowns = CooldownManager(storage)
+        return (
+            await cooldowns.check_and_set(1, 'daily', 86400),
+            await cooldowns.check_and_set(1, 'short', PERSIST_MIN_PERIOD - 1),
+        )
+
+    daily, short = run(restarted())
+    assert 86000 < daily <= 86400
+    assert short == 0
+
+
+def test_concurrent_checks_only_one_passes(storage):
+    async def scenario():
+        cooldowns = CooldownManager(storage)
+        return await asyncio.gather(*(cooldowns.check_and_set(1, 'work', 300) for _ in range(10)))
+
+    results = run(scenario())
+    assert results.count(0.0) == 1
+
+
+def test_reset_is_not_read_back_from_database(storage):
+    async def scenario():
+        cooldowns = CooldownManager(storage)
+        await cooldowns.check_and_set(1, 'daily', 86400)
+        await cooldowns.reset(1, 'daily')
+        # 清除記憶體中的項目後仍不會從資料庫讀回舊紀錄
+        cooldowns._sweep(float('inf'))
+        first = await cooldowns.check_and_set(1, 'daily', 86400)
+        await cooldowns.reset(1, 'daily')
+        return first
+
+    assert run(scenario()) == 0
+    assert persisted(storage) == []
+    assert run(CooldownManager(storage).check_and_set(1, 'daily', 86400)) == 0
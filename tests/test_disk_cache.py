@@ -0,0 +1,37 @@
+import os
+
+from utils.disk_cache import DiskLRU
+
+
+def test_byte_bound_evicts_least_recently_used(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_entries=100, max_bytes=250)
+    cache.write('a', b'a' * 100)
+    cache.write('b', b'b' * 100)
+    assert cache.read('a') == b'a' * 100  # a 變成最近使用
+    cache.write('c', b'c' * 100)
+
+    assert cache.read('b') is None
+    assert cache.read('a') is not None and cache.read('c') is not None
+    assert cache.stats() == {'entries': 2, 'bytes': 200, 'evicted': 1}
+    assert sorted(os.listdir(tmp_path)) == ['a.png', 'c.png']
+
+
+def test_entry_bound_and_overwrite(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_entries=2, max_bytes=10_000)
+    cache.write('a', b'1' * 10)
+    cache.write('a', b'2' * 20)  # 覆寫不重複計算大小
+    cache.write('b', b'3' * 10)
+    assert cache.stats() == {'entries': 2, 'bytes': 30, 'evicted': 0}
+    cache.write('c', b'4' * 10)
+    assert cache.read('a') is None
+    assert cache.stats()['entries'] == 2
+
+
+def test_rescan_restores_index(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_entries=10, max_bytes=1000)
+    cache.write('a', b'x' * 300)
+    cache.write('b', b'y' * 300)
+    reopened = DiskLRU(str(tmp_path), max_entries=10, max_bytes=1000)
+    assert reopened.stats() == {'entries': 2, 'bytes': 600, 'evicted': 0}
+    reopened.write('c', b'z' * 500)
+    assert reopened.stats()['bytes'] <= 1000
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+
+from utils.extraction import ExtractionService  # noqa: E402
+
+
+@pytest.fixture
+def service():
+    service = ExtractionService([{}], workers=1)
+    service.ran = []
+    service.gate = threading.Event()
+
+    def fake_extract(config_idx, query):
+        if query == 'blocker':
+            service.gate.wait(5)
+        service.ran.append(query)
+        return {'query': query}
+
+    service._extract = fake_extract
+    yield service
+    service.gate.set()
+    service.shutdown()
+
+
+def test_guilds_take_turns(service):
+    async def scenario():
+        blocker = asyncio.create_task(service.extract('blocker', guild_id='x'))
+        await asyncio.sleep(0)
+        jobs = [asyncio.create_task(service.extract(query, guild_id=guild)) for guild, query in (
+            ('a', 'a1'), ('a', 'a2'), ('a', 'a3'), ('b', 'b1'), ('c', 'c1'), ('b', 'b2'),
+        )]
+        await asyncio.sleep(0)
+        assert service.stats()['guilds_waiting'] == 3
+        service.gate.set()
+        results = await asyncio.gather(blocker, *jobs)
+        return [result['query'] for result in results]
+
+    assert asyncio.run(scenario()) == ['blocker', 'a1', 'a2', 'a3', 'b1', 'c1', 'b2']
+    assert service.ran == ['blocker', 'a1', 'b1', 'c1', 'a2', 'b2', 'a3']
+    assert service.stats()['completed'] == 7
+
+
+def test_timed_out_job_is_not_run(service):
+    async def scenario():
+        blocker = asyncio.create_task(service.extract('blocker', guild_id='x'))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await service.extract('late', guild_id='a', timeout=0.05)
+        service.gate.set()
+        await blocker
+        assert (await service.extract('next', guild_id='a'))['query'] == 'next'
+
+    asyncio.run(scenario())
+    assert service.ran == ['blocker', 'next']
+    assert service.stats()['cancelled'] == 1
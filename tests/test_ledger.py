@@ -0,0 +1,116 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from utils.ledger import InsufficientFunds, Ledger
+from utils.storage import migrate_json_files
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_debit_over_balance_changes_nothing(storage):
+    ledger = Ledger(storage, 'coins')
+
+    async def scenario():
+        await ledger.credit(1, 30, 'test')
+        with pytest.raises(InsufficientFunds) as excinfo:
+            await ledger.debit(1, 31, 'test')
+        assert excinfo.value.balance == 30
+        with pytest.raises(InsufficientFunds):
+            await ledger.debit(2, 1, 'test')  # 沒有帳戶
+        return await ledger.balance(1), await ledger.balance(2)
+
+    assert run(scenario()) == (30, 0)
+
+
+def test_require_checks_balance_before_applying(storage):
+    ledger = Ledger(storage, 'economy')
+
+    async def scenario():
+        await ledger.credit(1, 50, 'test')
+        # 賭注 80 輸掉 10：balance - 10 仍為正，但持有不足 require
+        with pytest.raises(InsufficientFunds):
+            await ledger.apply(1, -10, 'gamble', require=80)
+        return await ledger.apply(1, -10, 'gamble', require=50)
+
+    assert run(scenario()) == 40
+
+
+def test_concurrent_transfers_never_overdraw(storage):
+    ledger = Ledger(storage, 'coins')
+
+    async def scenario():
+        await ledger.credit(1, 100, 'seed')
+        results = await asyncio.gather(
+            *(ledger.transfer(1, 2, 10, 'give') for _ in range(50)),
+            return_exceptions=True,
+        )
+        return results, await ledger.balance(1), await ledger.balance(2)
+
+    results, sender, recipient = run(scenario())
+    succeeded = [r for r in results if not isinstance(r, Exception)]
+    failed = [r for r in results if isinstance(r, Exception)]
+    assert len(succeeded) == 10
+    assert all(isinstance(r, InsufficientFunds) for r in failed)
+    assert (sender, recipient) == (0, 100)
+    # 每筆成功的轉帳寫入兩筆交易紀錄，失敗的轉帳整筆回滾
+    rows = storage.fetchall_sync("SELECT COUNT(*), SUM(delta) FROM ledger_log WHERE reason = 'give'")
+    assert rows == [(20, 0)]
+
+
+def test_transfer_rejects_non_positive_amount(storage):
+    ledger = Ledger(storage, 'coins')
+    with pytest.raises(ValueError):
+        run(ledger.transfer(1, 2, 0))
+
+
+def test_set_balance_logs_difference(storage):
+    ledger = Ledger(storage, 'economy')
+
+    async def scenario():
+        await ledger.credit(1, 70, 'seed')
+        return await ledger.set_balance(1, 20, 'admin')
+
+    assert run(scenario()) == 20
+    rows = storage.fetchall_sync("SELECT delta, balance_after FROM ledger_log WHERE reason = 'admin'")
+    assert rows == [(-50, 20)]
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+
+def test_json_migration(storage, tmp_path, monkeypatch):
+    last_daily = datetime(2026, 1, 2, 3, 4, 5)
+    write_json(tmp_path / 'coins.json', {'1': 10, '2': 20, 'bad': 5})
+    write_json(tmp_path / 'economy.json', {'1': 300, '1_last_daily': last_daily.isoformat(), '2_last_work': 'nope'})
+    write_json(tmp_path / 'minigames_leaderboard.json', {'rps': {'1': 3, '2': 1}})
+    write_json(tmp_path / 'analytics.json', {
+        'message_counts': {'9': {'2026-01-02': 4}},
+        'user_activity': {'9': {'1': {'message_count': 4, 'last_active': 'x', 'channels': {'5': 4}}}},
+        'channel_activity': {'9': {'5': 4}},
+        'command_usage': {'9': {'rank': {'users': {'1': 2}}}},
+    })
+    monkeypatch.chdir(tmp_path)
+
+    counts = migrate_json_files(storage)
+    assert counts == {'coins': 2, 'economy': 1, 'cooldowns': 1, 'game_wins': 2, 'user_activity': 1}
+    assert storage.fetchall_sync("SELECT namespace, user_id, balance FROM balances ORDER BY namespace, user_id") == [
+        ('coins', 1, 10), ('coins', 2, 20), ('economy', 1, 300),
+    ]
+    assert storage.fetchall_sync("SELECT action, user_id, last_used FROM cooldowns") == [
+        ('daily', 1, last_daily.timestamp()),
+    ]
+    assert storage.fetchall_sync("SELECT game, user_id, wins FROM game_wins ORDER BY user_id") == [
+        ('rps', 1, 3), ('rps', 2, 1),
+    ]
+    assert storage.fetchall_sync("SELECT uses FROM command_usage") == [(2,)]
+
+    # 已遷移過則略過，之後的變更不會被舊 JSON 覆蓋
+    run(Ledger(storage, 'coins').credit(1, 5, 'test'))
+    assert migrate_json_files(storage) is None
+    assert run(storage.get_balance('coins', 1)) == 15
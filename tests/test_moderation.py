@@ -0,0 +1,103 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('discord')
+
+from utils.moderation import EMBEDS_PER_MESSAGE, ModerationQueue  # noqa: E402
+
+
+class FakeMember:
+    def __init__(self, guild_id, user_id):
+        self.guild = SimpleNamespace(id=guild_id)
+        self.id = user_id
+        self.calls = []
+
+    async def timeout(self, duration, reason=None):
+        self.calls.append((duration, reason))
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = []
+        self.bulk = []
+
+    async def send(self, embeds):
+        self.sent.append(list(embeds))
+
+    async def delete_messages(self, messages, reason=None):
+        self.bulk.append([message.id for message in messages])
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_timeouts_for_same_member_are_coalesced():
+    member, other = FakeMember(1, 10), FakeMember(1, 11)
+
+    async def scenario():
+        queue = ModerationQueue(SimpleNamespace())
+        queue.timeout(member, 300, 'spam')
+        queue.timeout(member, 1800, 'scam')
+        queue.timeout(member, 600, 'profanity')
+        queue.timeout(other, 60, 'spam')
+        await queue.close()
+        return queue.stats()
+
+    stats = run(scenario())
+    assert member.calls == [(datetime.timedelta(seconds=1800), 'scam')]
+    assert other.calls == [(datetime.timedelta(seconds=60), 'spam')]
+    assert stats['timeouts'] == 2
+    assert stats['timeouts_coalesced'] == 2
+
+
+def test_timeout_already_applied_is_skipped():
+    member = FakeMember(1, 10)
+
+    async def scenario():
+        queue = ModerationQueue(SimpleNamespace())
+        queue.timeout(member, 600)
+        queue._drain_pending()
+        queue.timeout(member, 300)  # 仍在 600 秒禁言中
+        await queue.close()
+
+    run(scenario())
+    assert len(member.calls) == 1
+
+
+def test_logs_are_batched_per_channel():
+    channels = {1: FakeChannel(1), 2: FakeChannel(2)}
+    bot = SimpleNamespace(get_channel=channels.get)
+
+    async def scenario():
+        queue = ModerationQueue(bot)
+        for i in range(EMBEDS_PER_MESSAGE + 2):
+            queue.log(1, f"embed-{i}")
+        queue.log(2, "other")
+        await queue.close()
+        return queue.stats()
+
+    stats = run(scenario())
+    assert [len(embeds) for embeds in channels[1].sent] == [EMBEDS_PER_MESSAGE, 2]
+    assert channels[2].sent == [["other"]]
+    assert stats['log_messages'] == 3
+    assert stats['log_embeds'] == EMBEDS_PER_MESSAGE + 3
+
+
+def test_deletes_are_bulk_sent_per_channel():
+    channel = FakeChannel(5)
+
+    async def scenario():
+        queue = ModerationQueue(SimpleNamespace())
+        for message_id in (1, 2, 2, 3):
+            queue.delete(SimpleNamespace(id=message_id, channel=channel))
+        await queue.close()
+        return queue.stats()
+
+    stats = run(scenario())
+    assert channel.bulk == [[1, 2, 3]]
+    assert stats['deleted'] == 3
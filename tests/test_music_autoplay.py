@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('discord')
+
+from cogs.music import AutoMusicPlayer, AutoplayPool, Music, Prefetched  # noqa: E402
+
+
+def entry(video_id):
+    return {'id': video_id, 'title': video_id, 'url': f'https://example.invalid/{video_id}'}
+
+
+def make_pool(*ids):
+    pool = AutoplayPool(None, {'pop': ['keyword']})
+    pool.ready['pop'].extend(entry(video_id) for video_id in ids)
+    return pool
+
+
+def test_invalidated_autoplay_prefetch_returns_to_front():
+    pool = make_pool('a', 'b')
+    player = AutoMusicPlayer()
+    song = pool.take('pop')
+    player.prefetched = Prefetched(player.version, song, None, False, pool=pool, category='pop')
+
+    player.invalidate_prefetch()
+
+    assert [song['id'] for song in pool.ready['pop']] == ['a', 'b']
+    assert pool.take('pop') is song
+
+
+def test_stale_prefetch_is_returned_once():
+    pool = make_pool('a', 'b')
+    player = AutoMusicPlayer()
+    prefetched = player.prefetched = Prefetched(player.version, pool.take('pop'), None, False, pool=pool, category='pop')
+    player.version += 1
+
+    assert player.take_prefetched() is None
+    prefetched.discard()
+    assert [song['id'] for song in pool.ready['pop']] == ['a', 'b']
+    assert pool.stats()['returned'] == 1
+
+
+def test_queue_prefetch_is_not_added_to_pool():
+    pool = make_pool('b')
+    player = AutoMusicPlayer()
+    player.prefetched = Prefetched(player.version, entry('q'), None, True)
+
+    player.invalidate_prefetch()
+
+    assert [song['id'] for song in pool.ready['pop']] == ['b']
+
+
+def test_prefetch_next_puts_autoplay_track_back_on_queue_edit():
+    pool = make_pool('a', 'b')
+    player = AutoMusicPlayer()
+    player.autoplay, player.category = True, 'pop'
+    player.current = {**entry('now'), 'duration': None}
+
+    async def fetch_autoplay_song(player, guild_id):
+        return pool.take(player.category, set(player.recent_ids))
+
+    cog = SimpleNamespace(get_player=lambda guild_id: player, autoplay_pool=pool,
+                          fetch_autoplay_song=fetch_autoplay_song)
+
+    asyncio.run(Music._prefetch_next(cog, None, 1, player.version))
+    assert player.prefetched.song['id'] == 'a'
+    assert [song['id'] for song in pool.ready['pop']] == ['b']
+
+    player.add(entry('q'))  # 使用者加歌，預先載入的自動串流歌曲失效
+
+    assert player.prefetched is None
+    assert [song['id'] for song in pool.ready['pop']] == ['a', 'b']
@@ -0,0 +1,49 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+
+discord = pytest.importorskip('discord')
+
+from cogs.music import Music  # noqa: E402
+
+URL = 'https://example.invalid/stream'
+
+
+@pytest.fixture
+def spawned(monkeypatch):
+    """攔截 FFmpeg 啟動，記錄參數"""
+    calls = []
+
+    def fake_spawn(self, args, **kwargs):
+        calls.append(args)
+        return SimpleNamespace(stdout=io.BytesIO(), pid=0, kill=lambda: None, poll=lambda: 0)
+
+    monkeypatch.setattr(discord.player.FFmpegAudio, '_spawn_process', fake_spawn)
+    return calls
+
+
+def create(song, volume):
+    cog = SimpleNamespace(ffmpeg_config={'opus_bitrate': 96})
+    return Music.create_opus_source(cog, song, volume, '-reconnect 1', '-vn', 'ffmpeg')
+
+
+def codec_of(args):
+    return args[args.index('-c:a') + 1]
+
+
+def test_opus_source_at_full_volume_is_copied(spawned):
+    create({'url': URL, 'acodec': 'opus'}, 1.0)
+    args = spawned[0]
+    assert codec_of(args) == 'copy'
+    assert '-filter:a' not in args
+
+
+@pytest.mark.parametrize('acodec, volume', [('opus', 0.5), ('mp4a.40.2', 1.0), (None, 0.5)])
+def test_reencode_uses_libopus_with_volume_filter(spawned, acodec, volume):
+    create({'url': URL, 'acodec': acodec}, volume)
+    args = spawned[0]
+    # FFmpeg 不允許串流複製時使用濾鏡，也不能把非 Opus 的音訊直接複製進 Ogg/Opus
+    assert codec_of(args) == 'libopus'
+    assert args[args.index('-filter:a') + 1] == f'volume={volume:.2f}'
+    assert args[args.index('-b:a') + 1] == '96k'
@@ -0,0 +1,42 @@
+import os
+import threading
+
+import pytest
+
+from utils.persistence import atomic_write_bytes
+
+
+def test_concurrent_writes_to_same_path(tmp_path):
+    path = tmp_path / 'avatar.png'
+    payloads = [bytes([i]) * 200_000 for i in range(8)]
+    errors = []
+    barrier = threading.Barrier(len(payloads))
+
+    def write(payload):
+        barrier.wait()
+        try:
+            for _ in range(5):
+                atomic_write_bytes(str(path), payload)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(p,)) for p in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # 檔案永遠是某一次完整的寫入，且沒有遺留暫存檔
+    assert path.read_bytes() in payloads
+    assert os.listdir(tmp_path) == ['avatar.png']
+
+
+def test_failed_write_removes_temp_file(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        atomic_write_bytes(str(tmp_path / 'x.png'), b'data')
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from utils.ranking import Rankings
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def board(storage):
+    async def fill():
+        for user_id, wins in ((1, 5), (2, 9), (3, 5), (4, 1)):
+            await storage.execute(
+                "INSERT INTO game_wins (game, user_id, wins) VALUES (?, ?, ?)", ('dice', user_id, wins)
+            )
+        # 其他分組不影響名次
+        await storage.execute("INSERT INTO game_wins (game, user_id, wins) VALUES (?, ?, ?)", ('slots', 5, 100))
+
+    run(fill())
+    return Rankings(storage).board('wins', 'dice')
+
+
+def test_rank_ties_share_position(board):
+    async def ranks():
+        return [await board.rank(user_id) for user_id in (1, 2, 3, 4)]
+
+    assert run(ranks()) == [(2, 5), (1, 9), (2, 5), (4, 1)]
+
+
+def test_rank_missing_user(board):
+    assert run(board.rank(5)) == (None, None)
+    assert run(board.score(5)) is None
+
+
+def test_top_orders_ties_by_user_id(board):
+    assert [tuple(row) for row in run(board.top(3))] == [(2, 9), (1, 5), (3, 5)]
+    assert run(board.count()) == 4
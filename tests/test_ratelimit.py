@@ -0,0 +1,40 @@
+from utils.ratelimit import SlidingWindowLimiter
+
+
+def test_triggers_when_limit_reached_within_window():
+    limiter = SlidingWindowLimiter('test')
+    assert not limiter.hit('a', 3, 5, now=0.0)
+    assert not limiter.hit('a', 3, 5, now=1.0)
+    assert limiter.hit('a', 3, 5, now=2.0)
+    # 最早的事件離開視窗後不再觸發
+    assert not limiter.hit('a', 3, 5, now=7.5)
+
+
+def test_keys_are_independent_and_reset():
+    limiter = SlidingWindowLimiter('test')
+    assert not limiter.hit('a', 2, 5, now=0.0)
+    assert not limiter.hit('b', 2, 5, now=0.5)
+    assert limiter.hit('a', 2, 5, now=1.0)
+    limiter.reset('a')
+    assert not limiter.hit('a', 2, 5, now=1.5)
+
+
+def test_idle_keys_are_evicted():
+    limiter = SlidingWindowLimiter('test', idle_ttl=10)
+    limiter.hit('old', 5, 5, now=0.0)
+    limiter.hit('recent', 5, 5, now=5.0)
+    limiter.hit('new', 5, 5, now=12.0)
+    assert len(limiter) == 2
+    assert limiter.stats() == {'keys': 2, 'evicted': 1}
+
+
+def test_key_count_is_bounded():
+    limiter = SlidingWindowLimiter('test', idle_ttl=3600, max_keys=100)
+    for i in range(1000):
+        limiter.hit(i, 5, 5, now=float(i))
+    assert len(limiter) == 100
+    assert limiter.evicted == 900
+    # 淘汰最久沒用到的 key，最近使用的保留
+    limiter.hit(900, 5, 5, now=1000.0)
+    limiter.hit('x', 5, 5, now=1001.0)
+    assert 900 in limiter._rings and 901 not in limiter._rings
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight('test')
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do('k', work) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ['result'] * 10
+    assert len(calls) == 1
+    assert flight.stats() == {'started': 1, 'joined': 9, 'negative_hits': 0, 'inflight': 0, 'failures': 0}
+
+
+def test_failures_are_shared_and_cached():
+    flight = SingleFlight('test', negative_ttl=60)
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError('boom')
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do('k', fail) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do('k', fail)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(calls) == 1
+    assert flight.counters['negative_hits'] == 1
+
+
+def test_last_waiter_cancel_cancels_work():
+    flight = SingleFlight('test')
+
+    async def scenario():
+        done = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                done.set()
+                raise
+
+        waiter = asyncio.create_task(flight.do('k', work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.wait_for(done.wait(), 1)
+        await asyncio.sleep(0)
+        return flight.stats()['inflight']
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,100 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip('discord')
+
+from cogs.music import SongCache  # noqa: E402
+
+
+def info(video_id, expire=None, **extra):
+    expire = expire or int(time.time()) + 6 * 3600
+    return {
+        'id': video_id,
+        'title': f'title {video_id}',
+        'duration': 200,
+        'url': f'https://rr1.googlevideo.com/videoplayback?expire={expire}&id={video_id}',
+        'acodec': 'opus',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+        **extra,
+    }
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / 'song_cache.json')
+
+
+def test_set_keeps_compact_record(cache_file):
+    cache = SongCache(cache_file)
+    expire = int(time.time()) + 7200
+    track = cache.set('some song', info('aaaaaaaaaaa', expire, formats=[{'url': 'x'}] * 50))
+    assert 'formats' not in track
+    assert track['expires'] == expire
+    assert cache.get_track('aaaaaaaaaaa') == track
+
+
+def test_tracks_are_evicted_least_recently_used(cache_file):
+    cache = SongCache(cache_file, max_cache_size=2)
+    cache.set(None, info('aaaaaaaaaaa'))
+    cache.set(None, info('bbbbbbbbbbb'))
+    cache.get_track('aaaaaaaaaaa')  # 命中後變成最近使用
+    cache.set(None, info('ccccccccccc'))
+    assert list(cache.tracks) == ['aaaaaaaaaaa', 'ccccccccccc']
+
+
+def test_legacy_md5_entries_are_migrated(tmp_path):
+    path = tmp_path / 'song_cache.json'
+    legacy = {'0123abcd': {'data': info('aaaaaaaaaaa', formats=[]), 'timestamp': time.time()},
+              'broken': 'not a dict'}
+    path.write_text(json.dumps(legacy), encoding='utf-8')
+    cache = SongCache(str(path))
+    assert list(cache.tracks) == ['aaaaaaaaaaa']
+    assert 'formats' not in cache.tracks['aaaaaaaaaaa']
+    assert cache.store.dirty
+
+
+def test_query_spellings_share_video_id(cache_file):
+    cache = SongCache(cache_file)
+    cache.set('Some  Song', info('aaaaaaaaaaa'))
+    assert cache.lookup('some song')[0] == 'aaaaaaaaaaa'
+    assert cache.lookup('https://youtu.be/bbbbbbbbbbb')[0] == 'bbbbbbbbbbb'  # 連結不需要快取
+    assert cache.lookup('other song') == (None, None)
+
+
+def test_expiring_stream_keeps_video_id(cache_file):
+    cache = SongCache(cache_file)
+    cache.set('some song', info('aaaaaaaaaaa', int(time.time()) + SongCache.EXPIRY_MARGIN - 60))
+    before = dict(cache.hits)
+    # 網址快過期：只回傳影片 ID，呼叫端重新取得網址但不用再搜尋
+    assert cache.lookup('some song') == ('aaaaaaaaaaa', None)
+    assert cache.hits['query'] == before['query'] + 1
+    assert cache.get_stale_track('aaaaaaaaaaa')['id'] == 'aaaaaaaaaaa'
+
+
+def test_refresh_window(cache_file):
+    cache = SongCache(cache_file)
+    soon = cache.set(None, info('aaaaaaaaaaa', int(time.time()) + SongCache.REFRESH_WINDOW - 60))
+    later = cache.set(None, info('bbbbbbbbbbb', int(time.time()) + 6 * 3600))
+    assert cache.get_track('aaaaaaaaaaa') is soon
+    assert cache.needs_refresh(soon)
+    assert not cache.needs_refresh(later)
+
+
+def test_query_entry_expires(cache_file):
+    cache = SongCache(cache_file)
+    cache.set('some song', info('aaaaaaaaaaa'))
+    cache.queries['some song']['timestamp'] -= SongCache.QUERY_TTL
+    assert cache.resolve_id('some song') is None
+    assert 'some song' not in cache.queries
+    assert 'aaaaaaaaaaa' in cache.tracks
+
+
+def test_tiers_survive_reload(cache_file):
+    cache = SongCache(cache_file)
+    cache.set('some song', info('aaaaaaaaaaa'))
+    cache.store.flush_sync()
+    reloaded = SongCache(cache_file)
+    video_id, track = reloaded.lookup('some song')
+    assert video_id == 'aaaaaaaaaaa' and track['title'] == 'title aaaaaaaaaaa'
@@ -0,0 +1,37 @@
+import asyncio
+
+from utils.ranking import Rankings
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flush_makes_queued_writes_visible_to_readers(storage):
+    async def scenario():
+        for _ in range(3):
+            storage.add_win_later('blackjack', 1)
+        await storage.flush()
+        return await storage.fetchone(
+            "SELECT wins FROM game_wins WHERE game = ? AND user_id = ?", ('blackjack', 1)
+        )
+
+    assert run(scenario())[0] == 3
+
+
+def test_flush_without_pending_writes(storage):
+    run(storage.flush())
+
+
+def test_board_reads_include_queued_writes(storage):
+    board = Rankings(storage).board('wins', 'dice')
+
+    async def scenario():
+        storage.add_win_later('dice', 1, 2)
+        storage.add_win_later('dice', 2, 5)
+        score = await board.score(1)
+        rank = await board.rank(2)
+        storage.add_win_later('dice', 1, 4)
+        return score, rank, await board.top(2)
+
+    assert run(scenario()) == (2, (1, 5), [(1, 6), (2, 5)])
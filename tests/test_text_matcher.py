@@ -0,0 +1,41 @@
+import pytest
+
+from utils.text_matcher import KeywordMatcher, PatternMatcher
+
+
+def naive(words, text):
+    return {w.lower() for w in words if w and w.lower() in text}
+
+
+@pytest.mark.parametrize('words, text', [
+    (['ab', 'abc', 'b'], 'xabcx'),
+    (['abc', 'bcd', 'c'], 'abcd'),
+    (['aa', 'aaa'], 'aaaa'),
+    (['Foo', 'foobar', 'bar'], 'foobar baz'),
+    (['ab', 'cd'], 'nothing here'),
+])
+def test_find_all_matches_every_substring(words, text):
+    matcher = KeywordMatcher(words)
+    found = matcher.find_all(text)
+    assert set(found) == naive(words, text)
+    assert len(found) == len(set(found))
+    assert matcher.search(text) == bool(found)
+
+
+def test_find_all_orders_by_position_then_length():
+    assert KeywordMatcher(['ab', 'abc', 'b']).find_all('xabcx') == ['abc', 'ab', 'b']
+
+
+def test_empty_matcher():
+    matcher = KeywordMatcher([])
+    assert len(matcher) == 0
+    assert not matcher.search('anything')
+    assert matcher.find_all('anything') == []
+
+
+def test_pattern_matcher_reports_each_pattern():
+    matcher = PatternMatcher([r'free.*nitro', r'\d{4}'])
+    assert matcher.search('free discord nitro') == 'free_nitro'
+    assert matcher.find_all('free nitro 2024') == [r'free.*nitro', r'\d{4}']
+    assert matcher.search('hello') is None
+    assert matcher.find_all('hello') == []
@@ -0,0 +1,4 @@
+"""
+Bot 共用工具模組
+放置多個 cogs 共用的基礎設施（不會被 bot.py 當成 cog 載入）
+"""
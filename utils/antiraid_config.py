@@ -0,0 +1,168 @@
+"""
+AntiRaid 設定
+antiraid_config.json 的頂層欄位是所有伺服器的預設值，"guilds": {"<伺服器ID>": {...}} 是個別伺服器的覆寫
+每個伺服器的設定預先建立為 __slots__ 物件，訊息處理時只讀屬性，不再逐一 .get()
+檔案 mtime 變更（手動編輯）或指令修改設定時重新建立
+"""
+
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('AntiRaid')
+
+RELOAD_CHECK_INTERVAL = 5  # 檢查設定檔 mtime 的最短間隔（秒）
+
+DEFAULT_CONFIG = {
+    "enabled": True,
+    "raid_threshold": 5,
+    "raid_time_window": 5,
+    "mute_duration": 300,
+    "spam_threshold": 5,
+    "spam_time_window": 5,
+    "profanity_enabled": True,
+    "profanity_mute_duration": 600,
+    "scam_detection_enabled": True,
+    "scam_mute_duration": 1800,
+    "auto_delete_spam": True,
+    "log_channel_id": None,
+    "admin_role_id": None,
+    "default_profanity_words": [
+        "fuck", "shit", "bitch", "asshole", "dick", "pussy", "cock", "cunt",
+        "motherfucker", "fucker", "bastard", "whore", "slut", "nigger", "nigga",
+        "faggot", "fag", "dyke", "retard", "idiot", "stupid", "dumb", "moron"
+    ],
+    "super_protect_enabled": False,  # 超級防護開關
+    "auto_delete_invite_enabled": False,  # 自動刪除邀請開關
+}
+
+
+class GuildConfig:
+    """單一伺服器的有效設定（預設值 + 覆寫）"""
+
+    __slots__ = (
+        'enabled', 'raid_threshold', 'raid_time_window', 'mute_duration',
+        'spam_threshold', 'spam_time_window', 'profanity_enabled', 'profanity_mute_duration',
+        'scam_detection_enabled', 'scam_mute_duration', 'auto_delete_spam',
+        'log_channel_id', 'admin_role_id', 'super_protect_enabled',
+        'auto_delete_invite_enabled',
+    )
+
+    def __init__(self, values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name, DEFAULT_CONFIG[name]))
+
+
+class AntiRaidConfig:
+    """設定檔載入、依伺服器查詢與寫回"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        self.mtime = None
+        self.checked_at = 0.0
+        self.default = None
+        self._guilds = {}
+        self.load()
+
+    def _read_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """
+        載入設定檔
+        第一次載入時檔案不存在才使用預設值並寫回；重新載入失敗（例如手動編輯到一半）時保留目前的設定，不覆寫檔案
+        回傳是否套用了新的設定
+        """
+        first_load = self.default is None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            logger.info("[AntiRaid] 配置檔案載入成功")
+        except FileNotFoundError:
+            if not first_load:
+                logger.warning("[AntiRaid] 配置檔案不存在，保留目前的配置")
+                return False
+            logger.warning("[AntiRaid] 配置檔案不存在，使用預設配置")
+            self.data = dict(DEFAULT_CONFIG)
+            self.save()
+            self._build()
+            return True
+        except Exception as e:
+            if isinstance(e, json.JSONDecodeError):
+                logger.error(f"[AntiRaid] 配置檔案格式錯誤: {e}")
+            else:
+                logger.error(f"[AntiRaid] 載入配置檔案失敗: {e}")
+            # 記下這個版本的 mtime，檔案再次修改前不重複嘗試
+            self.mtime = self._read_mtime()
+            if first_load:
+                logger.info("[AntiRaid] 使用預設配置（不覆寫配置檔案）")
+                self.data = dict(DEFAULT_CONFIG)
+                self._build()
+            else:
+                logger.info("[AntiRaid] 保留目前的配置")
+            return first_load
+        self.data = data
+        self.mtime = self._read_mtime()
+        self._build()
+        return True
+
+    def _build(self):
+        self.default = GuildConfig(self.data)
+        self._guilds = {}
+        for guild_id, overrides in self.data.get('guilds', {}).items():
+            if str(guild_id).isdigit() and isinstance(overrides, dict):
+                self._guilds[int(guild_id)] = GuildConfig({**self.data, **overrides})
+
+    def reload_if_changed(self, force=False):
+        """設定檔在外部被修改時重新載入（最多每 RELOAD_CHECK_INTERVAL 秒檢查一次），回傳是否有重新載入"""
+        now = time.monotonic()
+        if not force and now - self.checked_at < RELOAD_CHECK_INTERVAL:
+            return False
+        self.checked_at = now
+        mtime = self._read_mtime()
+        if mtime is None or mtime == self.mtime:
+            return False
+        return self.load()
+
+    def save(self):
+        """保存配置檔案"""
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            self.mtime = self._read_mtime()
+            logger.info("[AntiRaid] 配置檔案保存成功")
+        except PermissionError:
+            logger.error("[AntiRaid] 沒有權限寫入配置檔案")
+        except Exception as e:
+            logger.error(f"[AntiRaid] 保存配置檔案失敗: {e}")
+
+    def get(self, guild_id):
+        """取得伺服器的設定（沒有覆寫時回傳預設值物件）"""
+        return self._guilds.get(guild_id, self.default)
+
+    def update(self, guild_id, **values):
+        """修改某個伺服器的設定並寫回檔案"""
+        for name in values:
+            if name not in GuildConfig.__slots__:
+                raise KeyError(name)
+        overrides = self.data.setdefault('guilds', {}).setdefault(str(guild_id), {})
+        overrides.update(values)
+        self._guilds[int(guild_id)] = GuildConfig({**self.data, **overrides})
+        self.save()
+
+    @property
+    def profanity_words(self):
+        return self.data.get('profanity_words', self.data.get('default_profanity_words', DEFAULT_CONFIG['default_profanity_words']))
+
+    @property
+    def default_profanity_words(self):
+        return self.data.get('default_profanity_words', DEFAULT_CONFIG['default_profanity_words'])
+
+    def set_profanity_words(self, words):
+        self.data['profanity_words'] = list(words)
+        self.save()
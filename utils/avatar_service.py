@@ -0,0 +1,103 @@
+"""
+頭像服務（歡迎卡片用）
+- 共用一個 aiohttp.ClientSession，每次下載都有逾時，逾時或失敗時改用預設頭像
+- 依卡片需要的尺寸下載 display_avatar.with_size(...) 的 webp，不下載原始大小的 PNG
+- 縮放並裁切成圓形（透明背景）後存入磁碟快取，以頭像 hash 為鍵；
+  檔案數或總大小超過上限時刪除最久沒用到的（utils/disk_cache.py，重新啟動後仍有效）
+"""
+
+import asyncio
+import logging
+from io import BytesIO
+
+import aiohttp
+from PIL import Image, ImageDraw
+
+from utils.disk_cache import DiskLRU
+from utils.welcome_card import AVATAR_CACHE_DIR, AVATAR_SIZE
+
+logger = logging.getLogger('AvatarService')
+
+FETCH_TIMEOUT = 5.0
+MAX_ENTRIES = 2000
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def fetch_size(size):
+    """Discord CDN 只接受 2 的次方尺寸，取不小於 size 的最小值"""
+    fetch = 16
+    while fetch < size and fetch < 4096:
+        fetch *= 2
+    return fetch
+
+
+def crop_circle(data, size):
+    """縮放成 size×size 並把圓形以外設為透明，回傳 PNG bytes"""
+    with Image.open(BytesIO(data)) as image:
+        avatar = image.convert("RGBA").resize((size, size), Image.LANCZOS)
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size, size), fill=255)
+    avatar.putalpha(mask)
+    output = BytesIO()
+    avatar.save(output, format='PNG')
+    return output.getvalue()
+
+
+class AvatarService:
+    """下載並快取裁切好的圓形頭像"""
+
+    def __init__(self, size=AVATAR_SIZE, cache_dir=AVATAR_CACHE_DIR, timeout=FETCH_TIMEOUT,
+                 max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.size = size
+        self.timeout = timeout
+        self._session = None
+        self.cache = DiskLRU(cache_dir, max_entries, max_bytes)
+        self.counters = {'hits': 0, 'fetched': 0, 'fallbacks': 0, 'failed': 0}
+
+    def _session_get(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def get(self, member):
+        """取得成員的圓形頭像 PNG bytes；頭像無法取得時使用預設頭像，都失敗時回傳 None"""
+        avatar = member.display_avatar
+        default = member.default_avatar
+        if avatar != default:
+            data = await self._get_asset(avatar, avatar.with_size(fetch_size(self.size)).with_static_format('webp').url)
+            if data is not None:
+                return data
+            self.counters['fallbacks'] += 1
+        return await self._get_asset(default, default.url)
+
+    async def _get_asset(self, asset, url):
+        key = f"{asset.key}_{self.size}"
+        data = await asyncio.to_thread(self.cache.read, key)
+        if data is not None:
+            self.counters['hits'] += 1
+            return data
+
+        try:
+            async with self._session_get().get(url) as resp:
+                resp.raise_for_status()
+                raw = await resp.read()
+            data = await asyncio.to_thread(self._store, key, raw)
+        except Exception as e:
+            self.counters['failed'] += 1
+            logger.warning(f"[AvatarService] 取得頭像失敗: {type(e).__name__} {e}")
+            return None
+        self.counters['fetched'] += 1
+        return data
+
+    def _store(self, key, raw):
+        data = crop_circle(raw, self.size)
+        self.cache.write(key, data)
+        return data
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self):
+        return {**self.counters, **self.cache.stats()}
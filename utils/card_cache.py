@@ -0,0 +1,114 @@
+"""
+繪製好的歡迎卡片快取
+以（範本與字型 mtime、頭像內容 hash、顯示名稱、伺服器名稱）為鍵，內容完全相同的卡片不需要重新繪製
+- 記憶體 LRU：最近的卡片直接回傳
+- 磁碟 LRU（card_cache/）：重新啟動後仍有效，只由 Bot 使用（cache_dir=None 時只使用記憶體，例如網頁控制台的預覽）
+範本或字型檔案更新後鍵就會改變，舊卡片不會再被命中，之後由 LRU 淘汰
+方法會讀寫檔案，在事件循環中請透過 asyncio.to_thread 呼叫
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from utils import welcome_card
+from utils.disk_cache import DiskLRU
+
+logger = logging.getLogger('CardCache')
+
+CARD_CACHE_DIR = 'card_cache'
+MEMORY_ENTRIES = 32
+MEMORY_BYTES = 32 * 1024 * 1024
+DISK_ENTRIES = 500
+DISK_BYTES = 256 * 1024 * 1024
+
+
+def card_key(info, signature=None):
+    """
+    計算卡片的快取鍵
+    info: 與 welcome_card.render_card 相同（display_name、guild_name、avatar）
+    """
+    if signature is None:
+        signature = welcome_card.asset_signature()
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(signature).encode())
+    digest.update(b'\0')
+    digest.update(hashlib.blake2b(info.get('avatar') or b'', digest_size=16).digest())
+    for field in (info['display_name'], info['guild_name']):
+        digest.update(b'\0')
+        digest.update(field.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CardCache:
+    """記憶體 + 磁碟兩層的卡片 LRU"""
+
+    def __init__(self, cache_dir=CARD_CACHE_DIR, memory_entries=MEMORY_ENTRIES, memory_bytes=MEMORY_BYTES,
+                 disk_entries=DISK_ENTRIES, disk_bytes=DISK_BYTES):
+        self.memory_entries = memory_entries
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()  # 鍵 -> PNG bytes，依最後使用時間排序
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.disk = DiskLRU(cache_dir, disk_entries, disk_bytes) if cache_dir else None
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key):
+        """取得快取的卡片 PNG bytes，沒有時回傳 None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return data
+        data = self.disk.read(key) if self.disk is not None else None
+        with self._lock:
+            if data is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['disk_hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        if self.disk is None:
+            return
+        try:
+            self.disk.write(key, data)
+        except OSError as e:
+            logger.warning(f"[CardCache] 寫入磁碟快取失敗: {e}")
+
+    def _remember(self, key, data):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory and (len(self._memory) > self.memory_entries or self._memory_size > self.memory_bytes):
+            _, oldest = self._memory.popitem(last=False)
+            self._memory_size -= len(oldest)
+
+    def lookup(self, info):
+        """回傳 (鍵, 快取的卡片或 None)"""
+        key = card_key(info)
+        return key, self.get(key)
+
+    def render(self, info):
+        """在目前的執行緒中繪製（有快取時直接回傳），回傳 (PNG bytes, 是否命中快取)；網頁控制台預覽用"""
+        key, data = self.lookup(info)
+        if data is not None:
+            return data, True
+        data = welcome_card.render_card(info)
+        self.put(key, data)
+        return data, False
+
+    def stats(self):
+        with self._lock:
+            memory = {**self.counters, 'memory_entries': len(self._memory), 'memory_bytes': self._memory_size}
+        if self.disk is None:
+            return memory
+        disk = self.disk.stats()
+        return {**memory, 'disk_entries': disk['entries'], 'disk_bytes': disk['bytes'], 'evicted': disk['evicted']}
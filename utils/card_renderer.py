@@ -0,0 +1,126 @@
+"""
+歡迎卡片繪製服務
+Pillow 繪圖與 PNG 編碼是 CPU 密集的工作，放在事件循環（或同一個程序的執行緒）中會拖慢 gateway，
+因此交給固定數量的工作程序處理：
+- render(member_info) 回傳 PNG bytes
+- 進行中的卡片達到 DEGRADE_DEPTH 時改用簡化繪製（描邊較細、壓縮等級較低）
+- 達到 MAX_PENDING 時直接放棄（丟出 RendererBusy），由呼叫端改發純文字歡迎
+- 有 CardCache 時先查快取，命中就不佔用工作程序（簡化繪製的卡片不寫入快取）
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import welcome_card
+
+logger = logging.getLogger('CardRenderer')
+
+CARD_WORKERS = min(2, os.cpu_count() or 1)
+DEGRADE_DEPTH = 4   # 進行中（含排隊）的卡片數達到此值時簡化繪製
+MAX_PENDING = 12    # 超過此數量的卡片直接放棄
+RENDER_TIMEOUT = 30.0
+# 主程序在建立工作程序時已有其他執行緒（資料庫、yt-dlp 等），不使用 fork
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class RendererBusy(Exception):
+    """排隊中的卡片太多，這張卡片被放棄"""
+
+
+class CardRenderer:
+    """以 process pool 繪製歡迎卡片，並限制排隊長度"""
+
+    def __init__(self, workers=CARD_WORKERS, degrade_depth=DEGRADE_DEPTH, max_pending=MAX_PENDING, cache=None):
+        self.workers = workers
+        self.cache = cache
+        self.degrade_depth = degrade_depth
+        self.max_pending = max_pending
+        self._executor = None
+        self.pending = 0
+        self.counters = {'rendered': 0, 'cached': 0, 'degraded': 0, 'dropped': 0, 'failed': 0}
+        self.total_ms = 0.0
+
+    def start(self):
+        """建立工作程序並預先載入卡片素材"""
+        if self._executor is not None:
+            return
+        context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == 'forkserver':
+            context.set_forkserver_preload(['utils.welcome_card'])
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        for _ in range(self.workers):
+            self._executor.submit(welcome_card.warm_up)
+        logger.info(f"[CardRenderer] 已啟動 {self.workers} 個繪製程序（{START_METHOD}）")
+
+    async def render(self, member_info):
+        """
+        繪製卡片並回傳 PNG bytes
+        member_info: {'display_name', 'guild_name', 'avatar': 頭像 bytes 或 None}
+        """
+        key = None
+        if self.cache is not None:
+            key, data = await asyncio.to_thread(self.cache.lookup, member_info)
+            if data is not None:
+                self.counters['cached'] += 1
+                return data
+
+        if self.pending >= self.max_pending:
+            self.counters['dropped'] += 1
+            raise RendererBusy(f"排隊中的卡片過多（{self.pending}）")
+        info = dict(member_info)
+        if self.pending >= self.degrade_depth:
+            info['lite'] = True
+            self.counters['degraded'] += 1
+        self.start()
+
+        # pending 在工作程序真正完成（或取消）時才減少；逾時的卡片仍佔用工作程序，繼續計入排隊數
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        started = time.perf_counter()
+        future = self._executor.submit(welcome_card.render_card, info)
+        future.add_done_callback(lambda _: self._release(loop))
+        try:
+            data = await asyncio.wait_for(asyncio.wrap_future(future), RENDER_TIMEOUT)
+        except BrokenProcessPool:
+            # 工作程序異常結束，下次呼叫時重新建立
+            logger.error("[CardRenderer] 繪製程序異常結束，重新建立")
+            self.counters['failed'] += 1
+            self._executor = None
+            raise
+        except Exception:
+            self.counters['failed'] += 1
+            raise
+        self.counters['rendered'] += 1
+        self.total_ms += (time.perf_counter() - started) * 1000
+        if key is not None and not info.get('lite'):
+            await asyncio.to_thread(self.cache.put, key, data)
+        return data
+
+    def _release(self, loop):
+        # 在 process pool 的管理執行緒上呼叫
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+        except RuntimeError:
+            # 事件循環已關閉
+            pass
+
+    def _decrement(self):
+        self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        rendered = self.counters['rendered']
+        return {
+            **self.counters,
+            'pending': self.pending,
+            'avg_ms': round(self.total_ms / rendered, 1) if rendered else 0.0,
+        }
@@ -0,0 +1,114 @@
+"""
+冷卻時間管理
+記憶體中保存 (動作, 用戶) -> 到期時間（time.monotonic），已知的項目檢查與設定都是 O(1)
+較長的冷卻（例如每日簽到）會以最後使用時間寫入 cooldowns 資料表，重啟後仍然有效；
+資料表不會在啟動時整份載入，某個用戶第一次檢查時才以主鍵查詢那一列
+"""
+
+import logging
+import time
+
+from utils.storage import get_storage
+
+logger = logging.getLogger('Cooldowns')
+
+PERSIST_MIN_PERIOD = 60   # 冷卻時間達到此秒數才寫入資料庫
+SWEEP_EVERY = 1024        # 每設定這麼多次清除一次已過期的項目
+
+
+class CooldownManager:
+    """經濟指令共用的冷卻時間"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._expiry = {}
+        self._resetting = set()  # 正在從資料庫刪除的項目，刪除完成前不會被清除
+        self._sets = 0
+
+    async def _load(self, key, period):
+        """從資料庫讀取最後使用時間（牆上時間）並換算成 monotonic 到期時間，沒有紀錄時回傳 None"""
+        action, user_id = key
+        row = await self.storage.fetchone(
+            "SELECT last_used FROM cooldowns WHERE action = ? AND user_id = ?", (action, user_id)
+        )
+        if row is None:
+            return None
+        return time.monotonic() + (row[0] + period - time.time())
+
+    async def _get_expiry(self, key, period):
+        expiry = self._expiry.get(key)
+        if expiry is None and period >= PERSIST_MIN_PERIOD:
+            loaded = await self._load(key, period)
+            # 查詢期間可能已有其他請求設定了冷卻，以記憶體中的為準
+            expiry = self._expiry.get(key)
+            if expiry is None and loaded is not None:
+                expiry = self._expiry[key] = loaded
+        return expiry
+
+    async def remaining(self, user_id, action, period):
+        """回傳剩餘冷卻秒數（0 表示可以使用），不會設定冷卻"""
+        expiry = await self._get_expiry((action, int(user_id)), period)
+        now = time.monotonic()
+        return max(0.0, expiry - now) if expiry is not None else 0.0
+
+    async def check_and_set(self, user_id, action, period):
+        """
+        冷卻中時回傳剩餘秒數；否則立即開始新的冷卻並回傳 0
+        讀取資料庫之後的檢查與設定之間沒有 await，同一用戶的並發請求只有一個會通過
+        """
+        key = (action, int(user_id))
+        expiry = await self._get_expiry(key, period)
+        now = time.monotonic()
+        if expiry is not None and expiry > now:
+            return expiry - now
+
+        self._expiry[key] = now + period
+        if period >= PERSIST_MIN_PERIOD:
+            self.storage.set_last_used_later(action, key[1])
+        self._sets += 1
+        if self._sets % SWEEP_EVERY == 0:
+            self._sweep(now)
+        return 0.0
+
+    async def reset(self, user_id, action):
+        """取消冷卻（例如獎勵發放失敗時），資料庫中的紀錄同步刪除"""
+        key = (action, int(user_id))
+        # 記為已到期；刪除完成前保留這筆，不會從資料庫讀回舊的最後使用時間
+        self._expiry[key] = 0.0
+        self._resetting.add(key)
+        try:
+            await self.storage.execute(
+                "DELETE FROM cooldowns WHERE action = ? AND user_id = ?", (action, key[1])
+            )
+        finally:
+            self._resetting.discard(key)
+
+    def _sweep(self, now):
+        expired = [
+            key for key, expiry in self._expiry.items()
+            if expiry <= now and key not in self._resetting
+        ]
+        for key in expired:
+            del self._expiry[key]
+        if expired:
+            logger.debug(f"[Cooldowns] 已清除 {len(expired)} 筆過期冷卻")
+
+
+def format_remaining(seconds):
+    """把剩餘秒數格式化為「X小時Y分鐘」/「Y分鐘」/「Z秒」"""
+    seconds = max(1, int(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}小時{minutes}分鐘"
+    if minutes:
+        return f"{minutes}分鐘"
+    return f"{secs}秒"
+
+
+def get_cooldowns(bot):
+    """取得 bot 共用的 CooldownManager"""
+    cooldowns = getattr(bot, 'cooldowns', None)
+    if cooldowns is None:
+        cooldowns = bot.cooldowns = CooldownManager(get_storage(bot))
+    return cooldowns
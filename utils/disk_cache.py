@@ -0,0 +1,94 @@
+"""
+磁碟 LRU 快取
+一個目錄存放一組檔案，檔案數或總大小超過上限時刪除最久沒用到的
+使用時間記錄在檔案 mtime，重新啟動（或其他程序）掃描目錄後仍可沿用
+方法會讀寫檔案，在事件循環中請透過 asyncio.to_thread 呼叫；內部有鎖，可在多執行緒中使用
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from utils.persistence import atomic_write_bytes
+
+
+class DiskLRU:
+    """以檔名為鍵的磁碟快取"""
+
+    def __init__(self, directory, max_entries, max_bytes, suffix='.png'):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._entries = OrderedDict()  # 檔名 -> 檔案大小，依最後使用時間排序
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self._scan()
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def read(self, key):
+        """讀取快取內容，沒有時回傳 None"""
+        name = f"{key}{self.suffix}"
+        path = self._path(key)
+        with self._lock:
+            known = name in self._entries
+        if not known and not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # 更新使用時間
+        except OSError:
+            with self._lock:
+                self._forget(name)
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            else:
+                # 其他程序寫入的檔案
+                self._entries[name] = len(data)
+                self._bytes += len(data)
+        return data
+
+    def write(self, key, data):
+        name = f"{key}{self.suffix}"
+        atomic_write_bytes(self._path(key), data)
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = len(data)
+            self._bytes += len(data)
+            evict = []
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest, _ = next(iter(self._entries.items()))
+                self._forget(oldest)
+                evict.append(oldest)
+            self.evicted += len(evict)
+        for oldest in evict:
+            try:
+                os.remove(os.path.join(self.directory, oldest))
+            except OSError:
+                pass
+
+    def _forget(self, name):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evicted': self.evicted}
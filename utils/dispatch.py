@@ -0,0 +1,113 @@
+"""
+訊息處理流程
+所有 cog 的 on_message 邏輯依序註冊為階段（審核 → 回覆路由 → 關鍵字 → 統計），
+每則訊息只走一次流程，前綴指令也只解析一次，並記錄每個階段的耗時
+"""
+
+import logging
+import time
+
+logger = logging.getLogger('Dispatch')
+
+# 階段順序（數字越小越先執行）
+STAGE_MODERATION = 100
+STAGE_REPLY = 200
+STAGE_KEYWORD = 300
+STAGE_ANALYTICS = 400
+
+# 階段回傳值
+STOP = 'stop'        # 訊息已被移除：之後的階段與指令都不再執行
+HANDLED = 'handled'  # 訊息已處理：只執行 always=True 的階段，不處理指令
+
+SLOW_STAGE_MS = 100  # 超過此時間的階段會記錄警告
+
+
+class Stage:
+    __slots__ = ('name', 'order', 'handler', 'always', 'calls', 'total_ms', 'max_ms')
+
+    def __init__(self, name, order, handler, always=False):
+        self.name = name
+        self.order = order
+        self.handler = handler
+        self.always = always
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        if elapsed_ms > SLOW_STAGE_MS:
+            logger.warning(f"[Dispatch] 階段 {self.name} 耗時 {elapsed_ms:.1f} ms")
+
+
+class MessagePipeline:
+    """取代各 cog 各自的 on_message 監聽器"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._stages = []
+        self._commands = Stage('commands', None, None)
+
+    def register(self, name, order, handler, always=False):
+        """
+        註冊階段：handler(message) 為 coroutine，回傳 None 繼續、HANDLED 或 STOP
+        同名階段會被取代（cog 重新載入時）
+        """
+        self.unregister(name)
+        self._stages.append(Stage(name, order, handler, always))
+        self._stages.sort(key=lambda stage: stage.order)
+        logger.debug(f"[Dispatch] 已註冊階段 {name} (順序 {order})")
+
+    def unregister(self, name):
+        self._stages = [stage for stage in self._stages if stage.name != name]
+
+    async def dispatch(self, message):
+        if message.author.bot:
+            return
+
+        handled = False
+        for stage in self._stages:
+            if handled and not stage.always:
+                continue
+            started = time.perf_counter()
+            try:
+                result = await stage.handler(message)
+            except Exception as e:
+                logger.error(f"[Dispatch] 階段 {stage.name} 執行失敗: {e}")
+                result = None
+            stage.record((time.perf_counter() - started) * 1000)
+            if result == STOP:
+                return
+            if result == HANDLED:
+                handled = True
+
+        if handled:
+            return
+        started = time.perf_counter()
+        try:
+            await self.bot.process_commands(message)
+        finally:
+            self._commands.record((time.perf_counter() - started) * 1000)
+
+    def stats(self):
+        """回傳每個階段的呼叫次數與耗時"""
+        return [
+            {
+                'name': stage.name,
+                'calls': stage.calls,
+                'avg_ms': round(stage.total_ms / stage.calls, 3) if stage.calls else 0.0,
+                'max_ms': round(stage.max_ms, 3),
+            }
+            for stage in self._stages + [self._commands]
+        ]
+
+
+def get_pipeline(bot):
+    """取得 bot 共用的 MessagePipeline"""
+    pipeline = getattr(bot, 'message_pipeline', None)
+    if pipeline is None:
+        pipeline = bot.message_pipeline = MessagePipeline(bot)
+    return pipeline
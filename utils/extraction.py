@@ -0,0 +1,155 @@
+"""
+yt-dlp 解析服務
+- 專用的執行緒池（不佔用 asyncio 預設 executor），每個執行緒保留各設定的 YoutubeDL 實例重複使用
+- 工作依伺服器分佇列，輪流取出（一個伺服器大量排隊不會卡住其他伺服器）
+- 呼叫端取消或逾時時，尚未開始的工作直接丟棄；已在執行的工作結果會被忽略
+- 記錄佇列深度、等待與執行時間
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+
+logger = logging.getLogger('Extraction')
+
+DEFAULT_WORKERS = 3
+SLOW_EXTRACT_MS = 10000  # 超過此時間的解析會記錄警告
+
+
+class _Job:
+    __slots__ = ('guild_id', 'config_idx', 'query', 'future', 'enqueued_at', 'started_at')
+
+    def __init__(self, guild_id, config_idx, query, future):
+        self.guild_id = guild_id
+        self.config_idx = config_idx
+        self.query = query
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+
+
+class ExtractionService:
+    """yt-dlp extract_info 的公平排程執行緒池"""
+
+    def __init__(self, configs, workers=DEFAULT_WORKERS, name='Extraction'):
+        self.configs = configs
+        self.workers = workers
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ytdl')
+        self._local = threading.local()
+        self._queues = OrderedDict()  # 伺服器 ID -> deque[_Job]，依輪到的順序排列
+        self._running = 0
+        self._closed = False
+        self.counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_depth = 0
+
+    def _get_ytdl(self, config_idx):
+        # 在工作執行緒中呼叫：每個執行緒各自保留實例，YoutubeDL 不跨執行緒共用
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+        ytdl = instances.get(config_idx)
+        if ytdl is None:
+            ytdl = instances[config_idx] = yt_dlp.YoutubeDL(self.configs[config_idx])
+        return ytdl
+
+    def _extract(self, config_idx, query):
+        return self._get_ytdl(config_idx).extract_info(query, download=False)
+
+    async def extract(self, query, config_idx=0, guild_id=None, timeout=None):
+        """排入解析工作並等待結果；逾時或被取消時工作會從佇列移除"""
+        if self._closed:
+            raise RuntimeError("解析服務已關閉")
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(guild_id, config_idx, query, future)
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = self._queues[guild_id] = deque()
+        queue.append(job)
+        self.counters['submitted'] += 1
+        self.max_depth = max(self.max_depth, self.depth())
+        self._pump()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # wait_for 已取消 future，尚未開始的工作會在 _pump 時被略過
+            self.counters['cancelled'] += 1
+            raise
+
+    def _next_job(self):
+        while self._queues:
+            guild_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            if queue:
+                # 這個伺服器還有工作，排到最後面讓其他伺服器先
+                self._queues.move_to_end(guild_id)
+            else:
+                del self._queues[guild_id]
+            if not job.future.done():
+                return job
+        return None
+
+    def _pump(self):
+        loop = asyncio.get_running_loop()
+        while self._running < self.workers:
+            job = self._next_job()
+            if job is None:
+                return
+            self._running += 1
+            job.started_at = time.perf_counter()
+            self.total_wait_ms += (job.started_at - job.enqueued_at) * 1000
+            task = loop.run_in_executor(self._executor, self._extract, job.config_idx, job.query)
+            task.add_done_callback(lambda done, job=job: self._finish(job, done))
+
+    def _finish(self, job, done):
+        self._running -= 1
+        elapsed_ms = (time.perf_counter() - job.started_at) * 1000
+        self.total_run_ms += elapsed_ms
+        if elapsed_ms > SLOW_EXTRACT_MS:
+            logger.warning(f"[{self.name}] 解析耗時 {elapsed_ms:.0f} ms: {job.query}")
+        if done.cancelled():
+            self.counters['cancelled'] += 1
+        elif done.exception() is not None:
+            self.counters['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(done.exception())
+        else:
+            self.counters['completed'] += 1
+            if not job.future.done():
+                job.future.set_result(done.result())
+        if not self._closed:
+            self._pump()
+
+    def depth(self):
+        """排隊中的工作數（不含執行中）"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def shutdown(self):
+        """取消排隊中的工作並關閉執行緒池（不等待執行中的解析）"""
+        self._closed = True
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.cancel()
+        self._queues.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        finished = self.counters['completed'] + self.counters['failed']
+        started = finished + self._running
+        return {
+            **self.counters,
+            'queued': self.depth(),
+            'running': self._running,
+            'guilds_waiting': len(self._queues),
+            'max_depth': self.max_depth,
+            'avg_wait_ms': round(self.total_wait_ms / started, 1) if started else 0.0,
+            'avg_run_ms': round(self.total_run_ms / finished, 1) if finished else 0.0,
+        }
@@ -0,0 +1,106 @@
+"""
+餘額帳本
+credit / debit / transfer 都在寫入執行緒上以單一交易完成：
+條件式 UPDATE 防止透支，同一交易寫入只增不改的交易紀錄（ledger_log）
+"""
+
+import time
+
+
+class InsufficientFunds(Exception):
+    """餘額不足"""
+
+    def __init__(self, balance):
+        super().__init__(f"餘額不足（目前 {balance}）")
+        self.balance = balance
+
+
+def _current_balance(conn, namespace, user_id):
+    row = conn.execute(
+        "SELECT balance FROM balances WHERE namespace = ? AND user_id = ?",
+        (namespace, user_id)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def _apply(conn, namespace, user_id, delta, require, counterparty, reason, now):
+    """在目前交易內變更一個帳戶；require 為執行前必須持有的最低餘額"""
+    if delta >= 0 and require <= 0:
+        balance = conn.execute(
+            "INSERT INTO balances (namespace, user_id, balance) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, user_id) DO UPDATE SET balance = balance + excluded.balance "
+            "RETURNING balance",
+            (namespace, user_id, delta)
+        ).fetchone()[0]
+    else:
+        row = conn.execute(
+            "UPDATE balances SET balance = balance + ? "
+            "WHERE namespace = ? AND user_id = ? AND balance >= ? RETURNING balance",
+            (delta, namespace, user_id, max(require, -delta))
+        ).fetchone()
+        if row is None:
+            raise InsufficientFunds(_current_balance(conn, namespace, user_id))
+        balance = row[0]
+    conn.execute(
+        "INSERT INTO ledger_log (ts, namespace, user_id, counterparty, delta, balance_after, reason) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (now, namespace, user_id, counterparty, delta, balance, reason)
+    )
+    return balance
+
+
+class Ledger:
+    """單一貨幣（namespace）的帳本"""
+
+    def __init__(self, storage, namespace):
+        self.storage = storage
+        self.namespace = namespace
+
+    async def balance(self, user_id):
+        return await self.storage.get_balance(self.namespace, user_id)
+
+    async def apply(self, user_id, delta, reason, require=0):
+        """
+        以單一交易變更餘額並回傳新餘額
+        require: 執行前至少需要的餘額（例如賭注），不足時拋出 InsufficientFunds
+        """
+        namespace, user_id = self.namespace, int(user_id)
+
+        def _txn(conn):
+            return _apply(conn, namespace, user_id, delta, require, None, reason, time.time())
+
+        return await self.storage.write(_txn)
+
+    async def credit(self, user_id, amount, reason):
+        if amount < 0:
+            raise ValueError("credit 金額不可為負數")
+        return await self.apply(user_id, amount, reason)
+
+    async def debit(self, user_id, amount, reason):
+        if amount < 0:
+            raise ValueError("debit 金額不可為負數")
+        return await self.apply(user_id, -amount, reason)
+
+    async def transfer(self, sender_id, recipient_id, amount, reason='transfer'):
+        """原子轉帳，回傳 (轉出方餘額, 收款方餘額)"""
+        if amount <= 0:
+            raise ValueError("轉帳金額必須大於 0")
+        namespace, sender_id, recipient_id = self.namespace, int(sender_id), int(recipient_id)
+
+        def _txn(conn):
+            now = time.time()
+            sender_balance = _apply(conn, namespace, sender_id, -amount, 0, recipient_id, reason, now)
+            recipient_balance = _apply(conn, namespace, recipient_id, amount, 0, sender_id, reason, now)
+            return sender_balance, recipient_balance
+
+        return await self.storage.write(_txn)
+
+    async def set_balance(self, user_id, amount, reason):
+        """直接設定餘額（管理用途），差額寫入交易紀錄"""
+        namespace, user_id = self.namespace, int(user_id)
+
+        def _txn(conn):
+            delta = amount - _current_balance(conn, namespace, user_id)
+            return _apply(conn, namespace, user_id, delta, -amount if delta < 0 else 0, None, reason, time.time())
+
+        return await self.storage.write(_txn)
@@ -0,0 +1,201 @@
+"""
+審核動作佇列
+偵測到違規時只把動作放進佇列就返回，由背景的 worker 執行 Discord REST 呼叫：
+- 刪除訊息：依頻道累積，短暫延遲後用 channel.delete_messages 批次刪除（每次最多 100 則）
+- 禁言：同一個用戶的多次禁言合併為一次（取最長的時間），已經禁言到更晚的不再重複呼叫
+- 記錄：依記錄頻道累積 embed，每 LOG_INTERVAL 秒合併成一則訊息（每則最多 10 個 embed）
+- 其他（例如刪除邀請）：直接交給 worker 執行
+discord.py 本身會依 rate limit bucket 等待，worker 數量則限制同時進行的請求數
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+
+import discord
+
+logger = logging.getLogger('Moderation')
+
+FLUSH_DELAY = 0.5        # 收到動作後等待多久再批次送出（秒），讓同一波違規合併
+LOG_INTERVAL = 3.0       # 記錄 embed 的合併間隔（秒）
+WORKER_COUNT = 4
+BULK_DELETE_LIMIT = 100
+EMBEDS_PER_MESSAGE = 10
+CLOSE_TIMEOUT = 5.0
+
+
+class ModerationQueue:
+    """非阻塞的審核動作執行器"""
+
+    def __init__(self, bot, workers=WORKER_COUNT):
+        self.bot = bot
+        self.worker_count = workers
+        self._deletes = {}    # 頻道 ID -> (頻道, {訊息 ID: 訊息})
+        self._timeouts = {}   # (伺服器 ID, 用戶 ID) -> [成員, 秒數, 原因]
+        self._muted_until = {}  # (伺服器 ID, 用戶 ID) -> 禁言結束的 monotonic 時間
+        self._logs = {}       # 記錄頻道 ID -> [embed]
+        self._jobs = asyncio.Queue()
+        self._wake = asyncio.Event()
+        self._tasks = []
+        self.counters = {'deleted': 0, 'bulk_deletes': 0, 'timeouts': 0, 'timeouts_coalesced': 0,
+                         'log_messages': 0, 'log_embeds': 0, 'jobs': 0, 'failed': 0}
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._flusher()))
+        self._tasks.append(asyncio.create_task(self._log_flusher()))
+        for _ in range(self.worker_count):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    # 加入動作（皆為同步呼叫，不等待 Discord）
+
+    def delete(self, message):
+        """排入刪除訊息"""
+        channel = message.channel
+        entry = self._deletes.get(channel.id)
+        if entry is None:
+            entry = self._deletes[channel.id] = (channel, {})
+        entry[1][message.id] = message
+        self._ensure_started()
+        self._wake.set()
+
+    def timeout(self, member, seconds, reason=None):
+        """排入禁言；同一用戶尚未送出的禁言會合併"""
+        if getattr(member, 'guild', None) is None:
+            return  # 私訊中無法禁言
+        key = (member.guild.id, member.id)
+        muted_until = self._muted_until.get(key)
+        if muted_until is not None and muted_until >= time.monotonic() + seconds:
+            self.counters['timeouts_coalesced'] += 1
+            return
+        pending = self._timeouts.get(key)
+        if pending is not None:
+            self.counters['timeouts_coalesced'] += 1
+            if seconds > pending[1]:
+                pending[1] = seconds
+                pending[2] = reason
+            return
+        self._timeouts[key] = [member, seconds, reason]
+        self._ensure_started()
+        self._wake.set()
+
+    def log(self, channel_id, embed):
+        """排入記錄 embed，每 LOG_INTERVAL 秒合併送出"""
+        self._logs.setdefault(channel_id, []).append(embed)
+        self._ensure_started()
+
+    def submit(self, job):
+        """排入任意工作：job 為無參數、回傳 coroutine 的函式"""
+        self._jobs.put_nowait(job)
+        self._ensure_started()
+
+    # 背景工作
+
+    async def _flusher(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(FLUSH_DELAY)
+            self._wake.clear()
+            self._drain_pending()
+
+    def _drain_pending(self):
+        deletes, self._deletes = self._deletes, {}
+        for channel, messages in deletes.values():
+            messages = list(messages.values())
+            for i in range(0, len(messages), BULK_DELETE_LIMIT):
+                chunk = messages[i:i + BULK_DELETE_LIMIT]
+                self._jobs.put_nowait(lambda c=channel, m=chunk: self._delete_messages(c, m))
+
+        timeouts, self._timeouts = self._timeouts, {}
+        now = time.monotonic()
+        for key, (member, seconds, reason) in timeouts.items():
+            self._muted_until[key] = now + seconds
+            self._jobs.put_nowait(lambda m=member, s=seconds, r=reason: self._apply_timeout(m, s, r))
+        # 過期的禁言紀錄不需要保留
+        if len(self._muted_until) > 1024:
+            self._muted_until = {k: v for k, v in self._muted_until.items() if v > now}
+
+    async def _log_flusher(self):
+        while True:
+            await asyncio.sleep(LOG_INTERVAL)
+            self._drain_logs()
+
+    def _drain_logs(self):
+        logs, self._logs = self._logs, {}
+        for channel_id, embeds in logs.items():
+            for i in range(0, len(embeds), EMBEDS_PER_MESSAGE):
+                chunk = embeds[i:i + EMBEDS_PER_MESSAGE]
+                self._jobs.put_nowait(lambda c=channel_id, e=chunk: self._send_logs(c, e))
+
+    async def _worker(self):
+        while True:
+            job = await self._jobs.get()
+            try:
+                await job()
+                self.counters['jobs'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"[Moderation] 執行審核動作失敗: {e}")
+            finally:
+                self._jobs.task_done()
+
+    async def _delete_messages(self, channel, messages):
+        if len(messages) > 1 and hasattr(channel, 'delete_messages'):
+            await channel.delete_messages(messages, reason="反惡意系統")
+            self.counters['bulk_deletes'] += 1
+        else:
+            for message in messages:
+                try:
+                    await message.delete()
+                except discord.NotFound:
+                    pass
+        self.counters['deleted'] += len(messages)
+
+    async def _apply_timeout(self, member, seconds, reason):
+        try:
+            await member.timeout(datetime.timedelta(seconds=seconds), reason=reason)
+        except Exception:
+            # 失敗時允許下一次違規重新嘗試
+            self._muted_until.pop((member.guild.id, member.id), None)
+            raise
+        self.counters['timeouts'] += 1
+
+    async def _send_logs(self, channel_id, embeds):
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            logger.error("[Moderation] 記錄頻道不存在")
+            return
+        try:
+            await channel.send(embeds=embeds)
+        except discord.Forbidden:
+            logger.error("[Moderation] 沒有權限在記錄頻道發送訊息")
+            return
+        self.counters['log_messages'] += 1
+        self.counters['log_embeds'] += len(embeds)
+
+    async def close(self):
+        """送出尚未執行的動作（最多等待 CLOSE_TIMEOUT 秒）後停止"""
+        if not self._tasks:
+            return
+        self._drain_pending()
+        self._drain_logs()
+        try:
+            await asyncio.wait_for(self._jobs.join(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"[Moderation] 關閉時仍有 {self._jobs.qsize()} 個動作未完成")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def stats(self):
+        return {
+            **self.counters,
+            'queued': self._jobs.qsize(),
+            'pending_deletes': sum(len(messages) for _, messages in self._deletes.values()),
+            'pending_timeouts': len(self._timeouts),
+            'pending_logs': sum(len(embeds) for embeds in self._logs.values()),
+        }
@@ -0,0 +1,187 @@
+"""
+寫回式（write-behind）JSON 儲存引擎
+資料變更只發生在記憶體並標記為 dirty，由背景任務依時間間隔或 dirty 數量批次寫入
+寫入採用暫存檔 + rename，確保檔案永遠是完整的
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import tempfile
+import time
+import weakref
+
+logger = logging.getLogger('Persistence')
+
+SLOW_FLUSH_MS = 200  # 超過此時間的寫入會記錄警告
+
+# 仍存活的 store，程式結束時統一 flush
+_live_stores = weakref.WeakSet()
+
+
+def atomic_write_bytes(path, payload: bytes):
+    """以暫存檔 + rename 原子寫入檔案（每次寫入使用不同的暫存檔，同一路徑可同時寫入）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class WriteBehindStore:
+    """記憶體中的 JSON 文件，批次原子寫回磁碟"""
+
+    def __init__(self, path, default_factory=dict, flush_interval=5.0, dirty_threshold=500, name=None):
+        self.path = path
+        self.default_factory = default_factory
+        self.flush_interval = flush_interval
+        self.dirty_threshold = dirty_threshold
+        self.name = name or os.path.basename(path)
+        self.data = self.load()
+
+        self._dirty = 0
+        self._task = None
+        self._wakeup = None
+        self._flush_lock = None
+        self._closed = False
+
+        # 寫入統計
+        self.flush_count = 0
+        self.bytes_written = 0
+        self.last_flush_bytes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+        _live_stores.add(self)
+
+    def load(self):
+        """載入 JSON 文件，不存在或損毀時使用預設值"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            logger.info(f"[{self.name}] 檔案不存在，使用預設資料")
+        except json.JSONDecodeError as e:
+            logger.error(f"[{self.name}] 檔案格式錯誤: {e}")
+        except Exception as e:
+            logger.error(f"[{self.name}] 載入失敗: {e}")
+        return self.default_factory()
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def mark_dirty(self, count=1):
+        """標記資料已變更；達到門檻時提早喚醒背景寫入"""
+        self._dirty += count
+        if self._wakeup is not None and self._dirty >= self.dirty_threshold:
+            self._wakeup.set()
+
+    def start(self):
+        """啟動背景寫入任務（需在事件循環中呼叫）"""
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.debug(f"[{self.name}] 背景寫入任務已啟動")
+
+    async def _flush_loop(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._dirty:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"[{self.name}] 背景寫入失敗: {e}")
+
+    def _serialize(self):
+        # 在事件循環上序列化，取得一致的快照，不需要對資料加鎖
+        return json.dumps(self.data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _record_flush(self, size, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flush_count += 1
+        self.bytes_written += size
+        self.last_flush_bytes = size
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        if elapsed_ms > SLOW_FLUSH_MS:
+            logger.warning(f"[{self.name}] 寫入過慢: {size} bytes，耗時 {elapsed_ms:.1f} ms")
+        else:
+            logger.debug(f"[{self.name}] 已寫入 {size} bytes，耗時 {elapsed_ms:.1f} ms")
+
+    async def flush(self):
+        """將目前資料寫回磁碟，檔案 I/O 在背景執行緒進行"""
+        if self._flush_lock is None:
+            self.flush_sync()
+            return
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            started = time.perf_counter()
+            pending = self._dirty
+            payload = self._serialize()
+            self._dirty = 0
+            try:
+                await asyncio.to_thread(atomic_write_bytes, self.path, payload)
+            except Exception:
+                self._dirty += pending
+                raise
+            self._record_flush(len(payload), started)
+
+    def flush_sync(self):
+        """同步寫回（程式結束或沒有事件循環時使用）"""
+        if not self._dirty:
+            return
+        started = time.perf_counter()
+        payload = self._serialize()
+        atomic_write_bytes(self.path, payload)
+        self._dirty = 0
+        self._record_flush(len(payload), started)
+
+    async def close(self):
+        """停止背景任務並寫回剩餘變更"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task:
+            # 讓背景任務完成目前這一輪寫入後自行結束
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        _live_stores.discard(self)
+        logger.info(f"[{self.name}] 已關閉，共寫入 {self.flush_count} 次 / {self.bytes_written} bytes")
+
+    def stats(self):
+        """回傳寫入統計"""
+        return {
+            'dirty': self._dirty,
+            'flush_count': self.flush_count,
+            'bytes_written': self.bytes_written,
+            'last_flush_bytes': self.last_flush_bytes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+        }
+
+
+@atexit.register
+def _flush_all_on_exit():
+    for store in list(_live_stores):
+        try:
+            store.flush_sync()
+        except Exception as e:
+            logger.error(f"[{store.name}] 結束前寫入失敗: {e}")
@@ -0,0 +1,85 @@
+"""
+排行榜查詢
+排行榜直接由 SQLite 資料表提供：每個排行榜都有 (分組, 分數 DESC, user_id) 索引，
+前 N 名是索引上的 ORDER BY ... LIMIT，「我的名次」是計算分數較高的列數，
+不需要在啟動時把所有用戶載入記憶體，分數變更也不需要另外維護排序
+勝場與活躍度是批次寫入，查詢前先等待排隊中的變更提交，結果包含剛記錄的分數
+"""
+
+import logging
+
+from utils.storage import get_storage
+
+logger = logging.getLogger('Ranking')
+
+# 排行榜種類 -> (資料表, 分組欄位, 分數欄位)，索引定義見 utils/storage.py
+BOARD_TABLES = {
+    'balance': ('balances', 'namespace', 'balance'),
+    'wins': ('game_wins', 'game', 'wins'),
+    'activity': ('user_activity', 'guild_id', 'message_count'),
+}
+
+
+class RankedBoard:
+    """單一排行榜（某個資料表中的一個分組）"""
+
+    def __init__(self, storage, kind, key):
+        self.storage = storage
+        self.key = key
+        self.table, self.key_column, self.score_column = BOARD_TABLES[kind]
+
+    async def count(self):
+        await self.storage.flush()
+        row = await self.storage.fetchone(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {self.key_column} = ?", (self.key,)
+        )
+        return row[0]
+
+    async def score(self, user_id):
+        await self.storage.flush()
+        row = await self.storage.fetchone(
+            f"SELECT {self.score_column} FROM {self.table} WHERE {self.key_column} = ? AND user_id = ?",
+            (self.key, int(user_id))
+        )
+        return row[0] if row else None
+
+    async def rank(self, user_id):
+        """回傳 (名次, 分數)（同分同名次，從 1 開始），不在榜上時回傳 (None, None)"""
+        await self.storage.flush()
+        table, key_column, score_column = self.table, self.key_column, self.score_column
+        row = await self.storage.fetchone(
+            f"SELECT s.{score_column}, ("
+            f"SELECT COUNT(*) FROM {table} WHERE {key_column} = s.{key_column} AND {score_column} > s.{score_column}"
+            f") + 1 FROM {table} s WHERE s.{key_column} = ? AND s.user_id = ?",
+            (self.key, int(user_id))
+        )
+        if row is None:
+            return None, None
+        return row[1], row[0]
+
+    async def top(self, n=10):
+        """回傳前 n 名 [(user_id, score), ...]"""
+        await self.storage.flush()
+        return await self.storage.fetchall(
+            f"SELECT user_id, {self.score_column} FROM {self.table} WHERE {self.key_column} = ? "
+            f"ORDER BY {self.score_column} DESC, user_id LIMIT ?",
+            (self.key, n)
+        )
+
+
+class Rankings:
+    """所有排行榜的查詢入口"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def board(self, kind, key):
+        return RankedBoard(self.storage, kind, key)
+
+
+def get_rankings(bot):
+    """取得 bot 共用的 Rankings"""
+    rankings = getattr(bot, 'rankings', None)
+    if rankings is None:
+        rankings = bot.rankings = Rankings(get_storage(bot))
+    return rankings
@@ -0,0 +1,74 @@
+"""
+滑動視窗速率限制
+每個 key 使用固定大小的環形緩衝保存最近 N 次事件的時間（time.monotonic）：
+寫入新事件後，緩衝中最早的一筆若仍在視窗內，代表視窗內已有 N 次事件，判斷為 O(1)
+閒置的 key 依最後使用時間淘汰，key 數量有上限，加入洪水下記憶體仍然有界
+"""
+
+import time
+from collections import OrderedDict
+
+_NEVER = float('-inf')
+
+
+class _Ring:
+    __slots__ = ('times', 'index', 'last')
+
+    def __init__(self, size):
+        self.times = [_NEVER] * size
+        self.index = 0
+        self.last = _NEVER
+
+
+class SlidingWindowLimiter:
+    """多個 key 共用的滑動視窗計數器，門檻與視窗可以每次呼叫不同（例如依伺服器設定）"""
+
+    def __init__(self, name, idle_ttl=600.0, max_keys=100_000):
+        self.name = name
+        self.idle_ttl = idle_ttl
+        self.max_keys = max_keys
+        self._rings = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._rings)
+
+    def hit(self, key, limit, window, now=None):
+        """
+        記錄一次事件；若包含這次在內、window 秒內的事件數達到 limit 則回傳 True
+        limit 變更時該 key 的紀錄會重新開始
+        """
+        if now is None:
+            now = time.monotonic()
+        limit = max(1, int(limit))
+
+        ring = self._rings.get(key)
+        if ring is None or len(ring.times) != limit:
+            ring = self._rings[key] = _Ring(limit)
+        self._rings.move_to_end(key)
+
+        ring.times[ring.index] = now
+        ring.index = (ring.index + 1) % limit
+        ring.last = now
+        # 下一個要被覆蓋的位置就是最近 limit 次事件中最早的一次
+        oldest = ring.times[ring.index]
+
+        self._evict(now)
+        return now - oldest <= window
+
+    def reset(self, key):
+        """清除某個 key 的紀錄（例如已經處置過）"""
+        self._rings.pop(key, None)
+
+    def _evict(self, now):
+        # OrderedDict 依最後使用時間排序，只需要檢查最前面的幾個
+        rings = self._rings
+        while rings:
+            key, ring = next(iter(rings.items()))
+            if len(rings) <= self.max_keys and now - ring.last <= self.idle_ttl:
+                break
+            del rings[key]
+            self.evicted += 1
+
+    def stats(self):
+        return {'keys': len(self._rings), 'evicted': self.evicted}
@@ -0,0 +1,88 @@
+"""
+相同工作合併（single-flight）
+同一個 key 同時只會執行一次，其他呼叫者等待同一個結果（包含例外）
+失敗（例外或回傳 None）的結果會保留一小段時間，期間內的呼叫直接得到相同結果
+所有等待者都取消時，工作本身也會被取消
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('SingleFlight')
+
+NEGATIVE_TTL = 30.0  # 失敗結果保留秒數
+
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """以 key 合併同時進行的非同步工作"""
+
+    def __init__(self, name, negative_ttl=NEGATIVE_TTL, max_failures=1024):
+        self.name = name
+        self.negative_ttl = negative_ttl
+        self.max_failures = max_failures
+        self._inflight = {}
+        self._failures = {}  # key -> (到期的 monotonic 時間, 例外或 None)
+        self.counters = {'started': 0, 'joined': 0, 'negative_hits': 0}
+
+    async def do(self, key, fn):
+        """
+        執行 fn()（回傳 coroutine 的函式）；同 key 的工作進行中時改為等待它的結果
+        """
+        failure = self._failures.get(key)
+        if failure is not None:
+            expires, error = failure
+            if expires > time.monotonic():
+                self.counters['negative_hits'] += 1
+                if error is not None:
+                    raise error
+                return None
+            del self._failures[key]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight(asyncio.create_task(fn()))
+            flight.task.add_done_callback(lambda task: self._finish(key, task))
+            self.counters['started'] += 1
+        else:
+            self.counters['joined'] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # 最後一個等待者離開時，工作已經沒有人需要
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is not None and self._inflight[key].task is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None and task.result() is not None:
+            return
+        now = time.monotonic()
+        if len(self._failures) >= self.max_failures:
+            self._failures = {k: v for k, v in self._failures.items() if v[0] > now}
+        self._failures[key] = (now + self.negative_ttl, error)
+        logger.debug(f"[{self.name}] {key} 失敗，{self.negative_ttl:.0f} 秒內不再重試")
+
+    def clear_failures(self):
+        """清除所有失敗紀錄"""
+        self._failures.clear()
+
+    def stats(self):
+        return {**self.counters, 'inflight': len(self._inflight), 'failures': len(self._failures)}
@@ -0,0 +1,463 @@
+"""
+SQLite 儲存層
+金幣（coins）、經濟系統（economy）、小遊戲排行榜與活躍度統計共用同一個資料庫
+- WAL 模式，單一寫入連線（專用執行緒），讀取使用獨立的唯讀連線
+- 每次變更只更新一列資料，不再整份 JSON 重寫
+- 餘額變更請透過 utils.ledger，確保扣款與交易紀錄的原子性
+- 提供 async 介面，不阻塞事件循環
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger('Storage')
+
+DB_PATH = os.environ.get("BOT_DB_PATH", "bot_data.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS balances (
+    namespace TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    balance INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cooldowns (
+    action TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (action, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS game_wins (
+    game TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (game, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_messages (
+    guild_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_activity (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_active TEXT,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_channel_activity (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id, channel_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS channel_activity (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, channel_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS command_usage (
+    guild_id INTEGER NOT NULL,
+    command TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, command, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ledger_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    namespace TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    counterparty INTEGER,
+    delta INTEGER NOT NULL,
+    balance_after INTEGER NOT NULL,
+    reason TEXT
+);
+-- 排行榜索引（utils.ranking）
+CREATE INDEX IF NOT EXISTS balances_rank ON balances (namespace, balance DESC, user_id);
+CREATE INDEX IF NOT EXISTS game_wins_rank ON game_wins (game, wins DESC, user_id);
+CREATE INDEX IF NOT EXISTS user_activity_rank ON user_activity (guild_id, message_count DESC, user_id);
+"""
+
+# 仍開啟的資料庫，程式結束時統一關閉
+_open_storages = weakref.WeakSet()
+
+
+class Storage:
+    """SQLite 儲存層，單一寫入執行緒 + 唯讀連線池"""
+
+    def __init__(self, path=DB_PATH, read_workers=2):
+        self.path = path
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-writer')
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='storage-reader')
+        self._local = threading.local()
+        self._write_conn = None
+        self._read_conns = []
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._drain_scheduled = False
+        self._closed = False
+
+        # 寫入統計
+        self.commit_count = 0
+        self.statement_count = 0
+        self.last_commit_ms = 0.0
+
+        self._writer.submit(self._init_writer).result()
+        _open_storages.add(self)
+        logger.info(f"[Storage] 資料庫已開啟: {self.path}")
+
+    # ---------- 連線 ----------
+
+    def _init_writer(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(SCHEMA)
+        self._write_conn = conn
+
+    def _read_conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._read_conns.append(conn)
+        return conn
+
+    # ---------- 寫入（只在寫入執行緒上執行） ----------
+
+    def _drain_pending(self):
+        with self._pending_lock:
+            batch = self._pending
+            self._pending = []
+            self._drain_scheduled = False
+        if not batch:
+            return
+        conn = self._write_conn
+        started = time.perf_counter()
+        conn.execute("BEGIN")
+        try:
+            for sql, params in batch:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+            self._record_commit(len(batch), started)
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"[Storage] 批次寫入失敗 ({len(batch)} 筆): {e}")
+
+    def _run_write(self, fn, args):
+        # 先寫入排隊中的變更，維持寫入順序
+        self._drain_pending()
+        conn = self._write_conn
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+            conn.execute("COMMIT")
+            self._record_commit(1, started)
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _record_commit(self, statements, started):
+        self.commit_count += 1
+        self.statement_count += statements
+        self.last_commit_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self):
+        """回傳寫入統計"""
+        return {
+            'pending': len(self._pending),
+            'commit_count': self.commit_count,
+            'statement_count': self.statement_count,
+            'last_commit_ms': round(self.last_commit_ms, 2),
+        }
+
+    def execute_later(self, sql, params=()):
+        """排入背景批次寫入，不等待結果（同一批次在一個交易內提交）"""
+        if self._closed:
+            logger.warning("[Storage] 資料庫已關閉，忽略寫入")
+            return
+        with self._pending_lock:
+            self._pending.append((sql, params))
+            schedule = not self._drain_scheduled
+            self._drain_scheduled = True
+        if schedule:
+            self._writer.submit(self._drain_pending)
+
+    async def flush(self):
+        """等待排隊中的變更提交（需要讀到剛寫入資料的查詢先呼叫，例如排行榜）"""
+        loop = asyncio.get_running_loop()
+        # 寫入執行緒依序執行，進行中的批次也會在這之前完成
+        await loop.run_in_executor(self._writer, self._drain_pending)
+
+    async def write(self, fn, *args):
+        """在寫入執行緒上以單一交易執行 fn(conn, *args)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._run_write, fn, args)
+
+    async def execute(self, sql, params=()):
+        """執行單一寫入語句，回傳受影響列數"""
+        return await self.write(lambda conn: conn.execute(sql, params).rowcount)
+
+    # ---------- 讀取 ----------
+
+    def _run_read(self, sql, params, one):
+        cursor = self._read_conn().execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+
+    async def fetchone(self, sql, params=()):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, sql, params, True)
+
+    async def fetchall(self, sql, params=()):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, sql, params, False)
+
+    def fetchall_sync(self, sql, params=()):
+        """在寫入執行緒上同步讀取（先寫入排隊中的變更），供啟動時載入使用"""
+        def _fetch():
+            self._drain_pending()
+            return self._write_conn.execute(sql, params).fetchall()
+        return self._writer.submit(_fetch).result()
+
+    # ---------- 餘額 ----------
+
+    async def get_balance(self, namespace, user_id):
+        row = await self.fetchone(
+            "SELECT balance FROM balances WHERE namespace = ? AND user_id = ?",
+            (namespace, int(user_id))
+        )
+        return row[0] if row else 0
+
+    # ---------- 冷卻時間 ----------
+
+    def set_last_used_later(self, action, user_id, timestamp=None):
+        self.execute_later(
+            "INSERT INTO cooldowns (action, user_id, last_used) VALUES (?, ?, ?) "
+            "ON CONFLICT (action, user_id) DO UPDATE SET last_used = excluded.last_used",
+            (action, int(user_id), timestamp if timestamp is not None else time.time())
+        )
+
+    # ---------- 小遊戲勝場 ----------
+
+    def add_win_later(self, game, user_id, count=1):
+        self.execute_later(
+            "INSERT INTO game_wins (game, user_id, wins) VALUES (?, ?, ?) "
+            "ON CONFLICT (game, user_id) DO UPDATE SET wins = wins + excluded.wins",
+            (game, int(user_id), count)
+        )
+
+    # ---------- 活躍度統計 ----------
+
+    def record_message_later(self, guild_id, user_id, channel_id, date_str, now_iso):
+        """記錄一則訊息（四個計數器各更新一列）"""
+        guild_id, user_id, channel_id = int(guild_id), int(user_id), int(channel_id)
+        self.execute_later(
+            "INSERT INTO daily_messages (guild_id, date, message_count) VALUES (?, ?, 1) "
+            "ON CONFLICT (guild_id, date) DO UPDATE SET message_count = message_count + 1",
+            (guild_id, date_str)
+        )
+        self.execute_later(
+            "INSERT INTO user_activity (guild_id, user_id, message_count, last_active) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET message_count = message_count + 1, last_active = excluded.last_active",
+            (guild_id, user_id, now_iso)
+        )
+        self.execute_later(
+            "INSERT INTO user_channel_activity (guild_id, user_id, channel_id, message_count) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (guild_id, user_id, channel_id) DO UPDATE SET message_count = message_count + 1",
+            (guild_id, user_id, channel_id)
+        )
+        self.execute_later(
+            "INSERT INTO channel_activity (guild_id, channel_id, message_count) VALUES (?, ?, 1) "
+            "ON CONFLICT (guild_id, channel_id) DO UPDATE SET message_count = message_count + 1",
+            (guild_id, channel_id)
+        )
+
+    def record_command_later(self, guild_id, user_id, command_name):
+        self.execute_later(
+            "INSERT INTO command_usage (guild_id, command, user_id, uses) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (guild_id, command, user_id) DO UPDATE SET uses = uses + 1",
+            (int(guild_id), command_name, int(user_id))
+        )
+
+    # ---------- meta ----------
+
+    def get_meta_sync(self, key):
+        return self._writer.submit(self._get_meta, key).result()
+
+    def _get_meta(self, key):
+        row = self._write_conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # ---------- 關閉 ----------
+
+    def _close_writer(self):
+        self._drain_pending()
+        try:
+            self._write_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.warning(f"[Storage] WAL checkpoint 失敗: {e}")
+        self._write_conn.close()
+
+    def close(self):
+        """寫入剩餘變更並關閉所有連線"""
+        if self._closed:
+            return
+        self._closed = True
+        self._readers.shutdown(wait=True)
+        for conn in self._read_conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        try:
+            try:
+                self._writer.submit(self._close_writer).result()
+            except RuntimeError:
+                # 直譯器關閉中，寫入執行緒已結束，直接在目前執行緒收尾
+                self._close_writer()
+        finally:
+            self._writer.shutdown(wait=True)
+            _open_storages.discard(self)
+            logger.info("[Storage] 資料庫已關閉")
+
+
+def get_storage(bot):
+    """取得 bot 共用的 Storage，第一次使用時建立並執行 JSON 遷移"""
+    storage = getattr(bot, 'storage', None)
+    if storage is None:
+        storage = Storage()
+        migrate_json_files(storage)
+        bot.storage = storage
+    return storage
+
+
+# ---------- JSON 遷移 ----------
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"[Storage] 讀取 {path} 失敗，略過遷移: {e}")
+        return None
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _migrate(conn, coins, economy, leaderboard, analytics):
+    counts = {}
+
+    if isinstance(coins, dict):
+        rows = [('coins', int(uid), int(v)) for uid, v in coins.items() if uid.isdigit() and isinstance(v, int)]
+        conn.executemany("INSERT OR REPLACE INTO balances VALUES (?, ?, ?)", rows)
+        counts['coins'] = len(rows)
+
+    if isinstance(economy, dict):
+        balances, cooldowns = [], []
+        for key, value in economy.items():
+            if key.isdigit() and isinstance(value, int):
+                balances.append(('economy', int(key), value))
+            elif '_last_' in key:
+                uid, _, action = key.partition('_last_')
+                ts = _parse_timestamp(value)
+                if uid.isdigit() and ts is not None:
+                    cooldowns.append((action, int(uid), ts))
+        conn.executemany("INSERT OR REPLACE INTO balances VALUES (?, ?, ?)", balances)
+        conn.executemany("INSERT OR REPLACE INTO cooldowns VALUES (?, ?, ?)", cooldowns)
+        counts['economy'] = len(balances)
+        counts['cooldowns'] = len(cooldowns)
+
+    if isinstance(leaderboard, dict):
+        rows = [
+            (game, int(uid), int(wins))
+            for game, users in leaderboard.items() if isinstance(users, dict)
+            for uid, wins in users.items() if uid.isdigit()
+        ]
+        conn.executemany("INSERT OR REPLACE INTO game_wins VALUES (?, ?, ?)", rows)
+        counts['game_wins'] = len(rows)
+
+    if isinstance(analytics, dict):
+        daily, users, user_channels, channels, commands_ = [], [], [], [], []
+        for gid, dates in analytics.get('message_counts', {}).items():
+            daily.extend((int(gid), date, n) for date, n in dates.items())
+        for gid, members in analytics.get('user_activity', {}).items():
+            for uid, data in members.items():
+                users.append((int(gid), int(uid), data.get('message_count', 0), data.get('last_active')))
+                user_channels.extend((int(gid), int(uid), int(cid), n) for cid, n in data.get('channels', {}).items())
+        for gid, chans in analytics.get('channel_activity', {}).items():
+            channels.extend((int(gid), int(cid), n) for cid, n in chans.items())
+        for gid, cmds in analytics.get('command_usage', {}).items():
+            for name, data in cmds.items():
+                commands_.extend((int(gid), name, int(uid), n) for uid, n in data.get('users', {}).items())
+        conn.executemany("INSERT OR REPLACE INTO daily_messages VALUES (?, ?, ?)", daily)
+        conn.executemany("INSERT OR REPLACE INTO user_activity VALUES (?, ?, ?, ?)", users)
+        conn.executemany("INSERT OR REPLACE INTO user_channel_activity VALUES (?, ?, ?, ?)", user_channels)
+        conn.executemany("INSERT OR REPLACE INTO channel_activity VALUES (?, ?, ?)", channels)
+        conn.executemany("INSERT OR REPLACE INTO command_usage VALUES (?, ?, ?, ?)", commands_)
+        counts['user_activity'] = len(users)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+        (datetime.now().isoformat(),)
+    )
+    return counts
+
+
+def migrate_json_files(storage, force=False):
+    """一次性把舊 JSON 檔案匯入資料庫（已遷移過則略過）"""
+    if not force and storage.get_meta_sync('json_migrated'):
+        return None
+    sources = (
+        _load_json('coins.json'),
+        _load_json('economy.json'),
+        _load_json('minigames_leaderboard.json'),
+        _load_json('analytics.json'),
+    )
+    counts = storage._writer.submit(storage._run_write, _migrate, sources).result()
+    logger.info(f"[Storage] JSON 遷移完成: {counts}（舊 JSON 檔案保留為備份，不再更新）")
+    return counts
+
+
+@atexit.register
+def _close_all_on_exit():
+    for storage in list(_open_storages):
+        try:
+            storage.close()
+        except Exception as e:
+            logger.error(f"[Storage] 結束前關閉失敗: {e}")
+
+
+if __name__ == "__main__":
+    # 手動執行遷移：python -m utils.storage
+    logging.basicConfig(level=logging.INFO)
+    _storage = Storage()
+    print(migrate_json_files(_storage, force=True))
+    _storage.close()
@@ -0,0 +1,89 @@
+"""
+卡片文字排版
+- 描邊使用 Pillow 原生的 stroke_width / stroke_fill，一次 draw.text 完成
+  （舊寫法以位移重畫 (2w+1)²-1 次模擬描邊，6 px 描邊每個字串要畫 169 次）
+- 字串依字型切成連續的段落（主要字型 / 備用字型），每段只畫一次，不再逐字繪製
+- 每個字型的字元寬度有快取，計算位置時不需要重複量測
+"""
+
+
+def is_emoji(ch):
+    code = ord(ch)
+    # emoji unicode block (partial, most common) + math alphanumeric symbols + letterlike symbols
+    return (
+        0x1F300 <= code <= 0x1FAFF or  # Misc Symbols and Pictographs, Supplemental Symbols and Pictographs
+        0x1F000 <= code <= 0x1F02F or  # Mahjong, Domino
+        0x1F0A0 <= code <= 0x1F0FF or  # Playing Cards
+        0x1F100 <= code <= 0x1F1FF or  # Enclosed Alphanumeric Supplement
+        0x1F200 <= code <= 0x1F2FF or  # Enclosed Ideographic Supplement
+        0x1F600 <= code <= 0x1F64F or  # Emoticons
+        0x1F680 <= code <= 0x1F6FF or  # Transport and Map
+        0x2600 <= code <= 0x26FF or    # Misc symbols
+        0x2700 <= code <= 0x27BF or    # Dingbats
+        0xFE00 <= code <= 0xFE0F or    # Variation Selectors
+        0x1F900 <= code <= 0x1F9FF or  # Supplemental Symbols and Pictographs
+        0x1D400 <= code <= 0x1D7FF or  # Mathematical Alphanumeric Symbols (花體/粗體/斜體/黑體)
+        0x2100 <= code <= 0x214F       # Letterlike Symbols (ℬ等)
+    )
+
+
+class GlyphWidths:
+    """單一字型的字元寬度快取"""
+
+    __slots__ = ('font', '_widths')
+
+    def __init__(self, font):
+        self.font = font
+        self._widths = {}
+
+    def glyph(self, ch):
+        width = self._widths.get(ch)
+        if width is None:
+            font = self.font
+            width = font.getlength(ch) if hasattr(font, 'getlength') else font.getsize(ch)[0]
+            self._widths[ch] = width
+        return width
+
+    def text(self, text):
+        return sum(self.glyph(ch) for ch in text)
+
+
+class TextLayout:
+    """以主要字型排版，fallback(ch) 為真的字元改用備用字型"""
+
+    def __init__(self, font, fallback_font=None, fallback=is_emoji):
+        self.font = font
+        self.fallback_font = fallback_font
+        self.fallback = fallback
+        self._widths = {id(font): GlyphWidths(font)}
+        if fallback_font is not None:
+            self._widths[id(fallback_font)] = GlyphWidths(fallback_font)
+
+    def runs(self, text):
+        """切成 [(字型, 字串)]，相鄰且使用同一字型的字元合併為一段"""
+        if self.fallback_font is None:
+            return [(self.font, text)] if text else []
+        runs = []
+        current_font = None
+        start = 0
+        for index, ch in enumerate(text):
+            font = self.fallback_font if self.fallback(ch) else self.font
+            if font is not current_font:
+                if current_font is not None:
+                    runs.append((current_font, text[start:index]))
+                current_font = font
+                start = index
+        if current_font is not None:
+            runs.append((current_font, text[start:]))
+        return runs
+
+    def width(self, text):
+        return sum(self._widths[id(font)].text(run) for font, run in self.runs(text))
+
+    def draw(self, draw, pos, text, fill, stroke_width=0, stroke_fill=None):
+        """繪製文字（含描邊），回傳結束位置的 x 座標"""
+        x, y = pos
+        for font, run in self.runs(text):
+            draw.text((x, y), run, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill)
+            x += self._widths[id(font)].text(run)
+        return x
@@ -0,0 +1,88 @@
+"""
+多關鍵字比對
+- KeywordMatcher: 整份詞彙表編譯成一個交替（alternation）正規表示式，一次掃描訊息
+- PatternMatcher: 多個正規表示式合併為一個具名群組的正規表示式
+兩者都只在詞彙表變更時重新編譯，沒有命中時只需要一次 search
+"""
+
+import logging
+import re
+
+logger = logging.getLogger('TextMatcher')
+
+
+class KeywordMatcher:
+    """子字串比對（不分大小寫），與逐一 `word in text` 的結果一致"""
+
+    def __init__(self, words=()):
+        self.words = frozenset(w.lower() for w in words if w)
+        if self.words:
+            # 長的詞排前面，同一位置優先回報較長的詞
+            alternation = "|".join(re.escape(w) for w in sorted(self.words, key=len, reverse=True))
+            self._search = re.compile(alternation).search
+            # 前瞻寫法可在每個位置回報命中的詞（允許重疊），但同一位置只會回報最長的詞
+            self._findall = re.compile(f"(?=({alternation}))").findall
+            # 同一位置較短的命中必定是最長詞的前綴，預先算好每個詞包含哪些較短的詞
+            self._prefixes = {
+                w: sorted((p for p in self.words if p != w and w.startswith(p)), key=len, reverse=True)
+                for w in self.words
+            }
+        else:
+            self._search = None
+            self._findall = None
+            self._prefixes = {}
+        logger.debug(f"[TextMatcher] 已編譯 {len(self.words)} 個關鍵字")
+
+    def __len__(self):
+        return len(self.words)
+
+    def search(self, text_lower):
+        """是否包含任一關鍵字（text 需已轉小寫）"""
+        return self._search is not None and self._search(text_lower) is not None
+
+    def find_all(self, text_lower):
+        """回傳所有命中的關鍵字（依出現位置、同一位置由長到短，不重複）"""
+        if self._search is None or self._search(text_lower) is None:
+            return []
+        found = {}
+        for word in self._findall(text_lower):
+            found[word] = None
+            for prefix in self._prefixes[word]:
+                found[prefix] = None
+        return list(found)
+
+
+class PatternMatcher:
+    """多個正規表示式合併為一個，群組名稱由模式產生（例如 free.*nitro -> free_nitro）"""
+
+    def __init__(self, patterns=()):
+        self.patterns = {}
+        for pattern in patterns:
+            name = re.sub(r'\W+', '_', pattern).strip('_') or 'pattern'
+            if name[0].isdigit():
+                name = f"p_{name}"
+            base, n = name, 2
+            while name in self.patterns:
+                name, n = f"{base}_{n}", n + 1
+            self.patterns[name] = re.compile(pattern)
+        if self.patterns:
+            # 具名群組會讓 re 無法使用前綴最佳化，先用不擷取的版本快速判斷有沒有命中
+            self._any = re.compile("|".join(f"(?:{rx.pattern})" for rx in self.patterns.values())).search
+            self._named = re.compile(
+                "|".join(f"(?P<{name}>{rx.pattern})" for name, rx in self.patterns.items())
+            ).search
+        else:
+            self._any = None
+            self._named = None
+
+    def search(self, text):
+        """回傳第一個命中的模式名稱，沒有命中時回傳 None"""
+        if self._any is None or self._any(text) is None:
+            return None
+        return self._named(text).lastgroup
+
+    def find_all(self, text):
+        """回傳所有命中的模式（只有在合併後的正規表示式命中時才逐一檢查）"""
+        if self._any is None or self._any(text) is None:
+            return []
+        return [rx.pattern for rx in self.patterns.values() if rx.search(text)]
@@ -0,0 +1,159 @@
+"""
+歡迎卡片繪製
+render_card 只使用基本型別的參數並回傳 PNG bytes，由 card_renderer 在獨立的工作程序中呼叫
+範本、字型與頭像遮罩在每個程序中只載入一次（CardAssets），檔案 mtime 變更時才重新載入
+文字排版與描邊見 utils/text_layout.py，繪製結果的快取見 utils/card_cache.py
+"""
+
+import logging
+import os
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.text_layout import TextLayout
+
+logger = logging.getLogger('WelcomeCard')
+
+TEMPLATE_FILE = '歡迎卡片範本.png'
+BOLD_FONT_FILE = 'Arial_1_Bold.ttf'
+SYMBOL_FONT_FILE = 'Symbola.otf'  # Unicode 符號 / emoji
+
+AVATAR_SIZE = 556
+AVATAR_CACHE_DIR = 'avatar_cache'  # AvatarService 存放裁切好的頭像（網頁控制台預覽也會讀取）
+AVATAR_POSITION = (110, 120)  # 依範本左上（約 x:110, y:120）
+OUTLINE_WIDTH = 6
+LITE_OUTLINE_WIDTH = 2  # 簡化繪製時的描邊寬度
+TEXT_COLOR = "#FFD600"
+
+
+def _load_font(path, size):
+    return ImageFont.truetype(path, size) if os.path.exists(path) else ImageFont.load_default()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def asset_signature(root=None):
+    """範本與字型檔的 mtime，任一檔案變更時結果就不同（CardAssets 重新載入、卡片快取失效都以此判斷）"""
+    root = root or os.getcwd()
+    return tuple(_mtime(os.path.join(root, name)) for name in (TEMPLATE_FILE, BOLD_FONT_FILE, SYMBOL_FONT_FILE))
+
+
+class CardAssets:
+    """預先處理好的範本、各尺寸字型（含排版與字寬快取）與圓形遮罩；繪製時從 base.copy() 開始"""
+
+    FONT_SIZES = {'hello': 117, 'welcome': 124, 'username': 92}
+    SYMBOL_SIZE = 92
+
+    def __init__(self, root=None):
+        self.root = root or os.getcwd()
+        self.template_path = os.path.join(self.root, TEMPLATE_FILE)
+        self.font_path = os.path.join(self.root, BOLD_FONT_FILE)
+        self.symbol_path = os.path.join(self.root, SYMBOL_FONT_FILE)
+        self.signature = None
+        self.base = None
+        self.fonts = {}
+        self.symbol_font = None
+        self.layouts = {}
+        self.mask = None
+        self.loads = 0
+
+    @property
+    def template_mtime(self):
+        return self.signature[0] if self.signature else None
+
+    def get(self):
+        """回傳目前的素材，檔案有變更（或尚未載入）時重新載入"""
+        signature = asset_signature(self.root)
+        if signature != self.signature:
+            self._load(signature)
+        return self
+
+    def _load(self, signature):
+        if signature[0] is None:
+            # 只用背景圖 '歡迎卡片範本.png'
+            raise FileNotFoundError(f"找不到背景圖片: {TEMPLATE_FILE}")
+        with Image.open(self.template_path) as template:
+            self.base = template.convert("RGBA")
+        self.fonts = {name: _load_font(self.font_path, size) for name, size in self.FONT_SIZES.items()}
+        # Symbola 字型（for Unicode/emoji）
+        self.symbol_font = None
+        if signature[2] is not None:
+            try:
+                self.symbol_font = ImageFont.truetype(self.symbol_path, self.SYMBOL_SIZE)
+            except Exception as e:
+                logger.error(f"載入 Symbola.otf 失敗: {e}")
+        # 使用者名稱與伺服器名稱中的 emoji 等符號改用 Symbola
+        self.layouts = {
+            'hello': TextLayout(self.fonts['hello']),
+            'welcome': TextLayout(self.fonts['welcome']),
+            'username': TextLayout(self.fonts['username'], self.symbol_font),
+        }
+        # 圓形遮罩（無黑邊）
+        self.mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+        ImageDraw.Draw(self.mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+        self.signature = signature
+        self.loads += 1
+        logger.info(f"[WelcomeCard] 已載入卡片素材（第 {self.loads} 次）")
+
+
+_assets = None
+
+
+def get_assets():
+    """取得這個程序的卡片素材"""
+    global _assets
+    if _assets is None:
+        _assets = CardAssets()
+    return _assets.get()
+
+
+def render_card(info):
+    """
+    繪製歡迎卡片並回傳 PNG bytes
+    info: {'display_name', 'guild_name', 'avatar': 頭像圖片 bytes（通常是 AvatarService 裁切好的圓形頭像）或 None,
+           'lite': 是否簡化繪製}
+    """
+    assets = get_assets()
+    lite = info.get('lite', False)
+    outline = LITE_OUTLINE_WIDTH if lite else OUTLINE_WIDTH
+    base_image = assets.base.copy()
+
+    # 頭像
+    if info.get('avatar'):
+        avatar = Image.open(BytesIO(info['avatar'])).convert("RGBA")
+        if avatar.size != (AVATAR_SIZE, AVATAR_SIZE):
+            avatar = avatar.resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+        base_image.paste(avatar, AVATAR_POSITION, assets.mask)
+
+    draw = ImageDraw.Draw(base_image)
+    layouts = assets.layouts
+    stroke = {'stroke_width': outline, 'stroke_fill': "black"}
+
+    # Hello! 橘色，粗黑邊
+    layouts['hello'].draw(draw, (776.6, 180.8), "Hello!", "#FF914D", **stroke)
+    # 歡迎...... 白色，粗黑邊
+    layouts['welcome'].draw(draw, (776.6, 373.2), "歡迎......", "#FFFFFF", **stroke)
+    # 使用者名稱 黃色，粗黑邊
+    layouts['username'].draw(draw, (47.9, 720.5), info['display_name'], TEXT_COLOR, **stroke)
+    # 進來伺服器名稱 黃色
+    layouts['username'].draw(draw, (47.9, 820.5), f"進來{info['guild_name']}!", TEXT_COLOR, **stroke)
+
+    image_bytes = BytesIO()
+    # 簡化繪製時降低壓縮等級，編碼時間較短（檔案較大）
+    base_image.save(image_bytes, format='PNG', compress_level=1 if lite else 6)
+    return image_bytes.getvalue()
+
+
+def warm_up():
+    """工作程序啟動時預先載入素材（讓 process pool 預先建立工作程序）"""
+    try:
+        get_assets()
+    except Exception as e:
+        logger.error(f"[WelcomeCard] 預先載入卡片素材失敗: {e}")
+    return os.getpid()
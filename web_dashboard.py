@@ -1,9 +1,14 @@
 import os
+import re
 import json
+import threading
 import psutil
 import subprocess
+from io import BytesIO
 from flask import Flask, render_template, jsonify, request, send_file
 from datetime import datetime
+from utils.card_cache import CardCache
+from utils.welcome_card import AVATAR_CACHE_DIR, AVATAR_SIZE
 
 app = Flask(__name__)
 
@@ -12,6 +17,14 @@ WELCOME_CONFIG = 'setting.json'
 LOG_FILE = 'bot.log'
 WELCOME_CARD = 'welcome_card.png'
 
+# 歡迎卡片預覽只使用記憶體快取，不寫入 Bot 的磁碟快取（card_cache/）
+preview_cache = CardCache(cache_dir=None, memory_entries=16, memory_bytes=16 * 1024 * 1024)
+# 一次只繪製一張預覽，避免大量請求佔滿 CPU
+preview_lock = threading.Lock()
+# 與 Discord 的長度上限相同
+MAX_NAME_LENGTH = 32
+MAX_GUILD_LENGTH = 100
+
 # 取得系統狀態
 def get_system_status():
     return {
@@ -80,6 +93,41 @@ def api_welcome_card():
         return send_file(WELCOME_CARD, mimetype='image/png')
     return '', 404
 
+# 讀取 Bot 快取的圓形頭像（avatar 為 Discord 頭像 hash）
+def load_cached_avatar(avatar_key):
+    if not avatar_key or not re.fullmatch(r'[A-Za-z0-9_]+', avatar_key):
+        return None
+    path = os.path.join(AVATAR_CACHE_DIR, f"{avatar_key}_{AVATAR_SIZE}.png")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+@app.route('/api/welcome_card/preview')
+def api_welcome_card_preview():
+    # 以目前的範本與字型繪製預覽，內容相同時直接使用快取
+    name = request.args.get('name', 'Akane-Ko')
+    guild = request.args.get('guild', '伺服器')
+    if len(name) > MAX_NAME_LENGTH or len(guild) > MAX_GUILD_LENGTH:
+        return jsonify({'status': 'error', 'msg': f'名稱最多 {MAX_NAME_LENGTH} 字，伺服器名稱最多 {MAX_GUILD_LENGTH} 字'}), 400
+    info = {
+        'display_name': name,
+        'guild_name': guild,
+        'avatar': load_cached_avatar(request.args.get('avatar')),
+    }
+    try:
+        with preview_lock:
+            data, hit = preview_cache.render(info)
+    except FileNotFoundError as e:
+        return jsonify({'status': 'error', 'msg': str(e)}), 404
+    response = send_file(BytesIO(data), mimetype='image/png')
+    response.headers['X-Card-Cache'] = 'hit' if hit else 'miss'
+    return response
+
+@app.route('/api/welcome_card/cache')
+def api_welcome_card_cache():
+    return jsonify(preview_cache.stats())
+
 @app.route('/api/bot/restart', methods=['POST'])
 def api_bot_restart():
     # 嘗試重啟 bot（需 root/正確權限）